@@ -8,53 +8,44 @@ Please see the LICENSE.md for more details
 """
 
 # import action things - the .syntax is used since these are part of the package
-from .au_worker import AUxWorker
-from .au_action import AxJob
-from .au_act_esptool import AUxEsptoolDetectFlash, AUxEsptoolUploadFirmware, AUxEsptoolResetESP32, \
-    AUxEsptoolEraseFlash, AUxEsptoolReadMAC
+from .au_worker import AUxWorkerPool
+from .au_action import AxJob, AxEvent
+from .au_act_esptool import AUxEsptoolFlashDevice, AUxEsptoolEraseFlash, AUxEsptoolReadMAC
+from .au_act_serial import AUxSerialResetESP32
+from .au_upload import resource_path, get_version
+from .au_console import AUxConsoleBuffer
+from .au_baud import AUTO_BAUD
+from .au_ports import port_registry
+from .au_audit import AUxAuditRecorder, audit_log
+from .au_startup import startup_report, preload
+from .au_image_info import image_inspector
+from .au_sweep import AUxSweep, sweep_ports
+from .au_sessions import session_pool
+from .au_library import firmware_library
+from .au_upload import FIRMWARE_VARIANTS
 
-import darkdetect
 import sys
 import os
 import os.path
 import platform
-
-import serial
-
-from time import sleep
-
-from typing import Iterator, Tuple
+from threading import Thread
 
 from PyQt5.QtCore import QSettings, QProcess, QTimer, Qt, QIODevice, pyqtSignal, pyqtSlot, QObject
 from PyQt5.QtWidgets import QWidget, QLabel, QComboBox, QGridLayout, \
     QPushButton, QApplication, QLineEdit, QFileDialog, QPlainTextEdit, \
-    QAction, QActionGroup, QMenu, QMenuBar, QMainWindow, QMessageBox
+    QAction, QActionGroup, QMenu, QMenuBar, QMainWindow, QMessageBox, QDialog, QTableWidget, \
+    QTableWidgetItem, QAbstractItemView, QHeaderView, QDialogButtonBox, QVBoxLayout, QHBoxLayout
 from PyQt5.QtGui import QCloseEvent, QTextCursor, QIcon, QFont
-from PyQt5.QtSerialPort import QSerialPort, QSerialPortInfo
-
-_APP_NAME = "RTK Firmware Uploader"
-
-# sub folder for our resource files
-_RESOURCE_DIRECTORY = "resource"
 
-#https://stackoverflow.com/a/50914550
-def resource_path(relative_path):
-    """ Get absolute path to resource, works for dev and for PyInstaller """
-    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(base_path, _RESOURCE_DIRECTORY, relative_path)
+# How often worker output is drawn on the console (ms), and how many lines the console keeps
+_CONSOLE_INTERVAL = 50
+_CONSOLE_MAX_LINES = 5000
 
-def get_version(rel_path: str) -> str:
-    try: 
-        with open(resource_path(rel_path), encoding='utf-8') as fp:
-            for line in fp.read().splitlines():
-                if line.startswith("__version__"):
-                    delim = '"' if '"' in line else "'"
-                    return line.split(delim)[1]
-            raise RuntimeError("Unable to find version string.")
-    except:
-        raise RuntimeError("Unable to find _version.py.")
+_APP_NAME = "RTK Firmware Uploader"
 
-_APP_VERSION = get_version("_version.py")
+# the version is read when it is first needed, not on import
+def _app_version() -> str:
+    return get_version("_version.py")
 
 # ----------------------------------------------------------------
 # hack to know when a combobox menu is being shown. Helpful if contents
@@ -68,6 +59,85 @@ class AUxComboBox(QComboBox):
         self.popupAboutToBeShown.emit()
         super().showPopup()
 
+#----------------------------------------------------------------
+# AUxLibraryDialog
+#
+# Pick a firmware file from the library (see au_library.py) - newest first,
+# narrowed down as you type and by product.
+
+class AUxLibraryDialog(QDialog):
+
+    _COLUMNS = ["Product", "Version", "Built", "Flash", "File"]
+
+    def __init__(self, library, parent: QWidget = None) -> None:
+        super().__init__(parent)
+
+        self._library = library
+        self._entries = []
+
+        self.setWindowTitle("Firmware Library - " + library.directory)
+        self.resize(760, 420)
+
+        self.search_lineedit = QLineEdit()
+        self.search_lineedit.setPlaceholderText(self.tr("Search - product, version, date, file name"))
+        self.search_lineedit.textChanged.connect(self.update_list)
+
+        self.product_combobox = QComboBox()
+        self.product_combobox.addItem(self.tr("All products"), None)
+        for product, count in sorted(library.products().items()):
+            self.product_combobox.addItem("{} ({})".format(FIRMWARE_VARIANTS[product][0]
+                                                           if product in FIRMWARE_VARIANTS else product, count), product)
+        self.product_combobox.currentIndexChanged.connect(self.update_list)
+
+        self.table = QTableWidget(0, len(self._COLUMNS))
+        self.table.setHorizontalHeaderLabels(self._COLUMNS)
+        self.table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        self.table.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        self.table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        self.table.horizontalHeader().setStretchLastSection(True)
+        self.table.cellDoubleClicked.connect(self.accept)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        search = QHBoxLayout()
+        search.addWidget(self.search_lineedit, 1)
+        search.addWidget(self.product_combobox)
+
+        layout = QVBoxLayout()
+        layout.addLayout(search)
+        layout.addWidget(self.table)
+        layout.addWidget(buttons)
+        self.setLayout(layout)
+
+        self.update_list()
+
+    def update_list(self) -> None:
+
+        self._entries = self._library.search(self.search_lineedit.text().split(),
+                                             self.product_combobox.currentData())
+
+        self.table.setRowCount(len(self._entries))
+        for row, entry in enumerate(self._entries):
+            for column, value in enumerate((entry.product, entry.version, entry.build_date, entry.flash_size,
+                                            os.path.relpath(entry.path, self._library.directory))):
+                self.table.setItem(row, column, QTableWidgetItem(value or ""))
+
+        if self._entries:
+            self.table.selectRow(0)
+
+    @property
+    def fileName(self) -> str:
+        """The firmware picked - None if none"""
+        rows = self.table.selectionModel().selectedRows()
+        if not rows or rows[0].row() >= len(self._entries):
+            return None
+
+        return self._entries[rows[0].row()].path
+
 #----------------------------------------------------------------
 # ux_is_darkmode()
 #
@@ -83,6 +153,7 @@ def ux_is_darkmode() -> bool:
     osName = platform.system()
 
     if osName == "Darwin":
+        import darkdetect
         _is_darkmode = darkdetect.isDark()
 
     elif osName == "Windows":
@@ -103,19 +174,18 @@ SETTING_PORT_NAME = 'port_name'
 SETTING_FILE_LOCATION = 'file_location'
 #SETTING_PARTITION_LOCATION = 'partition_location'
 SETTING_BAUD_RATE = 'baud'
-
-def gen_serial_ports() -> Iterator[Tuple[str, str, str]]:
-    """Return all available serial ports."""
-    ports = QSerialPortInfo.availablePorts()
-    return ((p.description(), p.portName(), p.systemLocation()) for p in ports)
+SETTING_DIFFERENTIAL = 'differential'
+SETTING_VERIFY = 'verify'
+SETTING_LIBRARY_LOCATION = 'library_location'
 
 # noinspection PyArgumentList
 
 class MainWidget(QWidget):
     """Main Widget."""
 
-    sig_message = pyqtSignal(str)
     sig_finished = pyqtSignal(int, str, int)
+    sig_event = pyqtSignal(object)
+    sig_ports_changed = pyqtSignal()
 
     def _createMenuBar(self):
         self.menuBar = QMenuBar(self)
@@ -123,26 +193,67 @@ class MainWidget(QWidget):
         self.extrasReadMACAction = QAction("Read WiFi MAC", self)
         self.extrasResetAction = QAction("Reset ESP32", self)
         self.extrasEraseAction = QAction("Erase Flash", self)
+        self.extrasDifferentialAction = QAction("Only Write Changes", self)
+        self.extrasDifferentialAction.setCheckable(True)
+        self.extrasVerifyAction = QAction("Verify After Upload", self)
+        self.extrasVerifyAction.setCheckable(True)
+        self.extrasSaveLogAction = QAction("Save Failed Job Log...", self)
+        self.extrasSweepMACAction = QAction("Read WiFi MAC of All Devices", self)
+        self.extrasSweepEraseAction = QAction("Erase All Devices...", self)
+        self.extrasSaveSweepAction = QAction("Save All Devices Results...", self)
 
         extrasMenu = self.menuBar.addMenu("Extras")
         extrasMenu.addAction(self.extrasReadMACAction)
         extrasMenu.addAction(self.extrasResetAction)
         extrasMenu.addAction(self.extrasEraseAction)
+        extrasMenu.addSeparator()
+        extrasMenu.addAction(self.extrasSweepMACAction)
+        extrasMenu.addAction(self.extrasSweepEraseAction)
+        extrasMenu.addAction(self.extrasSaveSweepAction)
+        extrasMenu.addSeparator()
+        extrasMenu.addAction(self.extrasDifferentialAction)
+        extrasMenu.addAction(self.extrasVerifyAction)
+        extrasMenu.addSeparator()
+        extrasMenu.addAction(self.extrasSaveLogAction)
 
         self.extrasReadMACAction.triggered.connect(self.readMAC)
         self.extrasResetAction.triggered.connect(self.tera_term_reset)
         self.extrasEraseAction.triggered.connect(self.eraseChip)
+        self.extrasSaveLogAction.triggered.connect(self.on_save_log)
+        self.extrasSweepMACAction.triggered.connect(lambda: self.sweep("read_mac"))
+        self.extrasSweepEraseAction.triggered.connect(lambda: self.sweep("erase"))
+        self.extrasSaveSweepAction.triggered.connect(self.on_save_sweep)
 
         self.extrasReadMACAction.setDisabled(False)
         self.extrasResetAction.setDisabled(False)
         self.extrasEraseAction.setDisabled(False)
+        self.extrasSaveSweepAction.setDisabled(True)
+
+        # the firmware library - a folder of builds
+        self.libraryFindAction = QAction("Find Firmware...", self)
+        self.libraryFolderAction = QAction("Choose Library Folder...", self)
+        self.libraryLatestActions = [QAction("Latest " + name, self) for name, _ in FIRMWARE_VARIANTS.values()]
+
+        libraryMenu = self.menuBar.addMenu("Library")
+        libraryMenu.addAction(self.libraryFindAction)
+        for action in self.libraryLatestActions:
+            libraryMenu.addAction(action)
+        libraryMenu.addSeparator()
+        libraryMenu.addAction(self.libraryFolderAction)
+
+        self.libraryFindAction.triggered.connect(self.on_library_find)
+        self.libraryFolderAction.triggered.connect(self.on_library_folder)
+        for action, variant in zip(self.libraryLatestActions, FIRMWARE_VARIANTS):
+            action.triggered.connect(lambda checked, v=variant: self.on_library_latest(v))
 
     def __init__(self, parent: QWidget = None) -> None:
         super().__init__(parent)
 
-        self.flashSize = 0
         self.macAddress = "UNKNOWN"
 
+        # the running - or last - sweep over all devices
+        self._sweep = None
+
         self._createMenuBar()
 
         # File location line edit
@@ -169,12 +280,18 @@ class MainWidget(QWidget):
         # self.partition_browse_btn.setEnabled(True)
         # self.partition_browse_btn.pressed.connect(self.on_partition_browse_btn_pressed)
 
-        # Port Combobox
+        # Port Combobox - the port list comes from the port registry, which keeps
+        # it up to date in the background
+        self._ports = port_registry()
+        self._ports.start()
+
         self.port_label = QLabel(self.tr('COM Port:'))
         self.port_combobox = AUxComboBox()
         self.port_label.setBuddy(self.port_combobox)
         self.update_com_ports()
         self.port_combobox.popupAboutToBeShown.connect(self.on_port_combobox)
+        self.sig_ports_changed.connect(self.update_com_ports)
+        self._ports.add_listener(self.on_ports_changed)
 
         # Baudrate Combobox
         self.baud_label = QLabel(self.tr('Baud Rate:'))
@@ -189,6 +306,11 @@ class MainWidget(QWidget):
         self.upload_btn.setFont(myFont)
         self.upload_btn.clicked.connect(self.on_upload_btn_pressed)
 
+        # Cancel Button - stops the running job
+        self.cancel_btn = QPushButton(self.tr('Cancel'))
+        self.cancel_btn.clicked.connect(self.on_cancel_btn_pressed)
+        self.cancel_btn.setDisabled(True)
+
         # Messages Bar
         self.messages_label = QLabel(self.tr('Status / Warnings:'))
 
@@ -197,8 +319,17 @@ class MainWidget(QWidget):
         color =  "C0C0C0" if ux_is_darkmode() else "424242"
         self.messageBox.setStyleSheet("QPlainTextEdit { color: #" + color + ";}")
         self.messageBox.setReadOnly(True)
+        self.messageBox.setMaximumBlockCount(_CONSOLE_MAX_LINES)
         self.messageBox.clear()
 
+        # Worker output is collected in the console buffer and drawn in
+        # batches by the console timer.
+        self._console = AUxConsoleBuffer(_CONSOLE_MAX_LINES)
+        self._console_timer = QTimer(self)
+        self._console_timer.setInterval(_CONSOLE_INTERVAL)
+        self._console_timer.timeout.connect(self.flushMessages)
+        self._console_timer.start()
+
         # Arrange Layout
         layout = QGridLayout()
 
@@ -220,6 +351,7 @@ class MainWidget(QWidget):
         layout.addWidget(self.upload_btn, 4, 2)
 
         layout.addWidget(self.messages_label, 5, 0)
+        layout.addWidget(self.cancel_btn, 5, 2)
         layout.addWidget(self.messageBox, 6, 0, 6, 3)
 
         self.setLayout(layout)
@@ -228,23 +360,23 @@ class MainWidget(QWidget):
         #self._clean_settings() # This will delete all existing settings! Use with caution!        
         self._load_settings()
 
-        self.setWindowTitle( _APP_NAME + " - " + _APP_VERSION)
+        self.setWindowTitle( _APP_NAME + " - " + _app_version())
 
         # setup our background worker thread ...
 
         # connect the signals from the background processor to callback
         # methods/slots. This makes it thread safe
-        self.sig_message.connect(self.appendMessage)
         self.sig_finished.connect(self.on_finished)
+        self.sig_event.connect(self.on_event)
 
-        # Create our background worker object, which also will do work in it's
-        # own thread.
-        self._worker = AUxWorker(self.on_worker_callback)
+        # Create our background worker pool, which runs the jobs for each port
+        # in that port's own thread. Every job is recorded in the audit log.
+        self._worker = AUxWorkerPool(self.on_worker_callback, AUxAuditRecorder(audit_log()))
 
         # add the actions/commands for this app to the background processing thread.
         # These actions are passed jobs to execute.
-        self._worker.add_action(AUxEsptoolDetectFlash(), AUxEsptoolUploadFirmware(), AUxEsptoolResetESP32(), \
-                                AUxEsptoolEraseFlash(), AUxEsptoolReadMAC())
+        self._worker.add_action(AUxEsptoolFlashDevice(), AUxEsptoolEraseFlash(), AUxEsptoolReadMAC(),
+                                AUxSerialResetESP32())
 
     #--------------------------------------------------------------
     # callback function for the background worker.
@@ -261,48 +393,63 @@ class MainWidget(QWidget):
             return
 
         msg_type = args[0]
-        if msg_type == AUxWorker.TYPE_MESSAGE:
-            self.sig_message.emit(args[1])
-        elif msg_type == AUxWorker.TYPE_FINISHED:
+        if msg_type == AUxWorkerPool.TYPE_MESSAGE:
+            # thread safe - drawn on the GUI thread by flushMessages()
+            self._console.write(args[1])
+        elif msg_type == AUxWorkerPool.TYPE_FINISHED:
             # finished takes 3 args - status, job type, and job id
             if len(args) < 4:
                 self.writeMessage("Invalid parameters from the uploader.")
                 return;
 
             self.sig_finished.emit(args[1], args[2], args[3])
+        elif msg_type == AUxWorkerPool.TYPE_EVENT:
+            self.sig_event.emit(args[1])
             
-    @pyqtSlot(str)
-    def appendMessage(self, msg: str) -> None:
-        if msg.startswith("\r"):
-            self.messageBox.moveCursor(QTextCursor.StartOfLine, QTextCursor.KeepAnchor)
-            self.messageBox.cut()
-            self.messageBox.insertPlainText(msg[1:])
-        else:
-            self.messageBox.insertPlainText(msg)
-        self.messageBox.ensureCursorVisible()
-        self.messageBox.repaint()
-
-        if msg.find("Detected flash size: 4MB") >= 0:
-            self.flashSize = 4
-        elif msg.find("Detected flash size: 8MB") >= 0:
-            self.flashSize = 8
-        elif msg.find("Detected flash size: 16MB") >= 0:
-            self.flashSize = 16
-        elif msg.find("Detected flash size: ") >= 0:
-            self.flashSize = 0
+    #--------------------------------------------------------------
+    # flushMessages()
+    #
+    # Draw the worker output collected since the last call. Runs on the
+    # console timer, so the pane is updated at most once per interval.
+    @pyqtSlot()
+    def flushMessages(self) -> None:
+        rewrite, text = self._console.take()
+        if not rewrite and not text:
+            return
 
-        macAddrPtr = msg.find("MAC: ")
-        if macAddrPtr >= 0:
-            self.macAddress = msg[macAddrPtr + len("MAC: "):]
+        cursor = self.messageBox.textCursor()
+        cursor.movePosition(QTextCursor.End)
+        if rewrite:
+            cursor.movePosition(QTextCursor.StartOfBlock, QTextCursor.KeepAnchor)
+            cursor.removeSelectedText()
+        cursor.insertText(text)
+        self.messageBox.setTextCursor(cursor)
+        self.messageBox.ensureCursorVisible()
 
     @pyqtSlot(str)
     def writeMessage(self, msg: str) -> None:
+        # keep the order with any worker output that is not drawn yet
+        self.flushMessages()
         self.messageBox.moveCursor(QTextCursor.End)
-        #self.messageBox.ensureCursorVisible()
         self.messageBox.appendPlainText(msg)
         self.messageBox.ensureCursorVisible()
-        self.messageBox.repaint()
-        #QApplication.processEvents()
+
+    #--------------------------------------------------------------
+    # on_event()
+    #
+    #  Slot for structured events (AxEvent) from the running job
+    @pyqtSlot(object)
+    def on_event(self, event) -> None:
+
+        if self._sweep is not None:
+            self._sweep.on_event(event)
+
+        if event.event_type == AxEvent.EVENT_MAC:
+            self.macAddress = event.mac
+
+        elif event.event_type == AxEvent.EVENT_PROGRESS:
+            self.messages_label.setText(self.tr('Status / Warnings:') + "  {}%  ({:.0f} kbit/s)".format(
+                event.percent, event.bytes_per_sec * 8 / 1000))
 
     #--------------------------------------------------------------
     # on_finished()
@@ -313,30 +460,62 @@ class MainWidget(QWidget):
     @pyqtSlot(int, str, int)
     def on_finished(self, status, action_type, job_id) -> None:
 
+        # A job of a sweep - once they are all done, show the results
+        if self._sweep is not None and self._sweep.owns(job_id):
+            if self._sweep.on_finished(job_id, status):
+                self.writeMessage("\n" + self._sweep.table())
+                self.writeMessage("\n{} of {} OK in {:.1f} seconds".format(
+                    len(self._sweep) - self._sweep.failed, len(self._sweep), self._sweep.seconds))
+                self.extrasSaveSweepAction.setDisabled(False)
+                self.disable_interface(False)
+            return
+
+        if status == AUxWorkerPool.STATUS_CANCELLED:
+            self.writeMessage("Cancelled...")
+        elif status == AUxWorkerPool.STATUS_TIMEOUT:
+            self.writeMessage("Timed out - the ESP32 stopped responding...")
+
         # If the Read MAC is finished, re-enable the UX
         if action_type == AUxEsptoolReadMAC.ACTION_ID:
-            self.writeMessage("Read MAC complete...")
-            self.writeMessage("WiFi MAC Address is {}".format(self.macAddress))
+            if status == 0:
+                self.writeMessage("Read MAC complete...")
+                self.writeMessage("WiFi MAC Address is {}".format(self.macAddress))
+            else:
+                self.writeMessage("Read MAC failed...")
+            self.disable_interface(False)
+
+        # If the reset is finished, re-enable the UX
+        if action_type == AUxSerialResetESP32.ACTION_ID:
+            if status == 0:
+                self.writeMessage("Reset complete...")
             self.disable_interface(False)
 
         # If the flash erase is finished, re-enable the UX
         if action_type == AUxEsptoolEraseFlash.ACTION_ID:
-            self.writeMessage("Flash erase complete...")
+            self.writeMessage("Flash erase complete..." if status == 0 else "Flash erase failed...")
             self.disable_interface(False)
 
-        # If the flash detection is finished, trigger the upload
-        if action_type == AUxEsptoolDetectFlash.ACTION_ID:
-            self.writeMessage("Flash detection complete. Uploading firmware...")
-            self.do_upload()
-
-        # If the upload is finished, trigger a reset
-        if action_type == AUxEsptoolUploadFirmware.ACTION_ID:
-            self.writeMessage("Firmware upload complete. Resetting ESP32...")
-            self.esptool_reset()
-
-        # If the reset is finished, re-enable the UX
-        if action_type == AUxEsptoolResetESP32.ACTION_ID:
-            self.writeMessage("Reset complete...")
+        # If the upload is finished, re-enable the UX - or ask if the firmware
+        # did not match the device. An image that says it is for another device
+        # gets a stronger warning, and No is the default either way
+        if action_type == AUxEsptoolFlashDevice.ACTION_ID:
+            if status == AUxEsptoolFlashDevice.STATUS_WRONG_FIRMWARE:
+                self.writeMessage("This firmware is not for this device...")
+                reply = QMessageBox.warning(self, "Firmware is not for this device", "The firmware says it is not for this device. Do you want to upload it anyway?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if reply == QMessageBox.Yes:
+                    self.do_upload(force=True)
+                    return
+            elif status == AUxEsptoolFlashDevice.STATUS_SIZE_MISMATCH:
+                reply = QMessageBox.warning(self, "Firmware and flash size mismatch", "Do you want to continue?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+                if reply == QMessageBox.Yes:
+                    self.do_upload(force=True)
+                    return
+            elif status == AUxEsptoolFlashDevice.STATUS_VERIFY_FAILED:
+                self.writeMessage("Firmware verify failed...")
+            elif status == 0:
+                self.writeMessage("Firmware upload complete. Reset complete...")
+            else:
+                self.writeMessage("Firmware upload failed...")
             self.disable_interface(False)
 
     # --------------------------------------------------------------
@@ -350,6 +529,17 @@ class MainWidget(QWidget):
     def on_port_combobox(self):
         self.update_com_ports()
 
+    # called by the port registry thread when ports come or go
+    def on_ports_changed(self, added, removed):
+        self.sig_ports_changed.emit()
+
+    def port_available(self) -> bool:
+        """Check the current port is still there - writes a message if not."""
+        if self._ports.get(self.port) is None:
+            self.writeMessage("Port No Longer Available")
+            return False
+        return True
+
     def _load_settings(self) -> None:
         """Load settings on startup."""
         port_name = self.settings.value(SETTING_PORT_NAME)
@@ -374,12 +564,25 @@ class MainWidget(QWidget):
             if index > -1:
                 self.baud_combobox.setCurrentIndex(index)
 
+        differential = self.settings.value(SETTING_DIFFERENTIAL)
+        if differential is not None:
+            self.extrasDifferentialAction.setChecked(str(differential).lower() == "true")
+
+        verify = self.settings.value(SETTING_VERIFY)
+        if verify is not None:
+            self.extrasVerifyAction.setChecked(str(verify).lower() == "true")
+
+        self.libraryFolder = self.settings.value(SETTING_LIBRARY_LOCATION)
+
     def _save_settings(self) -> None:
         """Save settings on shutdown."""
         self.settings.setValue(SETTING_PORT_NAME, self.port)
         self.settings.setValue(SETTING_FILE_LOCATION, self.theFileName)
         # self.settings.setValue(SETTING_PARTITION_LOCATION, self.thePartitionFileName)
         self.settings.setValue(SETTING_BAUD_RATE, self.baudRate)
+        self.settings.setValue(SETTING_DIFFERENTIAL, self.extrasDifferentialAction.isChecked())
+        self.settings.setValue(SETTING_VERIFY, self.extrasVerifyAction.isChecked())
+        self.settings.setValue(SETTING_LIBRARY_LOCATION, self.libraryFolder)
 
     def _clean_settings(self) -> None:
         """Clean (remove) all existing settings."""
@@ -389,6 +592,7 @@ class MainWidget(QWidget):
         """Show a Message Box with the error message."""
         QMessageBox.critical(self, QApplication.applicationName(), str(msg))
 
+    @pyqtSlot()
     def update_com_ports(self) -> None:
         """Update COM Port list in GUI."""
         previousPort = self.port # Record the previous port before we clear the combobox
@@ -397,10 +601,9 @@ class MainWidget(QWidget):
 
         index = 0
         indexOfPrevious = -1
-        for desc, name, sys in gen_serial_ports():
-            longname = desc + " (" + name + ")"
-            self.port_combobox.addItem(longname, sys)
-            if(sys == previousPort): # Previous port still exists so record it
+        for info in self._ports.ports():
+            self.port_combobox.addItem(info.longname, info.device)
+            if(info.device == previousPort): # Previous port still exists so record it
                 indexOfPrevious = index
             index = index + 1
 
@@ -409,9 +612,10 @@ class MainWidget(QWidget):
 
     def update_baud_rates(self) -> None:
         """Update baud rate list in GUI."""
-        # Highest speed first so code defaults to that
+        # Auto first so code defaults to that
         # if settings.value(SETTING_BAUD_RATE) is None
         self.baud_combobox.clear()
+        self.baud_combobox.addItem("Auto", AUTO_BAUD)
         self.baud_combobox.addItem("921600", 921600)
         self.baud_combobox.addItem("460800", 460800)
         self.baud_combobox.addItem("115200", 115200)
@@ -445,6 +649,9 @@ class MainWidget(QWidget):
 
         # shutdown the background worker/stop it so the app exits correctly
         self._worker.shutdown()
+        session_pool().close_all()
+        self._ports.remove_listener(self.on_ports_changed)
+        self._ports.stop()
 
         event.accept()
 
@@ -454,12 +661,96 @@ class MainWidget(QWidget):
         fileName, _ = QFileDialog.getOpenFileName(
             None,
             "Select Firmware to Upload",
-            "",
+            self.libraryFolder or "",
             "Firmware Files (*.bin);;All Files (*)",
             options=options)
         if fileName:
             self.fileLocation_lineedit.setText(fileName)
 
+    #--------------------------------------------------------------
+    # The firmware library
+
+    def _library(self):
+        """The library of the library folder, up to date - None (and a message) if there is no folder"""
+        if not self.libraryFolder or not os.path.isdir(self.libraryFolder):
+            self.writeMessage("Choose a library folder first - Library > Choose Library Folder...")
+            return None
+
+        library = firmware_library(self.libraryFolder)
+
+        # quick if the background refresh has already read the folder
+        QApplication.setOverrideCursor(Qt.WaitCursor)
+        try:
+            library.refresh()
+        finally:
+            QApplication.restoreOverrideCursor()
+
+        return library
+
+    # index the library folder in the background, so it is ready when needed
+    def _refresh_library(self) -> None:
+
+        if self.libraryFolder and os.path.isdir(self.libraryFolder):
+            Thread(target=firmware_library(self.libraryFolder).refresh, daemon=True).start()
+
+    def on_library_folder(self) -> None:
+        """Choose the folder of firmware builds"""
+        folder = QFileDialog.getExistingDirectory(None, "Choose Library Folder", self.libraryFolder or "")
+        if not folder:
+            return
+
+        self.libraryFolder = folder
+        self._refresh_library()
+        self.writeMessage("Firmware library: " + folder)
+
+    def on_library_find(self) -> None:
+        """Pick firmware from the library"""
+        library = self._library()
+        if library is None:
+            return
+
+        dialog = AUxLibraryDialog(library, self)
+        if dialog.exec_() == QDialog.Accepted and dialog.fileName:
+            self.fileLocation_lineedit.setText(dialog.fileName)
+
+    def on_library_latest(self, variant: str) -> None:
+        """Pick the newest build of a product from the library"""
+        library = self._library()
+        if library is None:
+            return
+
+        entry = library.latest(variant)
+        if entry is None:
+            self.writeMessage("No {} in {}".format(FIRMWARE_VARIANTS[variant][0], library.directory))
+            return
+
+        self.fileLocation_lineedit.setText(entry.path)
+        self.writeMessage("Latest {}: {} {}, built {}".format(FIRMWARE_VARIANTS[variant][0], entry.version,
+                                                              entry.flash_size, entry.build_date))
+
+    def on_save_log(self) -> None:
+        """Save the full output - stdout and stderr - of the last job that failed."""
+        log = self._worker.job_log()
+        if log is None:
+            self.writeMessage("No failed job to save")
+            return
+
+        fileName, _ = QFileDialog.getSaveFileName(
+            None,
+            "Save Failed Job Log",
+            "job_{}.log".format(log.job_id),
+            "Log Files (*.log *.txt);;All Files (*)")
+        if not fileName:
+            return
+
+        try:
+            with open(fileName, "w", encoding="utf-8") as f:
+                f.write(log.text())
+        except OSError as error:
+            self.show_error_message(error)
+            return
+        self.writeMessage("Job log saved to " + fileName)
+
     # def on_partition_browse_btn_pressed(self) -> None:
     #     """Open dialog to select partition bin file."""
     #     options = QFileDialog.Options()
@@ -480,18 +771,39 @@ class MainWidget(QWidget):
     def disable_interface(self, bDisable=False):
 
         self.upload_btn.setDisabled(bDisable)
+        self.cancel_btn.setDisabled(not bDisable)
         self.extrasEraseAction.setDisabled(bDisable)
         self.extrasReadMACAction.setDisabled(bDisable)
         self.extrasResetAction.setDisabled(bDisable)
+        self.extrasSweepMACAction.setDisabled(bDisable)
+        self.extrasSweepEraseAction.setDisabled(bDisable)
+
+    #--------------------------------------------------------------
+    # on_window_shown()
+    #
+    # Called once the window is up. esptool and friends are imported lazily;
+    # import them now, in the background, so the first job does not wait.
+    def on_window_shown(self) -> None:
+
+        report = startup_report()
+        report.mark("window shown")
+
+        def on_loaded(name, seconds):
+            report.mark("{} loaded in the background ({:.0f} ms)".format(name, seconds * 1000))
+
+        preload(on_loaded=on_loaded, on_done=report.report)
+
+        self._refresh_library()
+
+    def on_cancel_btn_pressed(self) -> None:
+        """Cancel the running job"""
+        if self._worker.cancel():
+            self.writeMessage("Cancelling...")
+            self.cancel_btn.setDisabled(True)
 
     def eraseChip(self) -> None:
         """Perform erase_flash"""
-        portAvailable = False
-        for desc, name, sys in gen_serial_ports():
-            if (sys == self.port):
-                portAvailable = True
-        if (portAvailable == False):
-            self.writeMessage("Port No Longer Available")
+        if not self.port_available():
             return
 
         try:
@@ -501,65 +813,67 @@ class MainWidget(QWidget):
 
         self.writeMessage("Erasing flash\n\n")
 
-        command = []
-        command.extend(["--chip","esp32"])
-        command.extend(["--port",self.port])
-        command.extend(["--before","default_reset"])
-        command.extend(["erase_flash"])
-
         # Create a job and add it to the job queue. The worker thread will pick this up and
         # process the job. Can set job values using dictionary syntax, or attribute assignments
         #
         # Note - the job is defined with the ID of the target action
-        theJob = AxJob(AUxEsptoolEraseFlash.ACTION_ID, {"command":command})
+        theJob = AxJob(AUxEsptoolEraseFlash.ACTION_ID, {"port":self.port})
 
         # Send the job to the worker to process
         self._worker.add_job(theJob)
 
         self.disable_interface(True)
 
-    def readMAC(self) -> None:
-        """Perform read_mac"""
-        portAvailable = False
-        for desc, name, sys in gen_serial_ports():
-            if (sys == self.port):
-                portAvailable = True
-        if (portAvailable == False):
-            self.writeMessage("Port No Longer Available")
+    def sweep(self, operation: str) -> None:
+        """Read the MAC of, or erase, every connected device at the same time"""
+        ports = sweep_ports()
+        if not ports:
+            self.writeMessage("No devices found")
             return
 
-        try:
-            self._save_settings() # Save the settings in case the command fails
-        except:
-            pass
+        if operation == "erase":
+            reply = QMessageBox.warning(self, "Erase All Devices", "Erase the flash of these {} devices?\n\n{}".format(
+                                        len(ports), "\n".join(info.longname for info in ports)),
+                                        QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
+            if reply != QMessageBox.Yes:
+                return
 
-        self.writeMessage("Reading WiFi MAC address\n\n")
+        self.writeMessage("{} on {} devices\n\n".format("Erasing flash" if operation == "erase" else
+                                                         "Reading WiFi MAC address", len(ports)))
 
-        command = []
-        command.extend(["--chip","esp32"])
-        command.extend(["--port",self.port])
-        command.extend(["--before","default_reset"])
-        command.extend(["read_mac"])
+        self._sweep = AUxSweep(operation, ports)
+        self.extrasSaveSweepAction.setDisabled(True)
 
-        # Create a job and add it to the job queue. The worker thread will pick this up and
-        # process the job. Can set job values using dictionary syntax, or attribute assignments
-        #
-        # Note - the job is defined with the ID of the target action
-        theJob = AxJob(AUxEsptoolReadMAC.ACTION_ID, {"command":command})
-
-        # Send the job to the worker to process
-        self._worker.add_job(theJob)
+        # one job per port - the pool runs them all at the same time
+        for theJob in self._sweep.jobs():
+            self._worker.add_job(theJob)
 
         self.disable_interface(True)
 
-    def on_upload_btn_pressed(self) -> None:
-        """Get ready to upload the firmware. First, detect the flash size"""
-        portAvailable = False
-        for desc, name, sys in gen_serial_ports():
-            if (sys == self.port):
-                portAvailable = True
-        if (portAvailable == False):
-            self.writeMessage("Port No Longer Available")
+    def on_save_sweep(self) -> None:
+        """Save the results of the last sweep as CSV"""
+        if self._sweep is None or not self._sweep.done:
+            return
+
+        fileName, _ = QFileDialog.getSaveFileName(
+            None,
+            "Save All Devices Results",
+            "{}.csv".format(self._sweep.sweep),
+            "CSV Files (*.csv);;All Files (*)")
+        if not fileName:
+            return
+
+        try:
+            with open(fileName, "w", newline="", encoding="utf-8") as f:
+                self._sweep.write_csv(f)
+        except OSError as error:
+            self.show_error_message(error)
+            return
+        self.writeMessage("Results saved to " + fileName)
+
+    def readMAC(self) -> None:
+        """Perform read_mac"""
+        if not self.port_available():
             return
 
         try:
@@ -567,36 +881,24 @@ class MainWidget(QWidget):
         except:
             pass
 
-        self.flashSize = 0
-
-        self.writeMessage("Detecting flash size\n\n")
+        self.writeMessage("Reading WiFi MAC address\n\n")
 
-        command = []
-        command.extend(["--chip","esp32"])
-        command.extend(["--port",self.port])
-        command.extend(["--before","default_reset","--after","no_reset"])
-        command.extend(["flash_id"])
+        self.macAddress = "UNKNOWN"
 
         # Create a job and add it to the job queue. The worker thread will pick this up and
         # process the job. Can set job values using dictionary syntax, or attribute assignments
         #
         # Note - the job is defined with the ID of the target action
-        theJob = AxJob(AUxEsptoolDetectFlash.ACTION_ID, {"command":command})
+        theJob = AxJob(AUxEsptoolReadMAC.ACTION_ID, {"port":self.port})
 
         # Send the job to the worker to process
         self._worker.add_job(theJob)
 
         self.disable_interface(True)
 
-    def do_upload(self) -> None:
-        """Upload the firmware"""
-        portAvailable = False
-        for desc, name, sys in gen_serial_ports():
-            if (sys == self.port):
-                portAvailable = True
-        if (portAvailable == False):
-            self.writeMessage("Port No Longer Available")
-            self.disable_interface(False)
+    def on_upload_btn_pressed(self) -> None:
+        """Upload the firmware - detect flash size, write and reset in one job"""
+        if not self.port_available():
             return
 
         fileExists = False
@@ -608,130 +910,38 @@ class MainWidget(QWidget):
         finally:
             if (fileExists == False):
                 self.writeMessage("File Not Found")
-                self.disable_interface(False)
                 return
             f.close()
 
-        # fileExists = False
-        # try:
-        #     f = open(self.thePartitionFileName)
-        #     fileExists = True
-        # except IOError:
-        #     fileExists = False
-        # finally:
-        #     if (fileExists == False):
-        #         self.writeMessage("File Not Found")
-        #         return
-        #     f.close()
-
+        # Check it is a firmware image, and say what it is, before going near the device
         try:
-            self._save_settings() # Save the settings in case the command fails
-        except:
-            pass
-
-        if self.flashSize == 0:
-            self.writeMessage("Flash size not detected! Defaulting to 16MB\n")
-            self.flashSize = 16
-        else:
-            self.writeMessage("Flash size is " + str(self.flashSize) + "MB\n")
-
-        thePartitionFileName = resource_path("RTK_Surveyor_Partitions_16MB.bin")
-        firmwareSizeCorrect = True
-        if self.flashSize == 16: # Could be RTK Firmware or RTK Everywhere
-            pass # Nothing to do
-        elif self.flashSize == 8: # RTK Postcard (ESP32 Pico Mini)
-            thePartitionFileName = resource_path("RTK_Everywhere_Partitions_8MB.bin")
-            if self.theFileName.find("RTK_Everywhere_Firmware") < 0:
-                self.writeMessage("Flash size is 8MB. RTK Everywhere Firmware not detected\n")
-                firmwareSizeCorrect = False
-        elif self.flashSize == 4: # Original RTK Surveyor
-            thePartitionFileName = resource_path("RTK_Surveyor_Partitions_4MB.bin")
-            if self.theFileName.find("RTK_Surveyor_Firmware") < 0:
-                self.writeMessage("Flash size is 4MB. RTK Surveyor Firmware not detected\n")
-                firmwareSizeCorrect = False
-        else:
-            firmwareSizeCorrect = False
-
-        if firmwareSizeCorrect == False:
-            reply = QMessageBox.warning(self, "Firmware and flash size mismatch", "Do you want to continue?", QMessageBox.Yes | QMessageBox.No, QMessageBox.No)
-            if reply == QMessageBox.No:
-                self.disable_interface(False)
-                return
-
-        theBootloaderFileName = resource_path("RTK_Surveyor.ino.bootloader.bin")
-        if self.theFileName.find("RTK_Everywhere_Firmware") >= 0:
-            theBootloaderFileName = resource_path("RTK_Everywhere.ino.bootloader.bin")
-            self.writeMessage("RTK Everywhere Firmware detected. Using RTK_Everywhere.ino.bootloader.bin\n")
-        else:
-            self.writeMessage("Using RTK_Surveyor.ino.bootloader.bin\n")
-
-        sleep(1.0)
-        self.writeMessage("Uploading firmware\n")
-
-        baud = self.baudRate
-        if baud == "921600":
-            if (platform.system() == "Darwin"): # 921600 fails on MacOS
-                self.writeMessage("MacOS detected. Limiting baud to 460800\n")
-                baud = "460800"
-            if ((str(self.port_combobox.currentText()).find("CH342") >= 0) and (self.flashSize == 16)): # 921600 fails on CH342 + 16MB ESP32 (ie, RTK Torch)
-                self.writeMessage("RTK Torch detected. Limiting baud to 460800\n")
-                baud = "460800"
-
-        command = []
-        #command.extend(["--trace"]) # Useful for debugging
-        command.extend(["--chip","esp32"])
-        command.extend(["--port",self.port])
-        command.extend(["--baud",baud])
-        command.extend(["--before","default_reset","--after","no_reset","write_flash","-z","--flash_mode","dio","--flash_freq","80m","--flash_size","detect"])
-        command.extend(["0x1000",theBootloaderFileName])
-        command.extend(["0x8000",thePartitionFileName])
-        command.extend(["0xe000",resource_path("boot_app0.bin")])
-        command.extend(["0x10000",self.theFileName])
-
-        #print("python esptool.py %s\n\n" % " ".join(command)) # Useful for debugging - cut and paste into a command prompt
-
-        # Create a job and add it to the job queue. The worker thread will pick this up and
-        # process the job. Can set job values using dictionary syntax, or attribute assignments
-        #
-        # Note - the job is defined with the ID of the target action
-        theJob = AxJob(AUxEsptoolUploadFirmware.ACTION_ID, {"command":command})
-
-        # Send the job to the worker to process
-        self._worker.add_job(theJob)
-
-        self.disable_interface(True) # Redundant... Interface is still disabled from flash detect
-
-    def esptool_reset(self) -> None:
-        """Tell the ESP32 to reset/restart"""
-        portAvailable = False
-        for desc, name, sys in gen_serial_ports():
-            if (sys == self.port):
-                portAvailable = True
-        if (portAvailable == False):
-            self.writeMessage("Port No Longer Available")
-            self.disable_interface(False)
+            info = image_inspector().inspect(self.theFileName)
+        except ValueError as error:
+            self.show_error_message(error)
             return
+        self.writeMessage("Firmware: {}".format(info))
 
         try:
             self._save_settings() # Save the settings in case the command fails
         except:
             pass
 
-        sleep(1.0)
-        self.writeMessage("Resetting ESP32\n")
+        self.do_upload()
 
-        # ---- The esptool method -----
-
-        command = []
-        command.extend(["--chip","esp32"])
-        command.extend(["--port",self.port])
-        command.extend(["--before","default_reset","run"])
+    def do_upload(self, force=False) -> None:
+        """Queue the upload job"""
+        self.writeMessage("Detecting flash size and uploading firmware\n\n")
+        self.messages_label.setText(self.tr('Status / Warnings:'))
 
         # Create a job and add it to the job queue. The worker thread will pick this up and
         # process the job. Can set job values using dictionary syntax, or attribute assignments
         #
         # Note - the job is defined with the ID of the target action
-        theJob = AxJob(AUxEsptoolResetESP32.ACTION_ID, {"command":command})
+        theJob = AxJob(AUxEsptoolFlashDevice.ACTION_ID, {"port":self.port, "baud":self.baudRate,
+                                                         "firmware":self.theFileName, "force":force,
+                                                         "port_desc":str(self.port_combobox.currentText()),
+                                                         "differential":self.extrasDifferentialAction.isChecked(),
+                                                         "verify":self.extrasVerifyAction.isChecked()})
 
         # Send the job to the worker to process
         self._worker.add_job(theJob)
@@ -740,12 +950,7 @@ class MainWidget(QWidget):
 
     def tera_term_reset(self) -> None:
         """Reset the ESP32 the TeraTerm way"""
-        portAvailable = False
-        for desc, name, sys in gen_serial_ports():
-            if (sys == self.port):
-                portAvailable = True
-        if (portAvailable == False):
-            self.writeMessage("Port No Longer Available")
+        if not self.port_available():
             return
 
         try:
@@ -755,47 +960,33 @@ class MainWidget(QWidget):
 
         self.writeMessage("Resetting ESP32\n")
 
-        # ---- The pySerial method -----
-
-        self.disable_interface(True)
-
-        sleep(0.1)
+        # ---- The pySerial method, run by the worker -----
+        #
+        # The job finishes as soon as the ESP32 is seen booting
+        theJob = AxJob(AUxSerialResetESP32.ACTION_ID, {"port":self.port})
 
-        try:
-            ser = serial.Serial()
-            ser.port = self.port
-            ser.setDTR(False) # DTR High
-            ser.setRTS(False) # RTS High
-            with ser as s:
-                s.setRTS(True) # RTS Low - before DTR
-                s.setDTR(True) # DTR Low - after RTS
-                sleep(1.0)
-                self.writeMessage("Waiting for reset to complete")
-                sleep(1.0)
-                self.writeMessage("Waiting for reset to complete")
-                sleep(1.0)
-                self.writeMessage("Waiting for reset to complete")
-                sleep(1.0)
-                self.writeMessage("Waiting for reset to complete\n")
-                sleep(1.0)
-        except:
-            self.writeMessage("Could not open serial port\n")
-            self.disable_interface(False)
-            return
+        # Send the job to the worker to process
+        self._worker.add_job(theJob)
 
-        self.writeMessage("Reset complete...")
-        self.disable_interface(False)
+        self.disable_interface(True)
 
 def startUploaderGUI():
     """Start the GUI"""
     from sys import exit as sysExit
+    startup_report().mark("modules imported")
     app = QApplication([])
     app.setOrganizationName('SparkFun Electronics')
-    app.setApplicationName(_APP_NAME + ' - ' + _APP_VERSION)
+    app.setApplicationName(_APP_NAME + ' - ' + _app_version())
     app.setWindowIcon(QIcon(resource_path("RTK.png")))
-    app.setApplicationVersion(_APP_VERSION)
+    app.setApplicationVersion(_app_version())
+    startup_report().mark("application created")
     w = MainWidget()
+    startup_report().mark("window created")
     w.show()
+
+    # once the window is drawn, load the flashing tools in the background
+    QTimer.singleShot(0, w.on_window_shown)
+
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
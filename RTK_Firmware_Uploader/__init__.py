@@ -1 +1,23 @@
-from .RTK_Firmware_Uploader import startUploaderGUI
+# The GUI pulls in PyQt5, so only import it when it is started. This keeps the
+# command line uploader free of Qt.
+
+def startUploaderGUI():
+    # first, so the startup report clock starts before the slow imports
+    from .au_startup import startup_report
+    from .RTK_Firmware_Uploader import startUploaderGUI as _startUploaderGUI
+    _startUploaderGUI()
+
+def startUploaderCLI(argv=None):
+    from sys import exit as sysExit
+    from .au_cli import startUploaderCLI as _startUploaderCLI
+    sysExit(_startUploaderCLI(argv))
+
+# The asyncio API (see au_async.py) - imported on first use, so importing the
+# package stays cheap
+_ASYNC_API = ("flash_device", "verify", "read_mac", "erase", "reset", "AUxAsyncUploader", "AUxJobResult")
+
+def __getattr__(name):
+    if name in _ASYNC_API:
+        from . import au_async
+        return getattr(au_async, name)
+    raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -1,6 +1,20 @@
-from .au_action import AxAction, AxJob
-
-import esptool # pip install esptool
+from .au_action import AxAction, AxJob, AxEvent, emit_event, cancel_token, check_cancelled, job_queued
+from .au_upload import select_images, limit_baud, flash_images
+from .au_image_cache import image_cache
+from .au_image_info import image_inspector
+from .au_baud import AUTO_BAUD, adapter_id, baud_profiles
+from .au_startup import lazy_import
+from .au_sessions import session_pool
+from .au_compress import AUxCompressionPlanner, AUTO_COMPRESSION
+from .au_trace import span
+
+import os.path
+import time
+import zlib
+
+# esptool is slow to import and only needed once a job runs - see au_startup.py
+esptool = lazy_import("esptool") # pip install esptool
+serial = lazy_import("serial") # pip install pyserial
 
 # # When I couldn't get the windowed executable to work on MacOS, I suspected that esptool still could not
 # # find the stub_flasher json files. Turns out it was actually the baud rate that was the issue...
@@ -24,92 +38,732 @@ import esptool # pip install esptool
 
 #--------------------------------------------------------------------------------------
 # action testing
+# Read the MAC - reported with an AxEvent.EVENT_MAC event. Job values: port
 class AUxEsptoolReadMAC(AxAction):
 
     ACTION_ID = "esptool-read-mac"
     NAME = "ESP32 Read MAC"
+    TIMEOUT = 60
 
     def __init__(self) -> None:
         super().__init__(self.ACTION_ID, self.NAME)
 
     def run_job(self, job:AxJob):
 
+        session = AUxEsptoolSession(job.port)
         try:
-            esptool.main(job.command)
+            session.connect(stub=False)     # the ROM can read the MAC
+            session.keep_or_reset()
 
-        except Exception:
+        except Exception as error:
+            print(str(error))
             return 1
 
+        finally:
+            session.close()
+
         return 0
 
+# Erase the whole flash. Job values: port
 class AUxEsptoolEraseFlash(AxAction):
 
     ACTION_ID = "esptool-erase-flash"
     NAME = "ESP32 Flash Erase"
+    TIMEOUT = 300
 
     def __init__(self) -> None:
         super().__init__(self.ACTION_ID, self.NAME)
 
     def run_job(self, job:AxJob):
 
+        session = AUxEsptoolSession(job.port)
         try:
-            esptool.main(job.command)
+            session.connect()
+            session.erase_flash()
+            session.keep_or_reset()
 
-        except Exception:
+        except Exception as error:
+            print(str(error))
             return 1
 
+        finally:
+            session.close()
+
         return 0
 
-class AUxEsptoolDetectFlash(AxAction):
+# How long to wait for the device to answer at a new baud rate (seconds)
+_LINK_CHECK_TIMEOUT = 1
 
-    ACTION_ID = "esptool-detect-flash"
-    NAME = "ESP32 Flash Size Detection"
+# Differential writes compare the device against the image in blocks of this size
+# (the flash erase block size, so changed ranges stay sector aligned)
+DIFF_BLOCK_SIZE = 0x10000
 
-    def __init__(self) -> None:
-        super().__init__(self.ACTION_ID, self.NAME)
+#--------------------------------------------------------------------------------------
+# AUxEsptoolSession
+#
+# One esptool connection to an ESP32. Connecting resets the ESP32 into the ROM
+# bootloader, syncs and uploads the flasher stub - once. After that, everything
+# runs over the same connection, with no further reset/sync/stub upload.
+#
+# A job that leaves the ESP32 in the bootloader can keep() its session: close()
+# then hands the connection to the session pool (see au_sessions.py), and the
+# next job on the port connects without the reset, sync or stub upload. Jobs
+# keep_or_reset() - they keep the session only if that next job is already queued.
+#
+# The session reports what it finds and does as AxEvents (see au_action.py):
+# chip details and MAC on connect, the flash size, and write progress.
+#
+# Example:
+#
+#   session = AUxEsptoolSession("/dev/ttyUSB0")
+#   session.connect()
+#   session.change_baud(921600)
+#   session.write_flash([(0x10000, "firmware.bin")])
+#   session.hard_reset()
+#   session.close()
+#
+# If the job is cancelled, the session closes its serial port - whatever esptool
+# is waiting for fails at once - and stops writing at the next block.
+
+class AUxEsptoolSession(object):
+
+    def __init__(self, port:str, chip:str="esp32") -> None:
+
+        object.__init__(self)
+
+        self.port = port
+        self.chip = chip
+        self.esp = None
+        self.reused = False
+
+        self._cancel = cancel_token()
+        self._keep = False
+
+    def connect(self, before:str="default_reset", stub:bool=True) -> None:
+
+        print("Serial port {}".format(self.port))
+
+        with span("take pooled connection") as pooled:
+            self.esp = session_pool().take(self.port, self.chip)
+            self.reused = self.esp is not None
+            pooled.set(reused=self.reused)
+
+        if self.reused:
+            print("Using the open connection ({})".format("stub" if self.esp.IS_STUB else "ROM"))
+        elif self.chip in esptool.CHIP_DEFS:
+            # what get_default_connected_device() does for a known chip, in its two steps
+            with span("open port"):
+                self.esp = esptool.CHIP_DEFS[self.chip](self.port, esptool.loader.ESPLoader.ESP_ROM_BAUD)
+            try:
+                with span("sync", before=before):
+                    self.esp.connect(before, esptool.loader.DEFAULT_CONNECT_ATTEMPTS)
+            except Exception:
+                self.esp._port.close()
+                self.esp = None
+                raise
+        else:
+            with span("open port and sync", before=before):
+                self.esp = esptool.get_default_connected_device([self.port], port=self.port,
+                                                                connect_attempts=esptool.loader.DEFAULT_CONNECT_ATTEMPTS,
+                                                                initial_baud=esptool.loader.ESPLoader.ESP_ROM_BAUD,
+                                                                chip=self.chip, before=before)
+            if self.esp is None:
+                raise esptool.util.FatalError("Could not connect to an Espressif device on {}".format(self.port))
+
+        self._cancel.add_hook(self._abort)
+
+        with span("read chip info"):
+            chip = self.esp.get_chip_description()
+            features = self.esp.get_chip_features()
+            crystal = self.esp.get_crystal_freq()
+            mac = ":".join("{:02x}".format(b) for b in self.esp.read_mac())
+
+        print("Chip is {}".format(chip))
+        print("Features: {}".format(", ".join(features)))
+        print("Crystal is {}MHz".format(crystal))
+        print("MAC: {}".format(mac))
+
+        emit_event(AxEvent.EVENT_CHIP, chip=chip, features=features, crystal_mhz=crystal)
+        emit_event(AxEvent.EVENT_MAC, mac=mac)
+
+        if stub and not self.esp.IS_STUB:
+            with span("stub"):
+                self.esp = self.esp.run_stub()
+
+    @property
+    def baud(self) -> int:
+
+        return self.esp._port.baudrate
+
+    def change_baud(self, baud:int) -> None:
+
+        if baud != self.baud:
+            with span("change baud", baud=baud):
+                self.esp.change_baud(baud)
+
+                # make sure the link works at the new rate before trusting it with a write
+                self.esp.read_reg(esptool.loader.ESPLoader.CHIP_DETECT_MAGIC_REG_ADDR, timeout=_LINK_CHECK_TIMEOUT)
+
+    def flash_size(self) -> str:
+        """Detect the flash size - returns a string like "4MB", or None if unknown"""
+        with span("detect flash size"):
+            flash_id = self.esp.flash_id()
+        size = esptool.cmds.DETECTED_FLASH_SIZES.get((flash_id >> 16) & 0xFF)
+        print("Detected flash size: {}".format(size if size is not None else "Unknown"))
+
+        emit_event(AxEvent.EVENT_FLASH_SIZE, flash_size=size,
+                   flash_size_mb=esptool.util.flash_size_bytes(size) // (1024 * 1024) if size is not None else 0)
+
+        return size
+
+    #------------------------------------------------------
+    # write_flash()
+    #
+    # Write a list of (address, filename) images, the same as esptool's write_flash.
+    # The bootloader header gets the flash mode/frequency/size, and each image is
+    # MD5 checked once written.
+    #
+    # The prepared (patched, compressed and hashed) images come from the image
+    # cache (au_image_cache.py), so flashing the same build again skips that work.
+    #
+    # Each write is sent compressed or not, at the level that gets it there soonest
+    # for this link and host (see au_compress.py) - or at a fixed level (0 is
+    # uncompressed) if compression is set to one.
+    #
+    # With differential set, each image is first MD5 checked on the device. Images
+    # that match are skipped, and of the others only the DIFF_BLOCK_SIZE blocks that
+    # differ are written.
+    #
+    # Returns the write rate achieved in bytes/s (uncompressed), 0 if nothing was written.
+
+    def write_flash(self, images:list, flash_mode:str="dio", flash_freq:str="80m", flash_size:str="detect",
+                    cache=None, differential:bool=False, compression=AUTO_COMPRESSION) -> float:
+
+        if flash_size == "detect":
+            flash_size = self.flash_size() or "4MB"
+
+        self.esp.flash_set_parameters(esptool.util.flash_size_bytes(flash_size))
+
+        if cache is None:
+            cache = image_cache()
+
+        with span("prepare images") as prepare:
+            image_set = cache.get(self.esp, images, self.chip, flash_mode, flash_freq, flash_size)
+            prepare.set(cached=image_set.cached)
+        if image_set.cached:
+            print("Using cached images {}".format(image_set.key[:16]))
+
+        # the (payload, address, size, offset into the image) writes to make
+        writes = []
+        for payload in image_set.payloads:
+            if differential:
+                with span("compare " + payload.name, address=payload.address, size=payload.size):
+                    writes.extend(self._changed_writes(payload))
+            else:
+                writes.append((payload, payload.address, payload.size, 0))
+
+        planner = AUxCompressionPlanner(self.baud, compression)
+        total = sum(size for _, _, size, _ in writes)
+        written = 0
+        start = time.time()
+        plan = None
+
+        for payload, address, uncsize, offset in writes:
+
+            # a whole image has its compressed data in the cache
+            whole = offset == 0 and uncsize == payload.size
+            with span("compress", size=uncsize) as compress:
+                plan = planner.plan(payload.name, uncsize,
+                                    lambda: payload.data()[offset:offset + uncsize],
+                                    payload.compressed if whole else None)
+                compress.set(level=plan.level, cached=plan.cached, compressed=len(plan.data))
+
+            t = time.time()
+            with span("write " + payload.name, address=address, size=uncsize, sent=len(plan.data)):
+                if plan.compressed:
+                    self._write_compressed(address, uncsize, plan.data, written, total, start)
+                else:
+                    self._write_plain(address, plan.data, written, total, start)
+            written += uncsize
+
+            t = time.time() - t
+            planner.sent(plan, t)
+
+            print("Wrote %d bytes (%d %s) at 0x%08x in %.1f seconds (effective %.1f kbit/s)..."
+                  % (uncsize, len(plan.data),
+                     "uncompressed" if not plan.compressed else "compressed, level %d%s"
+                     % (plan.level, ", cached" if plan.cached else ""),
+                     address, t, uncsize / t * 8 / 1000 if t > 0 else 0))
+            if plan.compressed:
+                print("Compression %s %.2f seconds against sending it uncompressed"
+                      % ("saved" if plan.saved_seconds >= 0 else "cost", abs(plan.saved_seconds)))
+
+            emit_event(AxEvent.EVENT_COMPRESSION, name=plan.name, address=address, level=plan.level,
+                       cached=plan.cached, size=uncsize, compressed=len(plan.data),
+                       compress_seconds=plan.compress_seconds, est_seconds=plan.est_seconds,
+                       raw_seconds=plan.raw_seconds, seconds=plan.seconds, link_bytes_per_sec=plan.link_rate)
+
+        elapsed = time.time() - start
+
+        # check every image that was written to, once
+        for payload in image_set.payloads:
+            if not any(written_payload is payload for written_payload, _, _, _ in writes):
+                continue
+
+            with span("md5 check " + payload.name, address=payload.address, size=payload.size):
+                res = self.esp.flash_md5sum(payload.address, payload.size)
+            if res != payload.md5:
+                print("File  md5: %s" % payload.md5)
+                print("Flash md5: %s" % res)
+                raise esptool.util.FatalError("MD5 of file does not match data in flash!")
+            print("Hash of data verified.")
+
+        print("\nLeaving...")
+
+        # leave flash mode, but stay in the stub - finishing the way the last write was sent
+        self.esp.flash_begin(0, 0)
+        if plan is not None and plan.compressed:
+            self.esp.flash_defl_finish(False)
+        else:
+            self.esp.flash_finish(False)
+
+        return written / elapsed if written > 0 and elapsed > 0 else 0.0
+
+    # send zlib compressed data - the stub inflates it as it goes
+    def _write_compressed(self, address:int, uncsize:int, compressed:bytes, written:int, total:int,
+                          start:float) -> None:
+
+        blocks = self.esp.flash_defl_begin(uncsize, len(compressed), address)
+        decompress = zlib.decompressobj()
+        timeout = esptool.loader.DEFAULT_TIMEOUT
+        image_written = 0
+
+        for seq in range(blocks):
+            check_cancelled()
+            block = compressed[seq * self.esp.FLASH_WRITE_SIZE:(seq + 1) * self.esp.FLASH_WRITE_SIZE]
+            print("Writing at 0x%08x... (%d %%)" % (address + image_written, 100 * (seq + 1) // blocks))
+
+            block_uncompressed = len(decompress.decompress(block))
+            image_written += block_uncompressed
+            self.esp.flash_defl_block(block, seq, timeout=timeout)
+            # the stub ACKs a block when received, then writes it while receiving the next
+            timeout = max(esptool.loader.DEFAULT_TIMEOUT,
+                          esptool.loader.timeout_per_mb(esptool.loader.ERASE_WRITE_TIMEOUT_PER_MB,
+                                                        block_uncompressed))
+
+            self._progress(address, written + image_written, total, start)
+
+        # wait until the last block is actually written out to flash
+        self.esp.read_reg(esptool.loader.ESPLoader.CHIP_DETECT_MAGIC_REG_ADDR, timeout=timeout)
+
+    # send data as is - the last block is padded to a full one, as esptool does
+    def _write_plain(self, address:int, data:bytes, written:int, total:int, start:float) -> None:
+
+        blocks = self.esp.flash_begin(len(data), address)
+        timeout = esptool.loader.DEFAULT_TIMEOUT
+        image_written = 0
+
+        for seq in range(blocks):
+            check_cancelled()
+            block = data[seq * self.esp.FLASH_WRITE_SIZE:(seq + 1) * self.esp.FLASH_WRITE_SIZE]
+            print("Writing at 0x%08x... (%d %%)" % (address + image_written, 100 * (seq + 1) // blocks))
+
+            image_written += len(block)
+            block += b"\xff" * (self.esp.FLASH_WRITE_SIZE - len(block))
+            self.esp.flash_block(block, seq, timeout=timeout)
+            timeout = max(esptool.loader.DEFAULT_TIMEOUT,
+                          esptool.loader.timeout_per_mb(esptool.loader.ERASE_WRITE_TIMEOUT_PER_MB, len(block)))
+
+            self._progress(address, written + image_written, total, start)
+
+        self.esp.read_reg(esptool.loader.ESPLoader.CHIP_DETECT_MAGIC_REG_ADDR, timeout=timeout)
 
-    def run_job(self, job:AxJob):
+    @staticmethod
+    def _progress(address:int, written:int, total:int, start:float) -> None:
+
+        elapsed = time.time() - start
+        emit_event(AxEvent.EVENT_PROGRESS, address=address, written=written, total=total,
+                   percent=100 * written // total, bytes_per_sec=written / elapsed if elapsed > 0 else 0.0)
 
-        try:
-            esptool.main(job.command)
+    #------------------------------------------------------
+    # verify_flash()
+    #
+    # Check each (address, filename) image against the flash by MD5 - the digest is
+    # worked out on the device, so nothing is read back. The host side digests come
+    # from the image cache, so they are only computed once per build.
+    #
+    # Returns a list of (name, address, ok), and emits EVENT_VERIFY for each region.
 
-        except Exception:
-            return 1
+    def verify_flash(self, images:list, flash_mode:str="dio", flash_freq:str="80m", flash_size:str="detect",
+                     cache=None) -> list:
 
-        return 0
+        if flash_size == "detect":
+            flash_size = self.flash_size() or "4MB"
+
+        self.esp.flash_set_parameters(esptool.util.flash_size_bytes(flash_size))
+
+        if cache is None:
+            cache = image_cache()
+
+        with span("prepare images"):
+            image_set = cache.get(self.esp, images, self.chip, flash_mode, flash_freq, flash_size)
+
+        results = []
+        for payload in image_set.payloads:
+
+            check_cancelled()
+            with span("verify " + payload.name, address=payload.address, size=payload.size):
+                digest = self.esp.flash_md5sum(payload.address, payload.size)
+            ok = digest == payload.md5
+
+            print("Verify %s at 0x%08x (%d bytes): %s" % (payload.name, payload.address, payload.size,
+                                                          "OK" if ok else "FAILED"))
+            emit_event(AxEvent.EVENT_VERIFY, name=payload.name, address=payload.address, size=payload.size,
+                       ok=ok, expected=payload.md5, actual=digest)
+
+            results.append((payload.name, payload.address, ok))
+
+        return results
+
+    #------------------------------------------------------
+    # _changed_writes()
+    #
+    # The writes needed to bring one image on the device up to date - none if it
+    # already matches, otherwise one per run of differing blocks.
+
+    def _changed_writes(self, payload) -> list:
+
+        if self.esp.flash_md5sum(payload.address, payload.size) == payload.md5:
+            print("%s at 0x%08x is up to date, skipping" % (payload.name, payload.address))
+            return []
+
+        if payload.size <= DIFF_BLOCK_SIZE:
+            return [(payload, payload.address, payload.size, 0)]
+
+        runs = []
+        for index, digest in enumerate(payload.block_md5s(DIFF_BLOCK_SIZE)):
+            offset = index * DIFF_BLOCK_SIZE
+            length = min(DIFF_BLOCK_SIZE, payload.size - offset)
+            if self.esp.flash_md5sum(payload.address + offset, length) == digest:
+                continue
+
+            if runs and runs[-1][0] + runs[-1][1] == offset:
+                runs[-1][1] += length
+            else:
+                runs.append([offset, length])
+
+        changed = sum(length for _, length in runs)
+        print("%s at 0x%08x: %d of %d bytes differ" % (payload.name, payload.address, changed, payload.size))
+
+        return [(payload, payload.address + offset, length, offset) for offset, length in runs]
+
+    def erase_flash(self) -> None:
+
+        print("Erasing flash (this may take a while)...")
+        t = time.time()
+        with span("erase flash"):
+            self.esp.erase_flash()
+        print("Chip erase completed successfully in {:.1f}s".format(time.time() - t))
+
+    def hard_reset(self) -> None:
+
+        # the ESP32 leaves the bootloader - there is nothing to keep
+        self._keep = False
+        with span("reset"):
+            self.esp.hard_reset()
+
+    # hand the connection to the session pool on close() - the ESP32 is still in
+    # the bootloader, ready for the next job
+    def keep(self) -> None:
+
+        self._keep = True
+
+    # the end of a job that leaves the ESP32 in the bootloader: keep the connection
+    # if another job for the port is queued, else reset the ESP32 - as esptool does
+    # after a command - so it runs its firmware again
+    def keep_or_reset(self) -> None:
+
+        if job_queued(self.port):
+            self.keep()
+        else:
+            print("Resetting ESP32\n")
+            self.hard_reset()
+
+    # cancel hook - runs on the watchdog thread
+    def _abort(self) -> None:
+
+        esp = self.esp
+        if esp is not None:
+            esp._port.close()
+
+    def close(self) -> None:
+
+        self._cancel.remove_hook(self._abort)
 
-class AUxEsptoolUploadFirmware(AxAction):
+        if self.esp is not None:
+            if self._keep and not self._cancel.cancelled:
+                session_pool().put(self.port, self.chip, self.esp)
+            else:
+                try:
+                    self.esp._port.close()
+                except Exception:
+                    pass
+            self.esp = None
+            self._keep = False
 
-    ACTION_ID = "esptool-upload-firmware"
+# The detected flash size in MB - 16 if it could not be detected
+def _flash_size_mb(size:str) -> int:
+
+    flashSize = int(size[:-2]) if size in ("4MB", "8MB", "16MB") else 0
+
+    if flashSize == 0:
+        print("Flash size not detected! Defaulting to 16MB\n")
+        flashSize = 16
+    else:
+        print("Flash size is " + str(flashSize) + "MB\n")
+
+    return flashSize
+
+# What the firmware image says about itself (see au_image_info.py) - None, with the
+# reason printed, if it is not a firmware image
+def _inspect_firmware(firmware:str):
+
+    try:
+        with span("inspect firmware"):
+            info = image_inspector().inspect(firmware)
+    except (OSError, ValueError) as error:
+        print("{}\n".format(error))
+        return None
+
+    print("Firmware: {}\n".format(info))
+    return info
+
+# Report the images picked for a job - the firmware by hash and variant, the
+# bootloader and partition table by name
+def _firmware_event(firmware:str, info, bootloader:str, partitions:str) -> None:
+
+    emit_event(AxEvent.EVENT_FIRMWARE, firmware=os.path.basename(firmware), sha256=info.sha256,
+               variant=info.variant, bootloader=os.path.basename(bootloader),
+               partitions=os.path.basename(partitions))
+
+#--------------------------------------------------------------------------------------
+# AUxEsptoolFlashDevice
+#
+# Detect flash size, write the bootloader, partition table, boot_app0 and firmware,
+# and hard reset - all over one connection.
+#
+# Job values:
+#
+#   port        - serial port
+#   baud        - upload baud rate (string or int), or AUTO_BAUD to pick the rate
+#                 from the adapter's profile (see au_baud.py), stepping down on failure
+#   max_baud    - highest baud rate to use (optional)
+#   firmware    - firmware file
+#   port_desc   - port description, used for baud rate limits (optional)
+#   force       - upload even if the firmware does not match the chip or flash size (optional)
+#   differential - only write what differs from the flash contents (optional)
+#   verify      - MD5 check every region once the upload is done (optional)
+#   compression - AUTO_COMPRESSION to pick the quickest for each write (the default),
+#                 or a zlib level to always use - 0 sends the data uncompressed (optional)
+#
+# The firmware variant, and so the bootloader and partition table, comes from the
+# firmware image (see au_image_info.py). If the image does not fit the device and
+# force is not set, nothing is written: the status is STATUS_WRONG_FIRMWARE if the
+# image's app descriptor said what it is, or the image is not for the ESP32, and
+# STATUS_SIZE_MISMATCH if the variant was guessed (from a marker string in the
+# image, or its file name). STATUS_VERIFY_FAILED is returned if a region does not
+# verify.
+
+class AUxEsptoolFlashDevice(AxAction):
+
+    ACTION_ID = "esptool-flash-device"
     NAME = "ESP32 Firmware Upload"
 
+    TIMEOUT = 900
+
+    STATUS_SIZE_MISMATCH = 2
+    STATUS_VERIFY_FAILED = 3
+    STATUS_WRONG_FIRMWARE = 4
+
     def __init__(self) -> None:
         super().__init__(self.ACTION_ID, self.NAME)
 
     def run_job(self, job:AxJob):
 
+        info = _inspect_firmware(job.firmware)
+        if info is None:
+            return 1
+
+        if info.chip != "ESP32" and not job.get("force", False):
+            print("The firmware is built for the {}, not the ESP32\n".format(info.chip))
+            return self.STATUS_WRONG_FIRMWARE
+
+        session = AUxEsptoolSession(job.port)
+
         try:
-            esptool.main(job.command)
+            session.connect()
+
+            size = session.flash_size()
+            flashSize = _flash_size_mb(size)
+
+            theBootloaderFileName, thePartitionFileName, firmwareSizeCorrect, sizeMessages, messages = \
+                select_images(job.firmware, flashSize, info)
+            _firmware_event(job.firmware, info, theBootloaderFileName, thePartitionFileName)
+
+            for msg in sizeMessages:
+                print(msg)
 
-        except Exception:
+            if firmwareSizeCorrect == False and not job.get("force", False):
+                if info.certain:
+                    print("This {} does not fit the device\n".format(info.variant_name))
+                    return self.STATUS_WRONG_FIRMWARE
+                print("Firmware and flash size mismatch\n")
+                return self.STATUS_SIZE_MISMATCH
+
+            for msg in messages:
+                print(msg)
+
+            print("Uploading firmware\n")
+
+            images = flash_images(theBootloaderFileName, thePartitionFileName, job.firmware)
+            differential = job.get("differential", False)
+            compression = job.get("compression", AUTO_COMPRESSION)
+
+            if str(job.baud) == AUTO_BAUD:
+                self._write_auto_baud(session, job, images, size, flashSize, differential, compression)
+            else:
+                baud, messages = limit_baud(str(job.baud), job.get("port_desc", ""), flashSize)
+                for msg in messages:
+                    print(msg)
+
+                if job.get("max_baud") and int(baud) > int(job.max_baud):
+                    print("Limiting baud to {}\n".format(job.max_baud))
+                    baud = job.max_baud
+
+                session.change_baud(int(baud))
+
+                bytes_per_sec = session.write_flash(images, flash_size=size or "detect", differential=differential,
+                                                    compression=compression)
+                emit_event(AxEvent.EVENT_BAUD, baud=int(baud), adapter=None, bytes_per_sec=bytes_per_sec)
+
+            verified = True
+            if job.get("verify", False):
+                print("\nVerifying\n")
+                verified = all(ok for _, _, ok in session.verify_flash(images, flash_size=size or "detect"))
+
+            print("Resetting ESP32\n")
+            session.hard_reset()
+
+            if not verified:
+                print("Verify failed\n")
+                return self.STATUS_VERIFY_FAILED
+
+        except Exception as error:
+            print(str(error))
             return 1
 
+        finally:
+            session.close()
+
         return 0
 
-class AUxEsptoolResetESP32(AxAction):
+    #------------------------------------------------------
+    # _write_auto_baud()
+    #
+    # Write at the best rate the adapter's profile offers. If the link or the
+    # write fails, reconnect and carry on at the next rate down - differentially,
+    # so what was already written correctly is not written again.
+
+    def _write_auto_baud(self, session, job, images, size, flashSize, differential, compression) -> None:
+
+        adapter = adapter_id(job.port)
+        profiles = baud_profiles()
+        key = profiles.key(adapter, flashSize)
+        rates = profiles.candidates(key, adapter, job.get("port_desc", ""), flashSize)
+        if job.get("max_baud"):
+            rates = [rate for rate in rates if rate <= int(job.max_baud)] or [min(rates)]
+
+        print("Auto baud rate for adapter {}: {}\n".format(adapter if adapter else "unknown",
+                                                          ", ".join(str(rate) for rate in rates)))
+
+        for attempt, baud in enumerate(rates):
+
+            if attempt > 0:
+                # the link can be in any state after a failure - start again from a reset
+                session.close()
+                session.connect()
+                session.flash_size()
+
+            try:
+                print("Uploading at {} baud\n".format(baud))
+                session.change_baud(baud)
+                bytes_per_sec = session.write_flash(images, flash_size=size or "detect",
+                                                    differential=differential or attempt > 0,
+                                                    compression=compression)
+
+            except (esptool.util.FatalError, serial.SerialException, OSError) as error:
+                # a cancel or timeout closes the port under the write - that is not the baud rate failing
+                check_cancelled()
+
+                profiles.record(key, baud, False)
+                print("Upload at {} baud failed: {}\n".format(baud, error))
+                if attempt == len(rates) - 1:
+                    raise
+                continue
+
+            profiles.record(key, baud, True, bytes_per_sec)
+            emit_event(AxEvent.EVENT_BAUD, baud=baud, adapter=adapter, bytes_per_sec=bytes_per_sec)
+            return
 
-    ACTION_ID = "esptool-reset-esp32"
-    NAME = "ESP32 Reset"
+#--------------------------------------------------------------------------------------
+# AUxEsptoolVerifyFlash
+#
+# Check a device against a firmware file without writing anything: the regions an
+# upload of the firmware would write are MD5 checked on the device.
+#
+# Job values:
+#
+#   port        - serial port
+#   firmware    - firmware file
+#
+# Returns STATUS_VERIFY_FAILED if a region does not match.
+
+class AUxEsptoolVerifyFlash(AxAction):
+
+    ACTION_ID = "esptool-verify-flash"
+    NAME = "ESP32 Flash Verify"
+    TIMEOUT = 300
+
+    STATUS_VERIFY_FAILED = AUxEsptoolFlashDevice.STATUS_VERIFY_FAILED
 
     def __init__(self) -> None:
         super().__init__(self.ACTION_ID, self.NAME)
 
     def run_job(self, job:AxJob):
 
+        info = _inspect_firmware(job.firmware)
+        if info is None:
+            return 1
+
+        session = AUxEsptoolSession(job.port)
+
         try:
-            esptool.main(job.command)
+            session.connect()
+
+            size = session.flash_size()
+            theBootloaderFileName, thePartitionFileName, _, _, _ = select_images(job.firmware, _flash_size_mb(size),
+                                                                                 info)
+            _firmware_event(job.firmware, info, theBootloaderFileName, thePartitionFileName)
 
-        except Exception:
+            results = session.verify_flash(flash_images(theBootloaderFileName, thePartitionFileName, job.firmware),
+                                           flash_size=size or "detect")
+            session.keep_or_reset()
+
+        except Exception as error:
+            print(str(error))
             return 1
 
-        return 0
\ No newline at end of file
+        finally:
+            session.close()
+
+        return 0 if all(ok for _, _, ok in results) else self.STATUS_VERIFY_FAILED
@@ -0,0 +1,113 @@
+from .au_action import AxAction, AxJob, AxEvent, AxCancelled, emit_event, cancel_token, check_cancelled
+from .au_startup import lazy_import
+from .au_sessions import session_pool
+from .au_trace import span
+
+import time
+
+serial = lazy_import("serial") # pip install pyserial
+
+# The ESP32 ROM prints a banner like this on every reset:
+#
+#   rst:0x1 (POWERON_RESET),boot:0x13 (SPI_FAST_FLASH_BOOT)
+#
+# Seeing a complete "boot:" line means the reset has happened and the ESP32 is booting.
+_BOOT_BANNER = b"boot:"
+
+# ROM console baud rate
+_ROM_BAUD = 115200
+
+# Longest time to wait for the boot banner (seconds) - the old fixed wait
+_RESET_TIMEOUT = 5.0
+
+# How long to hold the ESP32 in reset (seconds)
+_RESET_PULSE = 0.1
+
+#--------------------------------------------------------------------------------------
+# AUxSerialResetESP32
+#
+# Reset the ESP32 the TeraTerm way: with the port open, pull RTS low then DTR low.
+# On the RTK auto-reset circuit that pulses EN, and the ESP32 boots normally.
+#
+# Rather than wait a fixed time, the port is watched for the ROM boot banner, and
+# the job finishes as soon as it is seen (or after timeout, if the firmware keeps
+# the console quiet).
+#
+# Job values:
+#
+#   port        - serial port
+#   timeout     - longest wait for the boot banner, seconds (optional)
+#
+# Emits EVENT_RESET with booted (boot banner seen) and seconds.
+
+class AUxSerialResetESP32(AxAction):
+
+    ACTION_ID = "serial-reset-esp32"
+    NAME = "ESP32 Reset"
+    TIMEOUT = 30
+
+    def __init__(self) -> None:
+        super().__init__(self.ACTION_ID, self.NAME)
+
+    def run_job(self, job:AxJob):
+
+        timeout = float(job.get("timeout", _RESET_TIMEOUT))
+
+        # a connection kept open by an earlier job holds the port
+        session_pool().evict(job.port)
+
+        try:
+            ser = serial.serial_for_url(job.port, baudrate=_ROM_BAUD, timeout=0.05, do_not_open=True)
+            ser.dtr = False # DTR High
+            ser.rts = False # RTS High
+            with ser as s:
+                cancel_token().add_hook(s.close)
+                start = time.time()
+                s.rts = True # RTS Low - before DTR
+                time.sleep(_RESET_PULSE)
+                s.dtr = True # DTR Low - after RTS
+
+                with span("wait for boot") as wait:
+                    booted = self._wait_for_boot(s, start + timeout)
+                    wait.set(booted=booted)
+                seconds = time.time() - start
+                cancel_token().remove_hook(s.close)
+
+        except AxCancelled as error:
+            print(str(error))
+            return 1
+
+        except Exception as error:
+            # a cancel closes the port under the read - that is not the port's fault
+            token = cancel_token()
+            if token.cancelled:
+                print("Job {}".format(token.reason))
+            else:
+                print("Could not open serial port: {}\n".format(error))
+            return 1
+
+        if booted:
+            print("ESP32 booted after {:.1f} seconds".format(seconds))
+        else:
+            print("No boot message seen in {:.1f} seconds".format(seconds))
+
+        emit_event(AxEvent.EVENT_RESET, booted=booted, seconds=seconds)
+
+        return 0
+
+    # Read the port until a complete boot banner line arrives, or the deadline passes
+    def _wait_for_boot(self, port, deadline:float) -> bool:
+
+        received = b""
+        while time.time() < deadline:
+            check_cancelled()
+            received += port.read(256)
+
+            banner = received.find(_BOOT_BANNER)
+            if banner >= 0 and received.find(b"\n", banner) >= 0:
+                return True
+
+            # only the tail can hold the start of a banner
+            received = received[-256:]
+
+        return False
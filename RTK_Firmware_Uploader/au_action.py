@@ -12,12 +12,15 @@
 # in a background thread for the artemis_uploader package/application.
 #
 # This file defines key data types for the background processing system.
-# A "Job" type and a "Action" type are defined in this file.
+# A "Job" type, a "Action" type and an "Event" type are defined in this file.
 #
 #    Job - has a type and a list of parameter values for the Job to execute
 #
 #    Action - defines a process type that runs a job
 #
+#    Event - typed, structured data an action reports while it runs a job
+#            (progress, detected flash size, MAC ...)
+#
 # More information on qwiic is at https://www.sparkfun.com/artemis
 #
 # Do you like this library? Help support SparkFun. Buy a board!
@@ -46,6 +49,9 @@
 #
 # pylint: disable=old-style-class, missing-docstring, wrong-import-position
 #
+#-----------------------------------------------------------------------------
+from threading import local, Lock
+
 #-----------------------------------------------------------------------------
 # "actions" - commands that execute a command for the application
 # 
@@ -122,6 +128,10 @@ class AxJob(dict):
 
 class AxAction(object):
 
+	# longest a job of this action may run (seconds) before the worker cancels
+	# it - None for no limit. A job can set its own with a "job_timeout" value.
+	TIMEOUT = None
+
 	def __init__(self, action_id:str, name="") -> None:
 		object.__init__(self)
 		self.action_id = action_id
@@ -129,3 +139,169 @@ class AxAction(object):
 
 	def run_job(self, job:AxJob) -> int:
 		return 1 # error
+
+#--------------------------------------------------------------------------
+# Event class - an event type and its values. Like AxJob, values can be
+# accessed as dictionary items or attributes.
+#
+# Example:
+#
+#  emit_event(AxEvent.EVENT_PROGRESS, written=4096, total=65536, percent=6)
+#
+# The worker running the job adds the job_id, and relays the event to its client.
+
+class AxEvent(dict):
+
+	EVENT_CHIP          = "chip"            # chip, features, crystal_mhz
+	EVENT_MAC           = "mac"             # mac
+	EVENT_FLASH_SIZE    = "flash-size"      # flash_size ("4MB"), flash_size_mb
+	EVENT_PROGRESS      = "progress"        # address, written, total, percent, bytes_per_sec
+	EVENT_BAUD          = "baud"            # baud, adapter, bytes_per_sec - the rate an upload ran at
+	EVENT_RESET         = "reset"           # booted, seconds - boot output seen after a reset, and how soon
+	EVENT_VERIFY        = "verify"          # name, address, size, ok, expected, actual - one per flash region
+	EVENT_FIRMWARE      = "firmware"        # firmware, sha256, variant, bootloader, partitions - the images picked for a job
+	EVENT_COMPRESSION   = "compression"     # name, address, level, cached, size, compressed, compress_seconds, est_seconds, raw_seconds, seconds, link_bytes_per_sec - how a write was sent
+
+	def __init__(self, event_type:str, indict=None):
+
+		if indict is None:
+			indict = {}
+
+		self.event_type = event_type
+
+		# super
+		dict.__init__(self, indict)
+
+		# flag
+		self.__initialized = True
+
+	def __getattr__(self, item):
+
+		try:
+			return self.__getitem__(item)
+		except KeyError:
+			raise AttributeError(item)
+
+	def __setattr__(self, item, value):
+
+		if '_AxEvent__initialized' not in  self.__dict__:  # this test allows attributes to be set in the __init__ method
+			return dict.__setattr__(self, item, value)
+
+		else:
+			self.__setitem__(item, value)
+
+#--------------------------------------------------------------------------
+# Event delivery. The worker sets a sink for the thread running a job; actions
+# (and anything they call) report events with emit_event(). Without a sink,
+# events are dropped.
+
+_event_sink = local()
+
+def set_event_sink(sink):
+	"""Set the event sink for the calling thread - returns the previous one"""
+	previous = getattr(_event_sink, "sink", None)
+	_event_sink.sink = sink
+	return previous
+
+def emit_event(event_type:str, **values) -> None:
+
+	sink = getattr(_event_sink, "sink", None)
+	if sink is not None:
+		sink(AxEvent(event_type, values))
+
+#--------------------------------------------------------------------------
+# Cancellation. The worker gives each job it runs a cancel token, set for the
+# thread running the job. Actions call check_cancelled() at safe points, and
+# register hooks - to close their serial port, say - that are called when the
+# job is cancelled, so a read blocked on a silent device returns at once.
+#
+# Example:
+#
+#  cancel_token().add_hook(port.close)
+#  ...
+#  check_cancelled()
+
+class AxCancelled(Exception):
+	pass
+
+class AxCancelToken(object):
+
+	def __init__(self) -> None:
+		object.__init__(self)
+		self._lock = Lock()
+		self._hooks = []
+		self.reason = None
+
+	@property
+	def cancelled(self) -> bool:
+		return self.reason is not None
+
+	def cancel(self, reason:str="cancelled") -> bool:
+		"""Cancel - returns False if already cancelled"""
+		with self._lock:
+			if self.reason is not None:
+				return False
+			self.reason = reason
+			hooks = list(self._hooks)
+
+		for hook in hooks:
+			try:
+				hook()
+			except Exception:
+				pass
+
+		return True
+
+	def add_hook(self, hook) -> None:
+		with self._lock:
+			if self.reason is None:
+				self._hooks.append(hook)
+				return
+		hook()
+
+	def remove_hook(self, hook) -> None:
+		with self._lock:
+			if hook in self._hooks:
+				self._hooks.remove(hook)
+
+	def check(self) -> None:
+		if self.reason is not None:
+			raise AxCancelled("Job " + self.reason)
+
+_cancel_state = local()
+
+def set_cancel_token(token):
+	"""Set the cancel token for the calling thread - returns the previous one"""
+	previous = getattr(_cancel_state, "token", None)
+	_cancel_state.token = token
+	return previous
+
+def cancel_token() -> AxCancelToken:
+	"""The calling thread's cancel token - one that is never cancelled outside a job"""
+	token = getattr(_cancel_state, "token", None)
+	return token if token is not None else AxCancelToken()
+
+def check_cancelled() -> None:
+	"""Raise AxCancelled if the calling thread's job has been cancelled"""
+	token = getattr(_cancel_state, "token", None)
+	if token is not None:
+		token.check()
+
+#--------------------------------------------------------------------------
+# Queued jobs. The worker sets, for the thread running a job, a function that
+# tells whether another job for a port is waiting in its queue - so an action
+# can leave the device ready for that job rather than reset it. Outside a
+# worker, nothing is queued.
+
+_queue_state = local()
+
+def set_queued_jobs(queued):
+	"""Set the queued jobs lookup for the calling thread - returns the previous one"""
+	previous = getattr(_queue_state, "queued", None)
+	_queue_state.queued = queued
+	return previous
+
+def job_queued(port:str) -> bool:
+	"""True if another job for port is waiting to run after the calling thread's job"""
+	queued = getattr(_queue_state, "queued", None)
+	return queued is not None and queued(port)
@@ -0,0 +1,350 @@
+#-----------------------------------------------------------------------------
+# au_async.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# asyncio API - for driving the uploader from other Python programs, such as
+# a production test executive.
+#
+# Each call queues a job on a worker pool (one worker per port, so different
+# devices are flashed at the same time) and returns a future that the pool
+# completes from its worker thread. Nothing blocks while waiting, so any
+# number of devices can be driven from one event loop. The result is an
+# AUxJobResult - the status, plus what the job found out (chip, MAC, flash
+# size, firmware, verify results) and, if it failed, its output.
+#
+# Cancelling the awaiting task cancels the job.
+#
+# Example:
+#
+#   import asyncio
+#   from RTK_Firmware_Uploader import flash_device, read_mac
+#
+#   async def main():
+#       results = await asyncio.gather(
+#           flash_device("/dev/ttyUSB0", "RTK_Everywhere_Firmware_v1_6.bin", verify=True),
+#           flash_device("/dev/ttyUSB1", "RTK_Everywhere_Firmware_v1_6.bin", verify=True))
+#       for result in results:
+#           print(result.port, result.ok, result.mac, result.error)
+#
+#   asyncio.run(main())
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import time
+import asyncio
+from threading import Lock
+
+from .au_action import AxJob, AxEvent
+from .au_worker import AUxWorkerPool
+from .au_act_esptool import AUxEsptoolFlashDevice, AUxEsptoolEraseFlash, AUxEsptoolReadMAC, AUxEsptoolVerifyFlash
+from .au_act_serial import AUxSerialResetESP32
+from .au_baud import AUTO_BAUD
+from .au_compress import AUTO_COMPRESSION
+from .au_ports import port_registry
+from .au_audit import AUxAuditRecorder, audit_log
+
+# why a job failed, by status
+_STATUS_ERRORS = {AUxWorkerPool.STATUS_CANCELLED: "cancelled",
+                  AUxWorkerPool.STATUS_TIMEOUT: "timed out",
+                  AUxEsptoolFlashDevice.STATUS_SIZE_MISMATCH: "firmware and flash size mismatch",
+                  AUxEsptoolFlashDevice.STATUS_VERIFY_FAILED: "verify failed",
+                  AUxEsptoolFlashDevice.STATUS_WRONG_FIRMWARE: "firmware is not for this device"}
+
+#--------------------------------------------------------------------------------------
+# AUxJobResult
+#
+# The outcome of one job. Values the job did not get to are None.
+
+class AUxJobResult(object):
+
+    _FIELDS = ["job_id", "action", "port", "status", "ok", "error", "seconds", "chip", "mac", "flash_size",
+               "firmware", "sha256", "variant", "baud", "booted", "verify", "log"]
+
+    def __init__(self, job: AxJob) -> None:
+
+        object.__init__(self)
+
+        self.job_id = job.job_id
+        self.action = job.action_id
+        self.port = job.port
+        self.status = None
+        self.ok = False
+        self.error = None
+        self.seconds = None
+        self.chip = None
+        self.mac = None
+        self.flash_size = None
+        self.firmware = None
+        self.sha256 = None
+        self.variant = None
+        self.baud = None
+        self.booted = None
+        self.verify = []            # EVENT_VERIFY values, one per flash region
+        self.log = None             # the job's output (stdout and stderr), if it failed
+        self.events = []            # every event of the job, in order
+
+        self._started = time.monotonic()
+
+    def _event(self, event: AxEvent) -> None:
+
+        self.events.append(event)
+
+        if event.event_type == AxEvent.EVENT_CHIP:
+            self.chip = event.chip
+        elif event.event_type == AxEvent.EVENT_MAC:
+            self.mac = event.mac
+        elif event.event_type == AxEvent.EVENT_FLASH_SIZE:
+            self.flash_size = event.flash_size
+        elif event.event_type == AxEvent.EVENT_FIRMWARE:
+            self.firmware = event.firmware
+            self.sha256 = event.sha256
+            self.variant = event.variant
+        elif event.event_type == AxEvent.EVENT_BAUD:
+            self.baud = event.baud
+        elif event.event_type == AxEvent.EVENT_RESET:
+            self.booted = event.booted
+        elif event.event_type == AxEvent.EVENT_VERIFY:
+            self.verify.append({"name": event.name, "address": event.address, "size": event.size, "ok": event.ok})
+
+    def _finished(self, status: int, log: str=None) -> None:
+
+        self.status = status
+        self.ok = status == 0
+        self.seconds = round(time.monotonic() - self._started, 2)
+        if status != 0:
+            self.error = _STATUS_ERRORS.get(status, "failed with status {}".format(status))
+            self.log = log
+
+    def to_dict(self) -> dict:
+
+        return {field: getattr(self, field) for field in self._FIELDS}
+
+    def __bool__(self) -> bool:
+
+        return self.ok
+
+    def __repr__(self) -> str:
+
+        return "<AUxJobResult {} on {}: {}>".format(self.action, self.port, "OK" if self.ok else self.error)
+
+#--------------------------------------------------------------------------------------
+# AUxAsyncUploader
+#
+# Runs jobs on a worker pool of its own, and completes a future for each on the
+# event loop that submitted it. Several event loops (in different threads) can
+# share one uploader.
+#
+# on_event(event) and on_message(port, text), if given, are called on the event
+# loop of the job, for progress reporting.
+
+class AUxAsyncUploader(object):
+
+    def __init__(self, audit: bool=True, on_event=None, on_message=None) -> None:
+
+        object.__init__(self)
+
+        self._on_event = on_event
+        self._on_message = on_message
+
+        self._lock = Lock()
+        self._pending = {}          # job id -> (loop, future, AUxJobResult)
+
+        self._pool = AUxWorkerPool(self._on_worker_callback, AUxAuditRecorder(audit_log()) if audit else None)
+        self._pool.add_action(AUxEsptoolFlashDevice(), AUxEsptoolEraseFlash(), AUxEsptoolReadMAC(),
+                              AUxEsptoolVerifyFlash(), AUxSerialResetESP32())
+
+    def close(self) -> None:
+        """Cancel whatever is running and stop the workers"""
+        self._pool.shutdown()
+
+    async def __aenter__(self):
+
+        return self
+
+    async def __aexit__(self, *args) -> None:
+
+        self.close()
+
+    #------------------------------------------------------
+    # The operations
+
+    async def flash_device(self, port: str, firmware: str, baud: str=AUTO_BAUD, force: bool=False,
+                           differential: bool=False, verify: bool=False, max_baud: int=None,
+                           compression=AUTO_COMPRESSION, timeout: float=None) -> AUxJobResult:
+        """Detect the flash size, upload the firmware and reset"""
+        info = port_registry().get(port)
+        return await self.run_job(AxJob(AUxEsptoolFlashDevice.ACTION_ID,
+                                        {"port": port, "baud": str(baud), "firmware": firmware, "force": force,
+                                         "differential": differential, "verify": verify, "max_baud": max_baud,
+                                         "compression": compression,
+                                         "port_desc": info.description if info is not None else ""}), timeout)
+
+    async def verify(self, port: str, firmware: str, timeout: float=None) -> AUxJobResult:
+        """Check the flash matches a firmware file (by MD5) without writing"""
+        return await self.run_job(AxJob(AUxEsptoolVerifyFlash.ACTION_ID, {"port": port, "firmware": firmware}),
+                                  timeout)
+
+    async def read_mac(self, port: str, timeout: float=None) -> AUxJobResult:
+        """Read the WiFi MAC address - in result.mac"""
+        return await self.run_job(AxJob(AUxEsptoolReadMAC.ACTION_ID, {"port": port}), timeout)
+
+    async def erase(self, port: str, timeout: float=None) -> AUxJobResult:
+        """Erase the whole flash"""
+        return await self.run_job(AxJob(AUxEsptoolEraseFlash.ACTION_ID, {"port": port}), timeout)
+
+    async def reset(self, port: str, timeout: float=None) -> AUxJobResult:
+        """Reset the ESP32 - result.booted says if it was seen booting"""
+        return await self.run_job(AxJob(AUxSerialResetESP32.ACTION_ID, {"port": port}), timeout)
+
+    #------------------------------------------------------
+    # Run a job and wait for it - without blocking the event loop. timeout, in
+    # seconds, replaces the action's own deadline.
+
+    async def run_job(self, job: AxJob, timeout: float=None) -> AUxJobResult:
+
+        if timeout is not None:
+            job.job_timeout = timeout
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        result = AUxJobResult(job)
+
+        with self._lock:
+            self._pending[job.job_id] = (loop, future, result)
+
+        self._pool.add_job(job)
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            self._pool.cancel(job_id=job.job_id)
+            raise
+        finally:
+            with self._lock:
+                self._pending.pop(job.job_id, None)
+
+        return result
+
+    #------------------------------------------------------
+    # Callback from the worker pool - runs on a worker thread, so everything is
+    # handed to the job's event loop
+
+    def _on_worker_callback(self, *args):
+
+        if len(args) < 2:
+            return
+
+        msg_type = args[0]
+        if msg_type == AUxWorkerPool.TYPE_EVENT:
+            self._call_soon(args[1].job_id, self._job_event, args[1])
+
+        elif msg_type == AUxWorkerPool.TYPE_FINISHED and len(args) >= 4:
+            status, job_id = args[1], args[3]
+            log = None
+            if status != 0:
+                theLog = self._pool.job_log(job_id)
+                log = theLog.text() if theLog is not None else None
+            self._call_soon(job_id, self._job_finished, status, log)
+
+        elif msg_type == AUxWorkerPool.TYPE_MESSAGE and len(args) >= 3 and self._on_message is not None:
+            with self._lock:
+                loops = {loop for loop, _, _ in self._pending.values()}
+            for loop in loops:
+                self._call_loop(loop, self._on_message, args[2], args[1])
+
+    def _call_soon(self, job_id: int, function, *args) -> None:
+
+        with self._lock:
+            pending = self._pending.get(job_id)
+
+        if pending is not None:
+            self._call_loop(pending[0], function, pending, *args)
+
+    @staticmethod
+    def _call_loop(loop, function, *args) -> None:
+
+        try:
+            loop.call_soon_threadsafe(function, *args)
+        except RuntimeError:
+            pass        # the loop is closed - no one is waiting any more
+
+    def _job_event(self, pending, event: AxEvent) -> None:
+
+        _, _, result = pending
+        result._event(event)
+
+        if self._on_event is not None:
+            self._on_event(event)
+
+    @staticmethod
+    def _job_finished(pending, status: int, log: str) -> None:
+
+        _, future, result = pending
+        result._finished(status, log)
+
+        if not future.done():
+            future.set_result(result)
+
+#--------------------------------------------------------------------------------------
+# The uploader used by the functions below - shared by everything in this process
+
+_async_uploader = None
+_async_uploader_lock = Lock()
+
+def async_uploader() -> AUxAsyncUploader:
+
+    global _async_uploader
+
+    with _async_uploader_lock:
+        if _async_uploader is None:
+            _async_uploader = AUxAsyncUploader()
+
+    return _async_uploader
+
+async def flash_device(port: str, firmware: str, **options) -> AUxJobResult:
+    """Upload firmware - see AUxAsyncUploader.flash_device() for the options"""
+    return await async_uploader().flash_device(port, firmware, **options)
+
+async def verify(port: str, firmware: str, timeout: float=None) -> AUxJobResult:
+
+    return await async_uploader().verify(port, firmware, timeout)
+
+async def read_mac(port: str, timeout: float=None) -> AUxJobResult:
+
+    return await async_uploader().read_mac(port, timeout)
+
+async def erase(port: str, timeout: float=None) -> AUxJobResult:
+
+    return await async_uploader().erase(port, timeout)
+
+async def reset(port: str, timeout: float=None) -> AUxJobResult:
+
+    return await async_uploader().reset(port, timeout)
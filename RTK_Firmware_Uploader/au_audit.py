@@ -0,0 +1,393 @@
+#-----------------------------------------------------------------------------
+# au_audit.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Audit log - a permanent record of every job the uploader runs.
+#
+# The console only shows what happened as text, and it is gone when the window
+# closes. Here each job gets one row in a SQLite database: when and where it
+# ran, its exit status, the device (MAC, chip, flash size), the firmware (by
+# SHA-256) and bootloader/partition variant, the baud rate and write rate, and
+# how long each phase took. Rows are only ever added.
+#
+# AUxAuditRecorder builds the rows - give it to AUxWorker / AUxWorkerPool and
+# it is told about every job and its events. AUxAuditLog stores and queries
+# them, with CSV and JSON lines export, and yield/throughput totals by day,
+# hour, port, firmware, host or action.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import sys
+import csv
+import json
+import time
+import platform
+from datetime import datetime
+from threading import Lock
+
+from .au_action import AxEvent
+from .au_upload import user_data_dir
+from .au_startup import lazy_import
+
+sqlite3 = lazy_import("sqlite3")
+
+# The columns of a record, in export order
+AUDIT_FIELDS = ["id", "time", "seconds", "queued", "host", "port", "action", "status", "mac", "chip",
+                "flash_size", "firmware", "sha256", "bootloader", "partitions", "baud", "bytes_per_sec",
+                "verified", "phases"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id              INTEGER PRIMARY KEY,
+    started         REAL NOT NULL,      -- unix time
+    seconds         REAL,               -- start to finish
+    queued          REAL,               -- queue to start latency
+    host            TEXT,
+    port            TEXT,
+    action          TEXT,
+    status          INTEGER,
+    mac             TEXT,
+    chip            TEXT,
+    flash_size      TEXT,
+    firmware        TEXT,
+    sha256          TEXT,
+    bootloader      TEXT,
+    partitions      TEXT,
+    baud            INTEGER,
+    bytes_per_sec   REAL,
+    verified        INTEGER,            -- NULL if not verified
+    phases          TEXT                -- JSON {phase: seconds}
+);
+CREATE INDEX IF NOT EXISTS jobs_started ON jobs (started);
+CREATE INDEX IF NOT EXISTS jobs_mac ON jobs (mac);
+"""
+
+# stats() groupings
+_GROUPS = {"day": "date(started, 'unixepoch', 'localtime')",
+           "hour": "strftime('%Y-%m-%d %H:00', started, 'unixepoch', 'localtime')",
+           "port": "port",
+           "firmware": "firmware",
+           "host": "host",
+           "action": "action"}
+
+# The phases of a job, in order, and the mark that ends each one. A phase whose
+# mark was not seen is folded into the next.
+_PHASES = [("connect", AxEvent.EVENT_CHIP),
+           ("detect", AxEvent.EVENT_FLASH_SIZE),
+           ("prepare", "first-progress"),
+           ("write", AxEvent.EVENT_BAUD),
+           ("verify", AxEvent.EVENT_VERIFY),
+           ("finish", "finished")]
+
+# relative time units for parse_time()
+_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 604800}
+
+#--------------------------------------------------------------------------------------
+# parse_time()
+#
+# A time for a query - an ISO date/time ("2026-10-17", "2026-10-17 06:00") or a
+# time ago ("30m", "8h", "2d", "1w"). Returns unix time; raises ValueError.
+
+def parse_time(text: str) -> float:
+
+    text = text.strip()
+    if len(text) > 1 and text[-1] in _UNITS and text[:-1].replace(".", "", 1).isdigit():
+        return time.time() - float(text[:-1]) * _UNITS[text[-1]]
+
+    return datetime.fromisoformat(text).timestamp()
+
+#--------------------------------------------------------------------------------------
+# AUxAuditLog
+#
+# The record store - a SQLite database, opened on first use. Safe to use from
+# several threads, and from several uploaders at once.
+
+class AUxAuditLog(object):
+
+    def __init__(self, filename: str) -> None:
+
+        object.__init__(self)
+
+        self.filename = filename
+
+        self._lock = Lock()
+        self._db = None
+
+    def _connect(self):
+
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.filename) or ".", exist_ok=True)
+            db = sqlite3.connect(self.filename, timeout=10, check_same_thread=False)
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(_SCHEMA)
+            self._db = db
+
+        return self._db
+
+    def close(self) -> None:
+
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+    #------------------------------------------------------
+    # record()
+    #
+    # Add a record (a dict with keys from AUDIT_FIELDS, plus "started" - unix
+    # time). Returns its id.
+
+    def record(self, values: dict) -> int:
+
+        values = dict(values)
+        if isinstance(values.get("phases"), dict):
+            values["phases"] = json.dumps(values["phases"])
+        if values.get("verified") is not None:
+            values["verified"] = int(bool(values["verified"]))
+
+        columns = ["started"] + [field for field in AUDIT_FIELDS if field not in ("id", "time") and field in values]
+
+        with self._lock:
+            db = self._connect()
+            with db:
+                cursor = db.execute("INSERT INTO jobs ({}) VALUES ({})".format(", ".join(columns),
+                                                                              ", ".join("?" * len(columns))),
+                                    [values.get(column) for column in columns])
+            return cursor.lastrowid
+
+    # WHERE clause and its parameters for query() and stats()
+    @staticmethod
+    def _where(since, until, port, mac, action, failed) -> tuple:
+
+        clauses = []
+        params = []
+        if since is not None:
+            clauses.append("started >= ?")
+            params.append(since)
+        if until is not None:
+            clauses.append("started < ?")
+            params.append(until)
+        if port is not None:
+            clauses.append("port = ?")
+            params.append(port)
+        if mac is not None:
+            clauses.append("mac = ?")
+            params.append(mac.lower())
+        if action is not None:
+            clauses.append("action = ?")
+            params.append(action)
+        if failed is not None:
+            clauses.append("status != 0" if failed else "status = 0")
+
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), params
+
+    #------------------------------------------------------
+    # query()
+    #
+    # Records matching all the given filters, oldest first - or, with limit, the
+    # newest limit records. since/until are unix times; failed=True for only the
+    # failed jobs, False for only the good ones.
+
+    def query(self, since: float=None, until: float=None, port: str=None, mac: str=None, action: str=None,
+              failed: bool=None, limit: int=None) -> list:
+
+        where, params = self._where(since, until, port, mac, action, failed)
+        sql = "SELECT *, datetime(started, 'unixepoch', 'localtime') AS time FROM jobs" + where + " ORDER BY id"
+        if limit is not None:
+            sql = "SELECT * FROM ({} DESC LIMIT {:d}) ORDER BY id".format(sql, limit)
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        records = []
+        for row in rows:
+            record = {field: row[field] for field in AUDIT_FIELDS}
+            record["phases"] = json.loads(record["phases"]) if record["phases"] else {}
+            if record["verified"] is not None:
+                record["verified"] = bool(record["verified"])
+            records.append(record)
+
+        return records
+
+    #------------------------------------------------------
+    # stats()
+    #
+    # Yield and throughput per group (see _GROUPS): jobs, passed, failed, yield
+    # (percent passed), average job time and average write rate.
+
+    def stats(self, group: str="day", since: float=None, until: float=None, port: str=None, action: str=None) -> list:
+
+        if group not in _GROUPS:
+            raise ValueError("unknown group '{}' (use {})".format(group, ", ".join(_GROUPS)))
+
+        where, params = self._where(since, until, port, None, action, None)
+        sql = ("SELECT {} AS grp, COUNT(*) AS jobs, SUM(status = 0) AS passed, SUM(status != 0) AS failed, "
+               "AVG(seconds) AS seconds, AVG(bytes_per_sec) AS bytes_per_sec "
+               "FROM jobs{} GROUP BY grp ORDER BY grp").format(_GROUPS[group], where)
+
+        with self._lock:
+            rows = self._connect().execute(sql, params).fetchall()
+
+        return [{group: row["grp"],
+                 "jobs": row["jobs"],
+                 "passed": row["passed"],
+                 "failed": row["failed"],
+                 "yield": round(100.0 * row["passed"] / row["jobs"], 1),
+                 "seconds": round(row["seconds"], 2) if row["seconds"] is not None else None,
+                 "bytes_per_sec": round(row["bytes_per_sec"]) if row["bytes_per_sec"] is not None else None}
+                for row in rows]
+
+#--------------------------------------------------------------------------------------
+# Export - records (from query()) or stats rows to a text stream
+
+def export_csv(rows: list, out) -> None:
+
+    if not rows:
+        return
+
+    writer = csv.DictWriter(out, fieldnames=list(rows[0].keys()), lineterminator="\n")
+    writer.writeheader()
+    for row in rows:
+        if isinstance(row.get("phases"), dict):
+            row = dict(row, phases=" ".join("{}={}".format(phase, seconds) for phase, seconds in row["phases"].items()))
+        writer.writerow(row)
+
+def export_jsonl(rows: list, out) -> None:
+
+    for row in rows:
+        out.write(json.dumps(row) + "\n")
+
+#--------------------------------------------------------------------------------------
+# AUxAuditRecorder
+#
+# Builds a record for each job from what the worker tells it, and adds it to the
+# log when the job finishes. Called on the worker threads.
+#
+# Example:
+#
+#   worker = AUxWorkerPool(callback, recorder=AUxAuditRecorder(audit_log()))
+
+class AUxAuditRecorder(object):
+
+    def __init__(self, log: AUxAuditLog) -> None:
+
+        object.__init__(self)
+
+        self._log = log
+        self._host = platform.node()
+
+        self._lock = Lock()
+        self._jobs = {}         # job id -> (record, marks)
+
+    def job_started(self, job, latency: float) -> None:
+
+        record = {"started": time.time(), "queued": round(latency, 4), "host": self._host,
+                  "port": job.get("port"), "action": job.action_id}
+
+        with self._lock:
+            self._jobs[job.job_id] = (record, {"started": time.monotonic()})
+
+    def job_event(self, job, event: AxEvent) -> None:
+
+        with self._lock:
+            entry = self._jobs.get(job.job_id)
+        if entry is None:
+            return
+
+        record, marks = entry
+        now = time.monotonic()
+
+        if event.event_type == AxEvent.EVENT_PROGRESS:
+            marks.setdefault("first-progress", now)
+            return
+
+        marks[event.event_type] = now
+
+        if event.event_type == AxEvent.EVENT_CHIP:
+            record["chip"] = event.chip
+        elif event.event_type == AxEvent.EVENT_MAC:
+            record["mac"] = event.mac.lower()
+        elif event.event_type == AxEvent.EVENT_FLASH_SIZE:
+            record["flash_size"] = event.flash_size
+        elif event.event_type == AxEvent.EVENT_FIRMWARE:
+            record.update(firmware=event.firmware, sha256=event.sha256, bootloader=event.bootloader,
+                          partitions=event.partitions)
+        elif event.event_type == AxEvent.EVENT_BAUD:
+            record.update(baud=event.baud, bytes_per_sec=round(event.bytes_per_sec))
+        elif event.event_type == AxEvent.EVENT_VERIFY:
+            record["verified"] = record.get("verified", True) and bool(event.ok)
+
+    def job_finished(self, job, status: int) -> None:
+
+        with self._lock:
+            entry = self._jobs.pop(job.job_id, None)
+        if entry is None:
+            return
+
+        record, marks = entry
+        marks["finished"] = time.monotonic()
+
+        record["status"] = status
+        record["seconds"] = round(marks["finished"] - marks["started"], 3)
+
+        phases = {}
+        previous = marks["started"]
+        for phase, mark in _PHASES:
+            if mark in marks and marks[mark] >= previous:
+                phases[phase] = round(marks[mark] - previous, 3)
+                previous = marks[mark]
+        record["phases"] = phases
+
+        try:
+            self._log.record(record)
+        except (sqlite3.Error, OSError) as error:
+            print("Could not write the audit log {}: {}".format(self._log.filename, error), file=sys.__stderr__)
+
+#--------------------------------------------------------------------------------------
+# audit_log()
+#
+# The audit log shared by everything in this process
+
+_audit_log = None
+_audit_log_lock = Lock()
+
+def audit_log() -> AUxAuditLog:
+
+    global _audit_log
+
+    with _audit_log_lock:
+        if _audit_log is None:
+            _audit_log = AUxAuditLog(os.path.join(user_data_dir(), "audit.sqlite3"))
+
+    return _audit_log
@@ -0,0 +1,440 @@
+#-----------------------------------------------------------------------------
+# au_batch.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Batch jobs - flash a number of devices from a manifest file.
+#
+# A manifest (JSON, or YAML if PyYAML is installed) lists the devices, by
+# port or USB serial number, and what to do with each. The runner expands
+# it into AxJobs and runs them on a worker pool, so the devices are done at
+# the same time. Each device's steps run in order; a failed step is retried
+# before the device is given up on. At the end a summary is written.
+#
+# Example manifest (YAML):
+#
+#   defaults:
+#     baud: auto            # or a baud rate
+#     max_baud: 921600      # optional limit
+#     retries: 1            # attempts after the first, per step
+#     timeout: 600          # longest a step may run, seconds (optional)
+#     verify: true          # upload options - also force, differential, compression
+#     actions: [upload, read_mac]
+#
+#   devices:
+#     - port: /dev/ttyUSB0
+#       firmware: RTK_Surveyor_Firmware_v4_1.bin
+#     - serial: 5A7B003141          # USB serial number of the adapter
+#       firmware: RTK_Everywhere_Firmware_v1_6.bin
+#       actions: [erase, upload, read_mac, reset]
+#
+#   summary: summary.json   # optional - where to write the summary
+#
+# Actions: erase, upload, verify, read_mac, reset. Relative firmware paths
+# are relative to the manifest.
+#
+# The summary of a device that failed includes the full output (stdout and
+# stderr) of the step that failed, in "log".
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import sys
+import json
+import time
+from threading import Lock, Event
+
+from .au_action import AxJob, AxEvent
+from .au_worker import AUxWorkerPool
+from .au_act_esptool import AUxEsptoolFlashDevice, AUxEsptoolEraseFlash, AUxEsptoolReadMAC, AUxEsptoolVerifyFlash
+from .au_act_serial import AUxSerialResetESP32
+from .au_baud import AUTO_BAUD
+from .au_compress import AUTO_COMPRESSION
+from .au_ports import port_registry
+from .au_audit import AUxAuditRecorder, audit_log
+
+# manifest action name -> action id
+BATCH_ACTIONS = {"erase": AUxEsptoolEraseFlash.ACTION_ID,
+                 "upload": AUxEsptoolFlashDevice.ACTION_ID,
+                 "verify": AUxEsptoolVerifyFlash.ACTION_ID,
+                 "read_mac": AUxEsptoolReadMAC.ACTION_ID,
+                 "reset": AUxSerialResetESP32.ACTION_ID}
+
+# actions that need a firmware file
+_FIRMWARE_ACTIONS = ("upload", "verify")
+
+_DEFAULTS = {"baud": AUTO_BAUD,
+             "max_baud": None,
+             "retries": 1,
+             "timeout": None,
+             "force": False,
+             "differential": False,
+             "verify": False,
+             "compression": AUTO_COMPRESSION,
+             "actions": ["upload"]}
+
+#--------------------------------------------------------------------------------------
+# load_manifest()
+#
+# Read and check a manifest file. Raises ValueError if it is not valid.
+
+def load_manifest(filename: str) -> dict:
+
+    with open(filename, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    if filename.lower().endswith((".yml", ".yaml")):
+        try:
+            import yaml # pip install pyyaml
+        except ImportError:
+            raise ValueError("YAML manifests need PyYAML (pip install pyyaml) - or use JSON")
+        manifest = yaml.safe_load(text)
+    else:
+        manifest = json.loads(text)
+
+    if not isinstance(manifest, dict) or not isinstance(manifest.get("devices"), list) or not manifest["devices"]:
+        raise ValueError("{}: a manifest needs a list of devices".format(filename))
+
+    base = os.path.dirname(os.path.abspath(filename))
+    defaults = dict(_DEFAULTS)
+    defaults.update(manifest.get("defaults") or {})
+
+    devices = []
+    for index, entry in enumerate(manifest["devices"]):
+        if not isinstance(entry, dict):
+            raise ValueError("{}: device {} is not a mapping".format(filename, index + 1))
+
+        device = dict(defaults)
+        device.update(entry)
+
+        if not device.get("port") and not device.get("serial"):
+            raise ValueError("{}: device {} needs a port or a serial".format(filename, index + 1))
+
+        for action in device["actions"]:
+            if action not in BATCH_ACTIONS:
+                raise ValueError("{}: device {}: unknown action '{}' (use {})".format(
+                    filename, index + 1, action, ", ".join(BATCH_ACTIONS)))
+            if action in _FIRMWARE_ACTIONS and not device.get("firmware"):
+                raise ValueError("{}: device {}: '{}' needs a firmware file".format(filename, index + 1, action))
+
+        if device.get("firmware"):
+            device["firmware"] = os.path.join(base, device["firmware"])
+
+        devices.append(device)
+
+    summary = manifest.get("summary")
+    if summary:
+        summary = os.path.join(base, summary)
+
+    return {"devices": devices, "summary": summary, "filename": filename}
+
+#--------------------------------------------------------------------------------------
+# AUxBatchDevice
+#
+# One device of a batch, and how it is getting on
+
+class AUxBatchDevice(object):
+
+    def __init__(self, index: int, values: dict) -> None:
+
+        object.__init__(self)
+
+        self.index = index
+        self.values = values
+        self.port = values.get("port")
+        self.serial = values.get("serial")
+        self.name = values.get("name") or self.serial or self.port
+
+        self.step = 0
+        self.attempts = 0
+        self.steps = []         # results - {action, status, attempts, seconds}
+        self.mac = None
+        self.verify = []        # EVENT_VERIFY results
+        self.error = None
+        self.log = None         # output of the step that failed
+        self.done = False
+
+        self.started = None
+        self.finished = None
+        self._step_started = None
+
+    @property
+    def action(self) -> str:
+
+        return self.values["actions"][self.step]
+
+    @property
+    def ok(self) -> bool:
+
+        return self.done and self.error is None
+
+    def job(self) -> AxJob:
+
+        values = {"port": self.port}
+        if self.action == "upload":
+            values.update({"baud": self.values["baud"], "firmware": self.values["firmware"],
+                           "force": self.values["force"], "differential": self.values["differential"],
+                           "verify": self.values["verify"], "max_baud": self.values["max_baud"],
+                           "compression": self.values["compression"]})
+            info = port_registry().get(self.port)
+            values["port_desc"] = info.description if info is not None else ""
+        elif self.action == "verify":
+            values["firmware"] = self.values["firmware"]
+
+        if self.values["timeout"]:
+            values["job_timeout"] = self.values["timeout"]
+
+        return AxJob(BATCH_ACTIONS[self.action], values)
+
+    def summary(self) -> dict:
+
+        return {"name": self.name,
+                "port": self.port,
+                "serial": self.serial,
+                "firmware": self.values.get("firmware"),
+                "ok": self.ok,
+                "error": self.error,
+                "mac": self.mac,
+                "seconds": round(self.finished - self.started, 2) if self.started and self.finished else None,
+                "steps": self.steps,
+                "verify": self.verify,
+                "log": self.log}
+
+#--------------------------------------------------------------------------------------
+# AUxBatchRunner
+#
+# Runs a loaded manifest. out gets progress lines - a line per step, or with
+# verbose all the worker output, each line prefixed with its port.
+#
+# Example:
+#
+#   runner = AUxBatchRunner(load_manifest("fleet.yaml"))
+#   summary = runner.run()
+
+class AUxBatchRunner(object):
+
+    def __init__(self, manifest: dict, out=None, verbose: bool=False, audit: bool=True) -> None:
+
+        object.__init__(self)
+
+        self._manifest = manifest
+        self._out = out if out is not None else sys.__stdout__
+        self._verbose = verbose
+        self._audit = audit
+
+        self._lock = Lock()
+        self._done = Event()
+
+        self.devices = [AUxBatchDevice(index, values) for index, values in enumerate(manifest["devices"])]
+
+        self._jobs = {}         # job id -> device
+        self._partial = {}      # port -> incomplete output line
+        self._cancelled = False
+
+        self._pool = None
+
+    def _write(self, line: str) -> None:
+
+        with self._lock:
+            self._out.write(line + "\n")
+            self._out.flush()
+
+    #------------------------------------------------------
+    # run()
+    #
+    # Run the batch to the end. Returns the summary (see summary()), and writes it
+    # to the manifest's summary file if it has one.
+
+    def run(self) -> dict:
+
+        started = time.time()
+
+        ports = set()
+        for device in self.devices:
+            device.started = time.time()
+
+            if device.port is None:
+                info = port_registry().by_serial(str(device.serial))
+                if info is None:
+                    self._finish(device, "no device with serial {}".format(device.serial))
+                    continue
+                device.port = info.device
+            # pyserial URLs (socket://, rfc2217://) are not in the registry
+            elif "://" not in device.port and device.port not in port_registry():
+                self._finish(device, "port {} not found".format(device.port))
+                continue
+
+            if device.port in ports:
+                self._finish(device, "port {} is in the manifest more than once".format(device.port))
+                continue
+            ports.add(device.port)
+
+        self._pool = AUxWorkerPool(self.on_worker_callback, AUxAuditRecorder(audit_log()) if self._audit else None)
+        self._pool.add_action(AUxEsptoolFlashDevice(), AUxEsptoolEraseFlash(), AUxEsptoolReadMAC(),
+                              AUxEsptoolVerifyFlash(), AUxSerialResetESP32())
+
+        try:
+            for device in self.devices:
+                if not device.done:
+                    self._submit(device)
+
+            self._check_done()
+            try:
+                while not self._done.wait(0.5):
+                    pass
+            except KeyboardInterrupt:
+                self._write("Cancelling...")
+                self._cancelled = True
+                self._pool.cancel()
+                self._done.wait()
+
+        finally:
+            self._pool.shutdown()
+
+        summary = self.summary(time.time() - started)
+
+        if self._manifest.get("summary"):
+            with open(self._manifest["summary"], "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+
+        return summary
+
+    def summary(self, seconds: float=None) -> dict:
+
+        devices = [device.summary() for device in self.devices]
+
+        return {"manifest": self._manifest.get("filename"),
+                "seconds": round(seconds, 2) if seconds is not None else None,
+                "passed": sum(1 for device in devices if device["ok"]),
+                "failed": sum(1 for device in devices if not device["ok"]),
+                "devices": devices}
+
+    #------------------------------------------------------
+    # Scheduling - one step of a device at a time, on its port's worker
+
+    def _submit(self, device: AUxBatchDevice) -> None:
+
+        device.attempts += 1
+        device._step_started = time.time()
+
+        job = device.job()
+        with self._lock:
+            self._jobs[job.job_id] = device
+
+        self._pool.add_job(job, device.port)
+
+    def _finish(self, device: AUxBatchDevice, error: str=None) -> None:
+
+        device.error = error
+        device.done = True
+        device.finished = time.time()
+
+        self._write("[{}] {}".format(device.name, "FAILED - " + error if error else "done"))
+
+    def _check_done(self) -> None:
+
+        if all(device.done for device in self.devices):
+            self._done.set()
+
+    def _step_finished(self, device: AUxBatchDevice, status: int, job_id: int) -> None:
+
+        seconds = time.time() - device._step_started
+        self._write("[{}] {}: {} ({:.1f}s{})".format(device.name, device.action, "OK" if status == 0 else
+                                                    "failed, status {}".format(status), seconds,
+                                                    ", attempt {}".format(device.attempts) if device.attempts > 1 else ""))
+
+        if status != 0 and device.attempts <= int(device.values["retries"]) and not self._cancelled and \
+                status not in (AUxEsptoolFlashDevice.STATUS_SIZE_MISMATCH, AUxEsptoolFlashDevice.STATUS_WRONG_FIRMWARE,
+                               AUxWorkerPool.STATUS_CANCELLED):
+            self._submit(device)
+            return
+
+        device.steps.append({"action": device.action, "status": status, "attempts": device.attempts,
+                             "seconds": round(seconds, 2)})
+
+        if status != 0:
+            log = self._pool.job_log(job_id)
+            device.log = log.text() if log is not None else None
+            self._finish(device, "{} failed with status {}".format(device.action, status))
+        elif device.step + 1 >= len(device.values["actions"]):
+            self._finish(device)
+        elif self._cancelled:
+            self._finish(device, "cancelled")
+        else:
+            device.step += 1
+            device.attempts = 0
+            self._submit(device)
+
+        self._check_done()
+
+    #------------------------------------------------------
+    # callback function for the worker pool - runs on the worker threads
+
+    def on_worker_callback(self, *args):
+
+        if len(args) < 2:
+            return
+
+        msg_type = args[0]
+        if msg_type == AUxWorkerPool.TYPE_MESSAGE:
+            if self._verbose and len(args) >= 3:
+                self._output(args[2], args[1])
+
+        elif msg_type == AUxWorkerPool.TYPE_EVENT:
+            event = args[1]
+            with self._lock:
+                device = self._jobs.get(event.job_id)
+            if device is None:
+                return
+
+            if event.event_type == AxEvent.EVENT_MAC:
+                device.mac = event.mac
+            elif event.event_type == AxEvent.EVENT_VERIFY:
+                device.verify.append({"name": event.name, "address": event.address, "ok": event.ok})
+
+        elif msg_type == AUxWorkerPool.TYPE_FINISHED and len(args) >= 4:
+            with self._lock:
+                device = self._jobs.pop(args[3], None)
+            if device is not None:
+                self._step_finished(device, args[1], args[3])
+
+    # worker output, a line at a time with the port in front
+    def _output(self, port: str, msg: str) -> None:
+
+        with self._lock:
+            text = self._partial.get(port, "") + msg
+            lines = text.split("\n")
+            self._partial[port] = lines.pop()
+
+        for line in lines:
+            line = line.split("\r")[-1]
+            if line.strip():
+                self._write("[{}] {}".format(port, line))
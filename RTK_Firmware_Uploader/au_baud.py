@@ -0,0 +1,230 @@
+#-----------------------------------------------------------------------------
+# au_baud.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Automatic upload baud rate, learnt per USB-UART adapter.
+#
+# How fast an upload can run depends on the USB-UART chip, the host and the
+# board. Rather than guess, "auto" starts at the fastest rate the adapter
+# is known to manage and steps down when a write or verify fails. The
+# outcome is recorded per host, adapter (USB VID:PID) and flash size, so the
+# next upload starts at the best rate that worked. If that fails too, a
+# rate that failed is not tried again for a week. The known limits (MacOS,
+# the RTK Torch's CH342 with 16MB flash - see limit_baud()) are kept,
+# unless a faster rate has worked there.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import json
+import time
+import platform
+from threading import Lock
+
+from .au_upload import limit_baud, user_cache_dir
+from .au_ports import port_registry
+
+# The baud rate value that selects automatic baud rate
+AUTO_BAUD = "auto"
+
+# The rates auto baud picks from, fastest first
+AUTO_BAUD_RATES = [3000000, 2000000, 1500000, 921600, 460800, 230400, 115200]
+
+# Fastest rate for each USB-UART chip, by VID:PID. Anything else starts at _DEFAULT_MAX_BAUD.
+_ADAPTER_MAX_BAUD = {
+    "10C4:EA60": 921600,    # CP210x - the CP2102N can go faster, the CP2102 cannot
+    "1A86:7523": 2000000,   # CH340
+    "1A86:55D4": 2000000,   # CH9102
+    "1A86:55D3": 3000000,   # CH343
+    "1A86:55D2": 3000000,   # CH342
+    "0403:6001": 3000000,   # FT232R
+    "0403:6010": 3000000,   # FT2232
+    "0403:6015": 3000000,   # FT231X
+}
+_DEFAULT_MAX_BAUD = 921600
+
+# A rate that failed is not tried again for this long (seconds)
+_RETRY_FAILED_AFTER = 7 * 24 * 3600
+
+#--------------------------------------------------------------------------------------
+# adapter_id()
+#
+# The "VID:PID" of the USB-UART adapter behind a serial port, or None if it is
+# not a USB port (or no longer there).
+
+def adapter_id(port: str) -> str:
+
+    info = port_registry().get(port)
+
+    return info.usb_id if info is not None else None
+
+#--------------------------------------------------------------------------------------
+# AUxBaudProfiles
+#
+# The baud rate history of each host/adapter/flash size combination. Thread safe,
+# and saved to a JSON file after every change.
+#
+# Example:
+#
+#   profiles = baud_profiles()
+#   key = profiles.key(adapter_id(port), 16)
+#   for baud in profiles.candidates(key, adapter_id(port)):
+#       ... try the upload, then
+#       profiles.record(key, baud, ok, bytes_per_sec)
+
+class AUxBaudProfiles(object):
+
+    def __init__(self, filename: str=None) -> None:
+
+        object.__init__(self)
+
+        self._filename = filename
+        self._lock = Lock()
+        self._profiles = {}
+
+        if self._filename is not None:
+            try:
+                with open(self._filename, "r", encoding="utf-8") as f:
+                    self._profiles = json.load(f)
+            except (OSError, ValueError):
+                self._profiles = {}
+
+    @staticmethod
+    def key(adapter: str, flashSize: int) -> str:
+
+        return "{}/{}/{}MB".format(platform.system(), adapter if adapter else "unknown", flashSize)
+
+    #------------------------------------------------------
+    # candidates()
+    #
+    # The rates to try, best first. The first is the fastest rate that last worked
+    # (best()); with none, the fastest the adapter can do - but never above the
+    # known host/board limits of limit_baud(), unless a faster rate has worked with
+    # this profile. Rates that failed recently (and have not worked since) are left out.
+
+    def candidates(self, key: str, adapter: str, portDescription: str="", flashSize: int=0) -> list:
+
+        max_baud = _ADAPTER_MAX_BAUD.get(adapter, _DEFAULT_MAX_BAUD)
+
+        with self._lock:
+            rates = dict(self._profiles.get(key, {}).get("rates", {}))
+
+        limited, _ = limit_baud(str(_DEFAULT_MAX_BAUD), portDescription, flashSize)
+        if int(limited) < _DEFAULT_MAX_BAUD:
+            worked = [int(baud) for baud, history in rates.items() if history.get("ok", 0) > 0]
+            max_baud = min(max_baud, max([int(limited)] + worked))
+
+        best = self.best(key)
+        if best is not None:
+            max_baud = min(max_baud, best)
+
+        now = time.time()
+        result = []
+        for baud in AUTO_BAUD_RATES:
+            if baud > max_baud:
+                continue
+
+            history = rates.get(str(baud), {})
+            if history.get("last_fail", 0) > history.get("last_ok", 0) and \
+                    now - history["last_fail"] < _RETRY_FAILED_AFTER:
+                continue
+
+            result.append(baud)
+
+        # always leave the slowest rate to fall back on
+        if not result:
+            result.append(AUTO_BAUD_RATES[-1])
+
+        return result
+
+    def best(self, key: str) -> int:
+        """The fastest rate that last worked, or None"""
+        with self._lock:
+            return self._profiles.get(key, {}).get("best")
+
+    def record(self, key: str, baud: int, ok: bool, bytes_per_sec: float=0) -> None:
+
+        with self._lock:
+            profile = self._profiles.setdefault(key, {"rates": {}})
+            history = profile["rates"].setdefault(str(baud), {"ok": 0, "fail": 0})
+
+            if ok:
+                history["ok"] += 1
+                history["last_ok"] = time.time()
+                if bytes_per_sec > 0:
+                    history["bytes_per_sec"] = round(bytes_per_sec)
+                if profile.get("best") is None or baud > profile["best"]:
+                    profile["best"] = baud
+            else:
+                history["fail"] += 1
+                history["last_fail"] = time.time()
+                if profile.get("best") == baud:
+                    profile.pop("best")
+
+            self._save()
+
+    def profiles(self) -> dict:
+
+        with self._lock:
+            return json.loads(json.dumps(self._profiles))
+
+    def _save(self) -> None:
+
+        if self._filename is None:
+            return
+
+        temp = "{}.{}.tmp".format(self._filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self._filename), exist_ok=True)
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump(self._profiles, f, indent=1, sort_keys=True)
+            os.replace(temp, self._filename)
+        except OSError:
+            pass
+
+#--------------------------------------------------------------------------------------
+# baud_profiles()
+#
+# The baud rate profiles shared by everything in this process
+
+_baud_profiles = None
+_baud_profiles_lock = Lock()
+
+def baud_profiles() -> AUxBaudProfiles:
+
+    global _baud_profiles
+
+    with _baud_profiles_lock:
+        if _baud_profiles is None:
+            _baud_profiles = AUxBaudProfiles(os.path.join(user_cache_dir(), "baud_profiles.json"))
+
+    return _baud_profiles
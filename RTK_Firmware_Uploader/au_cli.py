@@ -0,0 +1,599 @@
+#-----------------------------------------------------------------------------
+# au_cli.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Headless (command line) version of the RTK Firmware Uploader.
+#
+# Runs the same detect flash -> write_flash -> reset job as the GUI,
+# using the same background worker and esptool actions, but never imports
+# PyQt5 - so it starts quickly and runs without a display. Intended for
+# scripts on fixture PCs and CI rigs.
+#
+# Example:
+#
+#   RTK_Firmware_Upload_CLI --port /dev/ttyUSB0 upload RTK_Everywhere_Firmware_v1_0.bin
+#   RTK_Firmware_Upload_CLI --port COM7 read_mac
+#   RTK_Firmware_Upload_CLI list
+#   RTK_Firmware_Upload_CLI batch fleet.yaml --summary summary.json
+#   RTK_Firmware_Upload_CLI log --since 8h --stats hour
+#   RTK_Firmware_Upload_CLI inspect RTK_Everywhere_Firmware_v1_0.bin
+#   RTK_Firmware_Upload_CLI sweep read_mac --csv rack.csv
+#   RTK_Firmware_Upload_CLI library --dir builds --product RTK_Everywhere --latest
+#
+# Exit status is 0 on success, 1 on failure.
+#
+# With --events FILE, the structured events from the job (chip, MAC, flash
+# size, progress) are also written to FILE as JSON lines ("-" for stdout).
+#
+# Ctrl-C cancels the running job. --timeout sets the longest a job may run
+# (the default depends on the job - see TIMEOUT in the actions).
+#
+# With --job-log FILE, the full output of a job that fails - stdout and stderr,
+# which is not shown on the console - is written to FILE.
+#
+# Every job is recorded in the audit log (see au_audit.py) unless --no-audit
+# is given. The log subcommand queries and exports it.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import sys
+import json
+import argparse
+from threading import Event
+
+from .au_worker import AUxWorker
+from .au_action import AxJob, AxEvent
+from .au_act_esptool import AUxEsptoolFlashDevice, AUxEsptoolEraseFlash, AUxEsptoolReadMAC, AUxEsptoolVerifyFlash
+from .au_act_serial import AUxSerialResetESP32
+from .au_upload import get_version
+from .au_baud import AUTO_BAUD
+from .au_compress import AUTO_COMPRESSION
+from .au_ports import port_registry
+from .au_batch import load_manifest, AUxBatchRunner, BATCH_ACTIONS
+from .au_audit import AUxAuditRecorder, AUxAuditLog, audit_log, parse_time, export_csv, export_jsonl
+from .au_image_info import image_inspector
+from .au_sweep import SWEEP_ACTIONS, AUxSweep, sweep_ports, run_sweep
+from .au_sessions import session_pool
+from .au_trace import AUxTracer, set_job_tracer
+from .au_library import firmware_library
+
+_APP_NAME = "RTK Firmware Uploader"
+
+#--------------------------------------------------------------------------------------
+# Command line uploader - submits jobs to a background worker and waits for each
+# one to finish
+
+class AUxUploaderCLI(object):
+
+    def __init__(self, out=None, events=None, audit=True, timeout=None, jobLog=None):
+
+        object.__init__(self)
+
+        # worker output is relayed from the worker thread - write it to the real console
+        self._out = out if out is not None else sys.__stdout__
+
+        # stream for JSON lines events, if wanted
+        self._events = events
+
+        self.macAddress = "UNKNOWN"
+
+        # job deadline in seconds - None for each action's default
+        self._timeout = timeout
+
+        # file for the output of a failed job, if wanted
+        self._jobLog = jobLog
+
+        self._done = Event()
+        self._status = 1
+
+        self._worker = AUxWorker(self.on_worker_callback, AUxAuditRecorder(audit_log()) if audit else None)
+        self._worker.add_action(AUxEsptoolFlashDevice(), AUxSerialResetESP32(), AUxEsptoolEraseFlash(), \
+                                AUxEsptoolReadMAC(), AUxEsptoolVerifyFlash())
+
+    def shutdown(self):
+
+        self._worker.shutdown()
+        session_pool().close_all()
+
+    def writeMessage(self, msg: str) -> None:
+
+        self._out.write(msg + "\n")
+        self._out.flush()
+
+    #--------------------------------------------------------------
+    # callback function for the background worker - runs on the worker thread
+
+    def on_worker_callback(self, *args):
+
+        if len(args) < 2:
+            return
+
+        msg_type = args[0]
+        if msg_type == AUxWorker.TYPE_MESSAGE:
+            msg = args[1]
+            self._out.write(msg)
+            self._out.flush()
+
+        elif msg_type == AUxWorker.TYPE_EVENT:
+            event = args[1]
+            if event.event_type == AxEvent.EVENT_MAC:
+                self.macAddress = event.mac
+
+            if self._events is not None:
+                self._events.write(json.dumps(dict(event, event=event.event_type)) + "\n")
+                self._events.flush()
+
+        elif msg_type == AUxWorker.TYPE_FINISHED:
+            self._status = args[1]
+            self._done.set()
+
+    #--------------------------------------------------------------
+    # Run one job to completion. Returns the job status (0 = OKAY). Ctrl-C cancels
+    # the job - the worker's watchdog makes sure it finishes soon after.
+
+    def run_job(self, action_id: str, values: dict) -> int:
+
+        theJob = AxJob(action_id, values)
+        if self._timeout is not None:
+            theJob.job_timeout = self._timeout
+
+        self._done.clear()
+        self._worker.add_job(theJob)
+        try:
+            # wait in steps, so Ctrl-C is seen on Windows too
+            while not self._done.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            self.writeMessage("\nCancelling...")
+            self._worker.cancel()
+            self._done.wait()
+
+        if self._status != 0 and self._jobLog is not None:
+            log = self._worker.job_log(theJob.job_id)
+            if log is not None:
+                with open(self._jobLog, "w", encoding="utf-8") as f:
+                    f.write(log.text())
+                self.writeMessage("Job output written to " + self._jobLog)
+
+        return self._status
+
+    #--------------------------------------------------------------
+    # The operations
+
+    def upload(self, port: str, baud: str, firmware: str, force: bool=False, portDescription: str="",
+               differential: bool=False, verify: bool=False, compression=AUTO_COMPRESSION) -> int:
+
+        try:
+            with open(firmware, "rb"):
+                pass
+        except IOError:
+            self.writeMessage("File Not Found")
+            return 1
+
+        self.writeMessage("Detecting flash size and uploading firmware\n")
+
+        status = self.run_job(AUxEsptoolFlashDevice.ACTION_ID, {"port":port, "baud":baud, "firmware":firmware,
+                                                                 "force":force, "port_desc":portDescription,
+                                                                 "differential":differential, "verify":verify,
+                                                                 "compression":compression})
+
+        # No one to ask - only continue on a mismatch if told to up front
+        if status == AUxEsptoolFlashDevice.STATUS_SIZE_MISMATCH:
+            self.writeMessage("Use --force to upload anyway")
+        elif status == AUxEsptoolFlashDevice.STATUS_WRONG_FIRMWARE:
+            self.writeMessage("This firmware is not for this device - use --force to upload anyway")
+        elif status == AUxEsptoolFlashDevice.STATUS_VERIFY_FAILED:
+            self.writeMessage("Firmware verify failed")
+        elif status == 0:
+            self.writeMessage("Firmware upload complete. Reset complete...")
+        else:
+            self.writeMessage("Firmware upload failed")
+
+        return status
+
+    def verify(self, port: str, firmware: str) -> int:
+
+        try:
+            with open(firmware, "rb"):
+                pass
+        except IOError:
+            self.writeMessage("File Not Found")
+            return 1
+
+        self.writeMessage("Verifying firmware\n")
+        status = self.run_job(AUxEsptoolVerifyFlash.ACTION_ID, {"port":port, "firmware":firmware})
+        if status == 0:
+            self.writeMessage("Verify complete - all regions match")
+        elif status == AUxEsptoolVerifyFlash.STATUS_VERIFY_FAILED:
+            self.writeMessage("Verify failed")
+        return status
+
+    def reset(self, port: str) -> int:
+
+        self.writeMessage("Resetting ESP32\n")
+        status = self.run_job(AUxSerialResetESP32.ACTION_ID, {"port":port})
+        if status == 0:
+            self.writeMessage("Reset complete...")
+        return status
+
+    def erase(self, port: str) -> int:
+
+        self.writeMessage("Erasing flash\n")
+        status = self.run_job(AUxEsptoolEraseFlash.ACTION_ID, {"port":port})
+        if status == 0:
+            self.writeMessage("Flash erase complete...")
+        return status
+
+    def read_mac(self, port: str) -> int:
+
+        self.writeMessage("Reading WiFi MAC address\n")
+        status = self.run_job(AUxEsptoolReadMAC.ACTION_ID, {"port":port})
+        if status == 0:
+            self.writeMessage("Read MAC complete...")
+            self.writeMessage("WiFi MAC Address is {}".format(self.macAddress))
+        return status
+
+#--------------------------------------------------------------------------------------
+# batch()
+#
+# Run a batch manifest (see au_batch.py). Exit status is 0 only if every
+# device got through all its steps.
+
+def batch(manifest: str, summaryFile: str=None, verbose: bool=False, audit: bool=True) -> int:
+
+    try:
+        loaded = load_manifest(manifest)
+    except (OSError, ValueError) as error:
+        print("Could not load manifest: {}".format(error))
+        return 1
+
+    if summaryFile is not None:
+        loaded["summary"] = summaryFile
+
+    summary = AUxBatchRunner(loaded, verbose=verbose, audit=audit).run()
+
+    print("\n{} passed, {} failed in {:.1f} seconds".format(summary["passed"], summary["failed"],
+                                                           summary["seconds"]))
+    for device in summary["devices"]:
+        print("  {:<20} {:<6} {}".format(device["name"], "OK" if device["ok"] else "FAILED",
+                                        device["mac"] or device["error"] or ""))
+
+    return 0 if summary["failed"] == 0 else 1
+
+#--------------------------------------------------------------------------------------
+# log()
+#
+# Query the audit log - print, or export, the matching records or, with stats,
+# the yield and throughput per group.
+
+def log(args) -> int:
+
+    theLog = AUxAuditLog(args.file) if args.file else audit_log()
+
+    try:
+        since = parse_time(args.since) if args.since else None
+        until = parse_time(args.until) if args.until else None
+    except ValueError as error:
+        print("Invalid time: {}".format(error))
+        return 1
+
+    action = BATCH_ACTIONS.get(args.action, args.action)
+
+    if args.stats:
+        rows = theLog.stats(args.stats, since=since, until=until, port=args.port, action=action)
+    else:
+        rows = theLog.query(since=since, until=until, port=args.port, mac=args.mac, action=action,
+                            failed=True if args.failed else None, limit=args.limit)
+
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            export_csv(rows, f)
+    elif args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            export_jsonl(rows, f)
+    elif args.stats:
+        print("{:<20} {:>6} {:>6} {:>6} {:>7} {:>9} {:>10}".format(args.stats, "jobs", "passed", "failed",
+                                                                "yield", "seconds", "bytes/s"))
+        for row in rows:
+            print("{:<20} {:>6} {:>6} {:>6} {:>6}% {:>9} {:>10}".format(str(row[args.stats]), row["jobs"],
+                                                                       row["passed"], row["failed"], row["yield"],
+                                                                       str(row["seconds"]),
+                                                                       str(row["bytes_per_sec"])))
+    else:
+        for row in rows:
+            print("{}  {:<22} {:<20} {:>3}  {:<17}  {:<5} {:<32} {:>7}s".format(
+                row["time"], row["port"] or "", row["action"], row["status"], row["mac"] or "",
+                row["flash_size"] or "", row["firmware"] or "", row["seconds"]))
+
+    return 0
+
+#--------------------------------------------------------------------------------------
+# sweep()
+#
+# Read the MAC of, or erase, every matching device at once (see au_sweep.py).
+# Exit status is 0 only if every port succeeded.
+
+def sweep(operation: str, ports: list, pattern: str=None, csvFile: str=None, confirmed: bool=False,
+          audit: bool=True, timeout: float=None) -> int:
+
+    if not ports:
+        ports = sweep_ports(pattern)
+    if not ports:
+        print("No matching devices")
+        return 1
+
+    if operation == "erase" and not confirmed:
+        print("This erases the flash of {} device(s):".format(len(ports)))
+        for port in ports:
+            print("  {}".format(port))
+        print("Add --yes to go ahead")
+        return 1
+
+    theSweep = run_sweep(AUxSweep(operation, ports, timeout), audit=audit)
+
+    print("\n" + theSweep.table())
+    print("\n{} of {} OK in {:.1f} seconds".format(len(theSweep) - theSweep.failed, len(theSweep),
+                                                  theSweep.seconds or 0))
+
+    if csvFile is not None:
+        with open(csvFile, "w", newline="", encoding="utf-8") as f:
+            theSweep.write_csv(f)
+
+    return 0 if theSweep.failed == 0 else 1
+
+#--------------------------------------------------------------------------------------
+# inspect()
+#
+# Print what a firmware image says about itself - the variant the upload will
+# use, and how that was worked out.
+
+def inspect(firmware: str, asJson: bool=False) -> int:
+
+    try:
+        info = image_inspector().inspect(firmware)
+    except (OSError, ValueError) as error:
+        print(str(error))
+        return 1
+
+    if asJson:
+        print(json.dumps(info.to_dict(), indent=2))
+        return 0
+
+    print(info)
+    if info.variant is None:
+        print("Variant: unknown")
+    else:
+        print("Variant: {} (from the {})".format(info.variant_name, {"descriptor": "app descriptor",
+                                                                    "image": "image contents",
+                                                                    "filename": "file name"}[info.variant_source]))
+    print("SHA-256: {}".format(info.sha256))
+
+    return 0
+
+#--------------------------------------------------------------------------------------
+# library()
+#
+# Find firmware in a folder of builds - the matching builds, newest first, or
+# with latest set just the path of the newest (to hand to upload).
+
+def library(directory: str, words: list, product: str=None, flashSize: str=None, latest: bool=False,
+            asJson: bool=False) -> int:
+
+    if directory is not None and not os.path.isdir(directory):
+        print("{} is not a folder".format(directory))
+        return 1
+
+    theLibrary = firmware_library(directory)
+    theLibrary.refresh()
+
+    entries = theLibrary.search(words, product, flashSize)
+    if latest:
+        entries = entries[:1]
+
+    if not entries:
+        if not asJson:
+            print("No matching firmware in {}".format(theLibrary.directory))
+        else:
+            print("[]")
+        return 1
+
+    if asJson:
+        print(json.dumps([entry.to_dict() for entry in entries], indent=2))
+    elif latest:
+        print(entries[0].path)
+    else:
+        for entry in entries:
+            print(entry)
+
+    return 0
+
+# argparse type for --compression - "auto", or a zlib level
+def _compression(value: str):
+
+    if value == AUTO_COMPRESSION:
+        return value
+    if value.isdigit() and 0 <= int(value) <= 9:
+        return int(value)
+    raise argparse.ArgumentTypeError("use auto or a level from 0 to 9")
+
+#--------------------------------------------------------------------------------------
+# Entry point
+
+def startUploaderCLI(argv=None):
+    """Start the command line uploader"""
+
+    parser = argparse.ArgumentParser(prog="RTK_Firmware_Upload_CLI",
+                                     description=_APP_NAME + " - " + get_version("_version.py") + " (command line)")
+    parser.add_argument("--port", "-p", help="serial port of the RTK device")
+    parser.add_argument("--baud", "-b", default=AUTO_BAUD, choices=[AUTO_BAUD, "921600", "460800", "115200"],
+                        help="upload baud rate (default: auto - the best rate for the USB-UART adapter)")
+    parser.add_argument("--timeout", type=float, metavar="SECONDS",
+                        help="cancel a job that runs longer than this (default: depends on the job)")
+    parser.add_argument("--no-audit", action="store_true", help="do not record the job in the audit log")
+    parser.add_argument("--job-log", metavar="FILE",
+                        help="if the job fails, write all its output (stdout and stderr) to FILE")
+    parser.add_argument("--trace", metavar="FILE",
+                        help="record where the time of each job goes, in Chrome trace format (append to FILE)")
+    parser.add_argument("--profile", action="store_true",
+                        help="with --trace, also run each job under cProfile (saved as a .prof file next to the trace)")
+    parser.add_argument("--events", metavar="FILE",
+                        help="write job events (progress, MAC, flash size ...) to FILE as JSON lines, - for stdout")
+
+    subparsers = parser.add_subparsers(dest="operation")
+
+    upload_parser = subparsers.add_parser("upload", help="detect flash size, upload firmware and reset")
+    upload_parser.add_argument("firmware", help="firmware file (.bin)")
+    upload_parser.add_argument("--force", action="store_true",
+                               help="upload even if the firmware does not match the chip or flash size")
+    upload_parser.add_argument("--diff", action="store_true",
+                               help="only write the parts of the flash that differ from the firmware")
+    upload_parser.add_argument("--verify", action="store_true",
+                               help="MD5 check every flash region once the upload is done")
+    upload_parser.add_argument("--compression", default=AUTO_COMPRESSION, type=_compression, metavar="LEVEL",
+                               help="zlib level 0 (uncompressed) to 9, or auto to pick the quickest for the link "
+                                    "(default: auto)")
+
+    verify_parser = subparsers.add_parser("verify", help="check the device flash matches a firmware file (by MD5)")
+    verify_parser.add_argument("firmware", help="firmware file (.bin)")
+
+    subparsers.add_parser("read_mac", help="read the WiFi MAC address")
+    subparsers.add_parser("erase_flash", help="erase the ESP32 flash")
+    subparsers.add_parser("reset", help="reset the ESP32")
+    subparsers.add_parser("list", help="list the available serial ports")
+
+    batch_parser = subparsers.add_parser("batch", help="run the jobs in a manifest on many devices at once")
+    batch_parser.add_argument("manifest", help="manifest file (.json, or .yaml with PyYAML)")
+    batch_parser.add_argument("--summary", metavar="FILE", help="write the JSON summary to FILE")
+    batch_parser.add_argument("--verbose", "-v", action="store_true", help="show all the output of each device")
+
+    sweep_parser = subparsers.add_parser("sweep", help="read the MAC of, or erase, every connected device at once")
+    sweep_parser.add_argument("sweep", choices=list(SWEEP_ACTIONS), help="what to do on each device")
+    sweep_parser.add_argument("ports", nargs="*", help="ports to sweep (default: every USB serial port)")
+    sweep_parser.add_argument("--match", metavar="PATTERN",
+                              help="only ports whose name, USB serial, VID:PID or description match PATTERN")
+    sweep_parser.add_argument("--csv", metavar="FILE", help="write the results to a CSV file")
+    sweep_parser.add_argument("--yes", "-y", action="store_true", help="do not ask before an erase sweep")
+
+    library_parser = subparsers.add_parser("library", help="find firmware in a folder of builds, newest first")
+    library_parser.add_argument("words", nargs="*", help="only builds whose file name, product, version or "
+                                                         "build date contain all these words")
+    library_parser.add_argument("--dir", metavar="FOLDER",
+                                help="the folder of builds (default: $RTK_UPLOADER_LIBRARY, or the current folder)")
+    library_parser.add_argument("--product", help="only this product - RTK_Everywhere, RTK_Surveyor ...")
+    library_parser.add_argument("--flash-size", help="only builds for this flash size - 4MB, 8MB or 16MB")
+    library_parser.add_argument("--latest", action="store_true", help="print the path of the newest match only")
+    library_parser.add_argument("--json", action="store_true", help="print as JSON")
+
+    inspect_parser = subparsers.add_parser("inspect", help="show the chip, variant and version of a firmware file")
+    inspect_parser.add_argument("firmware", help="firmware file (.bin)")
+    inspect_parser.add_argument("--json", action="store_true", help="print as JSON")
+
+    log_parser = subparsers.add_parser("log", help="query and export the audit log of past jobs")
+    log_parser.add_argument("--since", metavar="TIME", help="from TIME - a date/time (2026-10-17 06:00) or ago (8h, 2d)")
+    log_parser.add_argument("--until", metavar="TIME", help="up to TIME")
+    log_parser.add_argument("--mac", help="only jobs on this device")
+    log_parser.add_argument("--action", help="only this action ({})".format(", ".join(BATCH_ACTIONS)))
+    log_parser.add_argument("--failed", action="store_true", help="only failed jobs")
+    log_parser.add_argument("--limit", type=int, help="only the newest LIMIT jobs")
+    log_parser.add_argument("--stats", choices=["day", "hour", "port", "firmware", "host", "action"],
+                            help="yield and throughput per day, hour, ...")
+    log_parser.add_argument("--csv", metavar="FILE", help="export to a CSV file")
+    log_parser.add_argument("--json", metavar="FILE", help="export to a JSON lines file")
+    log_parser.add_argument("--file", metavar="DB", help="audit log to read (default: the uploader's own)")
+
+    args = parser.parse_args(argv)
+
+    if args.operation is None:
+        parser.print_help()
+        return 1
+
+    if args.profile and not args.trace:
+        parser.error("--profile needs --trace FILE")
+    if args.trace:
+        set_job_tracer(AUxTracer(args.trace, args.profile))
+
+    if args.operation == "list":
+        for info in port_registry().ports():
+            print(info)
+        return 0
+
+    if args.operation == "batch":
+        return batch(args.manifest, args.summary, args.verbose, not args.no_audit)
+
+    if args.operation == "log":
+        return log(args)
+
+    if args.operation == "sweep":
+        return sweep(args.sweep, args.ports, args.match, args.csv, args.yes, not args.no_audit, args.timeout)
+
+    if args.operation == "library":
+        return library(args.dir, args.words, args.product, args.flash_size, args.latest, args.json)
+
+    if args.operation == "inspect":
+        return inspect(args.firmware, args.json)
+
+    if args.port is None:
+        parser.error("--port is required for " + args.operation)
+
+    info = port_registry().get(args.port)
+    if info is None:
+        print("Port No Longer Available")
+        return 1
+    port = info.device
+    portDescription = info.description
+
+    events = None
+    if args.events == "-":
+        events = sys.__stdout__
+    elif args.events is not None:
+        events = open(args.events, "a", encoding="utf-8")
+
+    uploader = AUxUploaderCLI(events=events, audit=not args.no_audit, timeout=args.timeout, jobLog=args.job_log)
+    try:
+        if args.operation == "upload":
+            status = uploader.upload(port, args.baud, args.firmware, args.force, portDescription, args.diff,
+                                     args.verify, args.compression)
+        elif args.operation == "verify":
+            status = uploader.verify(port, args.firmware)
+        elif args.operation == "read_mac":
+            status = uploader.read_mac(port)
+        elif args.operation == "erase_flash":
+            status = uploader.erase(port)
+        else:
+            status = uploader.reset(port)
+    finally:
+        uploader.shutdown()
+        if events is not None and events is not sys.__stdout__:
+            events.close()
+
+    return 0 if status == 0 else 1
+
+if __name__ == '__main__':
+    sys.exit(startUploaderCLI())
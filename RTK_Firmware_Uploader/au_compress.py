@@ -0,0 +1,221 @@
+#-----------------------------------------------------------------------------
+# au_compress.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Compression planning for flash writes.
+#
+# Every write can go to the ESP32 compressed (zlib, inflated by the stub) or
+# as is. Which is quicker depends on the link and the host: at a low baud
+# rate the best compression pays for itself many times over, at a high baud
+# rate on a slow PC the time spent compressing can cost more than it saves.
+#
+# For each write the planner estimates the time to compress and send it at
+# each level - from a sample of the data, compressed on this host, and the
+# link throughput - and picks the quickest:
+#
+#   cached      - data compressed ahead of time (the image cache keeps every
+#                 image at level 9), so free to use
+#   1, 6, 9     - compress now at that zlib level
+#   0           - send uncompressed
+#
+# The link throughput starts as an estimate from the baud rate, and is
+# replaced by what the writes actually achieve.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import time
+import zlib
+
+# the levels that are tried - fast, zlib's default and best
+LEVELS = (1, 6, 9)
+
+# the job value that picks the strategy - "auto", or a level (0 = uncompressed)
+AUTO_COMPRESSION = "auto"
+
+# the level of the data in the image cache
+CACHED_LEVEL = 9
+
+# bytes of serial traffic per byte of data - 8N1 framing, and SLIP escapes
+_LINK_OVERHEAD = 10.4 / 8
+
+# the sample is this many slices of this size, spread over the data
+_SAMPLE_SLICES = 4
+_SAMPLE_SLICE = 16 * 1024
+
+#--------------------------------------------------------------------------------------
+# AUxCompressionPlan
+#
+# How one write goes: level (0 = uncompressed), whether it is the cached data,
+# the data to send, and the estimates behind the choice (seconds).
+
+class AUxCompressionPlan(object):
+
+    def __init__(self, name: str, size: int, level: int, cached: bool, data: bytes, compress_seconds: float,
+                 est_seconds: float, raw_seconds: float, link_rate: float) -> None:
+
+        object.__init__(self)
+
+        self.name = name
+        self.size = size                        # uncompressed bytes
+        self.level = level
+        self.cached = cached
+        self.data = data
+        self.compress_seconds = compress_seconds
+        self.est_seconds = est_seconds          # compress (if not cached) and send
+        self.raw_seconds = raw_seconds          # send uncompressed
+        self.link_rate = link_rate              # link throughput, bytes/s - as estimated, then as achieved
+
+        self.seconds = None                     # compress and send, once written
+
+    @property
+    def compressed(self) -> bool:
+
+        return self.level > 0
+
+    @property
+    def saved_seconds(self) -> float:
+        """Time saved against sending uncompressed - estimated until written, negative if it cost time"""
+        seconds = self.seconds if self.seconds is not None else self.est_seconds
+        return self.raw_seconds - seconds
+
+#--------------------------------------------------------------------------------------
+# AUxCompressionPlanner
+#
+# One per write_flash() - it keeps the link throughput measured by its earlier writes.
+#
+# Example:
+#
+#   planner = AUxCompressionPlanner(baud=921600)
+#   plan = planner.plan("firmware.bin", len(data), lambda: data)
+#   ... send plan.data, compressed if plan.compressed ...
+#   planner.sent(plan, seconds)
+
+class AUxCompressionPlanner(object):
+
+    def __init__(self, baud: int, level=AUTO_COMPRESSION) -> None:
+
+        object.__init__(self)
+
+        self.level = level
+        self.link_rate = baud / 8 / _LINK_OVERHEAD      # bytes/s, until measured
+
+        self._measured_bytes = 0
+        self._measured_seconds = 0.0
+
+    #------------------------------------------------------
+    # plan()
+    #
+    # Pick how to send size bytes. raw() returns the uncompressed data - it is only
+    # called if needed. cached is the data already compressed at CACHED_LEVEL, if
+    # there is any.
+
+    def plan(self, name: str, size: int, raw, cached: bytes=None) -> AUxCompressionPlan:
+
+        raw_seconds = size / self.link_rate
+
+        # a fixed level
+        if self.level != AUTO_COMPRESSION:
+            level = int(self.level)
+            if level == 0:
+                return AUxCompressionPlan(name, size, 0, False, raw(), 0.0, raw_seconds, raw_seconds, self.link_rate)
+            if level == CACHED_LEVEL and cached is not None:
+                return self._cached_plan(name, size, cached, raw_seconds)
+            return self._compress(name, size, raw(), level, raw_seconds)
+
+        # the cached data is free, and smaller than any level can make it - only
+        # data that does not compress is better sent as is
+        if cached is not None:
+            if len(cached) < size:
+                return self._cached_plan(name, size, cached, raw_seconds)
+            return AUxCompressionPlan(name, size, 0, False, raw(), 0.0, raw_seconds, raw_seconds, self.link_rate)
+
+        data = raw()
+
+        best_level, best_seconds = 0, raw_seconds
+        for level, (bytes_per_sec, ratio) in self.measure(data).items():
+            seconds = size / bytes_per_sec + size * ratio / self.link_rate
+            if seconds < best_seconds:
+                best_level, best_seconds = level, seconds
+
+        if best_level == 0:
+            return AUxCompressionPlan(name, size, 0, False, data, 0.0, raw_seconds, raw_seconds, self.link_rate)
+
+        return self._compress(name, size, data, best_level, raw_seconds)
+
+    #------------------------------------------------------
+    # The host compression speed (bytes/s) and ratio of each level, on a sample of data
+
+    def measure(self, data: bytes) -> dict:
+
+        if len(data) <= _SAMPLE_SLICES * _SAMPLE_SLICE:
+            sample = data
+        else:
+            step = (len(data) - _SAMPLE_SLICE) // (_SAMPLE_SLICES - 1)
+            sample = b"".join(data[offset:offset + _SAMPLE_SLICE]
+                              for offset in range(0, step * _SAMPLE_SLICES, step))
+
+        results = {}
+        for level in LEVELS:
+            start = time.perf_counter()
+            compressed = zlib.compress(sample, level)
+            seconds = max(time.perf_counter() - start, 1e-6)
+            results[level] = (len(sample) / seconds, len(compressed) / max(len(sample), 1))
+
+        return results
+
+    # the write took seconds - update the plan with what it achieved, and the link
+    # throughput for the writes to come
+    def sent(self, plan: AUxCompressionPlan, seconds: float) -> None:
+
+        plan.seconds = seconds + (0.0 if plan.cached else plan.compress_seconds)
+
+        self._measured_bytes += len(plan.data)
+        self._measured_seconds += seconds
+        if self._measured_seconds > 0:
+            self.link_rate = self._measured_bytes / self._measured_seconds
+
+        # over all the writes so far - a small write alone is mostly round trip time
+        plan.link_rate = self.link_rate
+        plan.raw_seconds = plan.size / self.link_rate
+
+    def _cached_plan(self, name: str, size: int, cached: bytes, raw_seconds: float) -> AUxCompressionPlan:
+
+        return AUxCompressionPlan(name, size, CACHED_LEVEL, True, cached, 0.0, len(cached) / self.link_rate,
+                                  raw_seconds, self.link_rate)
+
+    def _compress(self, name: str, size: int, data: bytes, level: int, raw_seconds: float) -> AUxCompressionPlan:
+
+        start = time.perf_counter()
+        compressed = zlib.compress(data, level)
+        seconds = time.perf_counter() - start
+
+        return AUxCompressionPlan(name, size, level, False, compressed, seconds,
+                                  seconds + len(compressed) / self.link_rate, raw_seconds, self.link_rate)
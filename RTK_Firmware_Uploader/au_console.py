@@ -0,0 +1,118 @@
+#-----------------------------------------------------------------------------
+# au_console.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Coalescing buffer for console output from the worker threads.
+#
+# The worker output arrives one write() at a time, and esptool rewrites its
+# progress line with a carriage return many times a second. Rather than
+# touch the message pane for every write, the output is collected here and
+# the GUI takes it in one batch on a timer. Carriage return updates are
+# folded in memory, so only the last version of a line is ever drawn.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+from threading import Lock
+
+#--------------------------------------------------------------------------------------
+# AUxConsoleBuffer
+#
+# Thread safe. write() from any thread, take() from the thread that draws
+# the console.
+#
+# take() returns (rewrite, text):
+#
+#   rewrite - True if the last (unterminated) line already on the console
+#             must be removed before text is appended.
+#   text    - the text to append
+#
+# Pending text is limited to max_lines lines - if the console falls that far
+# behind, the oldest pending lines are dropped.
+
+class AUxConsoleBuffer(object):
+
+    def __init__(self, max_lines: int=5000):
+
+        self._lock = Lock()
+        self._max_lines = max_lines
+        self._rewrite = False
+        self._text = ""
+        self._pending = ""
+
+    def write(self, msg: str) -> None:
+
+        if not msg:
+            return
+
+        with self._lock:
+
+            # a \r\n that was split across two writes
+            if self._pending:
+                msg = self._pending + msg
+                self._pending = ""
+
+            if msg.endswith("\r"):
+                self._pending = "\r"
+                msg = msg[:-1]
+
+            msg = msg.replace("\r\n", "\n")
+
+            # each carriage return throws away the current line
+            parts = msg.split("\r")
+            self._text += parts[0]
+            for part in parts[1:]:
+                self._rewrite_line()
+                self._text += part
+
+            if self._text.count("\n") > self._max_lines:
+                self._text = "\n".join(self._text.split("\n")[-(self._max_lines + 1):])
+
+    def _rewrite_line(self) -> None:
+
+        newline = self._text.rfind("\n")
+        if newline >= 0:
+            self._text = self._text[:newline + 1]
+        else:
+            # the line being rewritten is already on the console
+            self._text = ""
+            self._rewrite = True
+
+    def take(self) -> tuple:
+
+        with self._lock:
+            result = (self._rewrite, self._text)
+            self._rewrite = False
+            self._text = ""
+
+        return result
+
+    def __len__(self) -> int:
+        return len(self._text)
@@ -0,0 +1,401 @@
+#-----------------------------------------------------------------------------
+# au_image_cache.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Cache of ready to write image sets.
+#
+# Before the images of an upload (bootloader, partition table, boot_app0 and
+# firmware) can be written, each is read, padded, has its flash parameters
+# patched (bootloader), is checked to fit in the flash, MD5 hashed and zlib
+# compressed. For the same build that work is the same for every board, so the
+# result is kept - in memory, and on disk so it survives a restart.
+#
+# An image set is keyed by the content hash of each image file (so the
+# firmware build and the bootloader/partition variant), the address of each
+# image, and the chip and flash mode/frequency/size it was prepared for.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import json
+import zlib
+import hashlib
+from argparse import Namespace
+from collections import OrderedDict
+from threading import Lock
+
+from .au_startup import lazy_import
+
+esptool = lazy_import("esptool") # pip install esptool
+
+from .au_upload import user_cache_dir
+
+# bump when the on-disk layout or the way payloads are prepared changes
+_CACHE_FORMAT = 1
+
+# image sets kept in memory, and on disk
+_MEMORY_SETS = 4
+_DISK_SETS = 16
+
+_CACHE_SUFFIX = ".imgset"
+
+#--------------------------------------------------------------------------------------
+# file_digest()
+#
+# SHA-256 of a file's contents. Remembered by path, size and modification time,
+# so a multi-megabyte firmware file is only hashed once.
+
+_digests = {}
+_digests_lock = Lock()
+
+def file_digest(filename: str) -> str:
+
+    stat = os.stat(filename)
+    memo = (os.path.realpath(filename), stat.st_size, stat.st_mtime_ns)
+
+    with _digests_lock:
+        digest = _digests.get(memo)
+    if digest is not None:
+        return digest
+
+    sha = hashlib.sha256()
+    with open(filename, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _digests_lock:
+        _digests[memo] = digest
+
+    return digest
+
+#--------------------------------------------------------------------------------------
+# AUxImagePayload
+#
+# One image, ready to write: flash address, name (for messages), uncompressed
+# size, MD5 of the uncompressed data (for the on-device check) and the zlib
+# compressed data.
+
+class AUxImagePayload(object):
+
+    def __init__(self, name: str, address: int, size: int, md5: str, compressed: bytes) -> None:
+
+        object.__init__(self)
+
+        self.name = name
+        self.address = address
+        self.size = size
+        self.md5 = md5
+        self.compressed = compressed
+
+        self._block_md5s = {}
+
+    def data(self) -> bytes:
+        """The uncompressed image"""
+        return zlib.decompress(self.compressed)
+
+    def block_md5s(self, block_size: int) -> list:
+        """MD5 of each block_size block of the image (the last one may be short)"""
+        digests = self._block_md5s.get(block_size)
+        if digests is None:
+            data = self.data()
+            digests = [hashlib.md5(data[offset:offset + block_size]).hexdigest()
+                       for offset in range(0, self.size, block_size)]
+            self._block_md5s[block_size] = digests
+
+        return digests
+
+#--------------------------------------------------------------------------------------
+# AUxImageSet
+#
+# The payloads of one upload, in the order they are written
+
+class AUxImageSet(object):
+
+    def __init__(self, key: str, payloads: list, cached: bool=False) -> None:
+
+        object.__init__(self)
+
+        self.key = key
+        self.payloads = payloads
+
+        # True if taken from the cache rather than built
+        self.cached = cached
+
+    @property
+    def total(self) -> int:
+
+        return sum(payload.size for payload in self.payloads)
+
+#--------------------------------------------------------------------------------------
+# AUxImageCache
+#
+# Thread safe - the workers for several ports can ask for the same image set at
+# once, and it is built only once.
+#
+# directory - where image sets are kept on disk. None keeps them in memory only.
+#
+# Example:
+#
+#   image_set = image_cache().get(esp, [(0x1000, "bootloader.bin"), (0x10000, "firmware.bin")],
+#                                 "esp32", "dio", "80m", "16MB")
+
+class AUxImageCache(object):
+
+    def __init__(self, directory: str=None, memory_sets: int=_MEMORY_SETS, disk_sets: int=_DISK_SETS) -> None:
+
+        object.__init__(self)
+
+        self._directory = directory
+        self._memory_sets = memory_sets
+        self._disk_sets = disk_sets
+
+        self._lock = Lock()
+        self._memory = OrderedDict()
+        self._building = {}
+
+        if self._directory is not None:
+            try:
+                os.makedirs(self._directory, exist_ok=True)
+            except OSError:
+                self._directory = None
+
+    @property
+    def directory(self) -> str:
+
+        return self._directory
+
+    def key(self, images: list, chip: str, flash_mode: str, flash_freq: str, flash_size: str) -> str:
+
+        parts = [str(_CACHE_FORMAT), chip, flash_mode, flash_freq, flash_size]
+        for address, filename in images:
+            parts.append("{:x}:{}".format(address, file_digest(filename)))
+
+        return hashlib.sha256("|".join(parts).encode()).hexdigest()
+
+    #------------------------------------------------------
+    # get()
+    #
+    # Return the image set for images, a list of (address, filename). esp is the
+    # connected esptool loader - it is only used when the set has to be built.
+
+    def get(self, esp, images: list, chip: str, flash_mode: str, flash_freq: str, flash_size: str) -> AUxImageSet:
+
+        key = self.key(images, chip, flash_mode, flash_freq, flash_size)
+
+        with self._lock:
+            building = self._building.setdefault(key, Lock())
+
+        # one build per key - anyone else asking for it waits, then takes it from memory
+        with building:
+
+            image_set = self._from_memory(key)
+            if image_set is None:
+                image_set = self._load(key)
+            if image_set is None:
+                image_set = self._build(key, esp, images, chip, flash_mode, flash_freq, flash_size)
+                self._store(image_set)
+
+            with self._lock:
+                self._memory[key] = image_set
+                self._memory.move_to_end(key)
+                while len(self._memory) > self._memory_sets:
+                    self._memory.popitem(last=False)
+                self._building.pop(key, None)
+
+        return image_set
+
+    def clear(self) -> None:
+
+        with self._lock:
+            self._memory.clear()
+
+        for filename in self._disk_files():
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+    #------------------------------------------------------
+    # Internals
+
+    def _from_memory(self, key: str) -> AUxImageSet:
+
+        with self._lock:
+            image_set = self._memory.get(key)
+
+        if image_set is None:
+            return None
+
+        return AUxImageSet(key, image_set.payloads, cached=True)
+
+    def _build(self, key: str, esp, images: list, chip: str, flash_mode: str, flash_freq: str, flash_size: str) -> AUxImageSet:
+
+        flash_end = esptool.util.flash_size_bytes(flash_size)
+        params = Namespace(chip=chip, flash_mode=flash_mode, flash_freq=flash_freq, flash_size=flash_size)
+
+        payloads = []
+        for address, filename in images:
+            with open(filename, "rb") as f:
+                image = esptool.util.pad_to(f.read(), 4)
+
+            if address + len(image) > flash_end:
+                raise esptool.util.FatalError("File {} (length {}) at offset {} will not fit in {} bytes of flash."
+                                 .format(filename, len(image), address, flash_end))
+
+            # the esptool 4 signature (v5 takes the three values instead) - setup.py keeps esptool below 5
+            image = esptool.cmds._update_image_flash_params(esp, address, params, image)
+
+            payloads.append(AUxImagePayload(os.path.basename(filename), address, len(image),
+                                            hashlib.md5(image).hexdigest(), zlib.compress(image, 9)))
+
+        return AUxImageSet(key, payloads)
+
+    def _path(self, key: str) -> str:
+
+        return os.path.join(self._directory, key + _CACHE_SUFFIX)
+
+    def _disk_files(self) -> list:
+
+        if self._directory is None:
+            return []
+
+        try:
+            names = os.listdir(self._directory)
+        except OSError:
+            return []
+
+        return [os.path.join(self._directory, name) for name in names if name.endswith(_CACHE_SUFFIX)]
+
+    # On disk, an image set is a JSON header line followed by the compressed payloads.
+    # Anything that does not check out is ignored, and rebuilt.
+
+    def _load(self, key: str) -> AUxImageSet:
+
+        if self._directory is None:
+            return None
+
+        try:
+            with open(self._path(key), "rb") as f:
+                header = json.loads(f.readline())
+                data = f.read()
+
+            if header.get("format") != _CACHE_FORMAT or header.get("key") != key:
+                return None
+
+            payloads = []
+            offset = 0
+            for entry in header["payloads"]:
+                compressed = data[offset:offset + entry["length"]]
+                offset += entry["length"]
+                if len(compressed) != entry["length"] or hashlib.sha256(compressed).hexdigest() != entry["sha256"]:
+                    return None
+
+                payloads.append(AUxImagePayload(entry["name"], entry["address"], entry["size"],
+                                                entry["md5"], compressed))
+
+            if offset != len(data):
+                return None
+
+            # keep recently used sets from being pruned
+            os.utime(self._path(key))
+
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+        return AUxImageSet(key, payloads, cached=True)
+
+    def _store(self, image_set: AUxImageSet) -> None:
+
+        if self._directory is None:
+            return
+
+        header = {"format": _CACHE_FORMAT,
+                  "key": image_set.key,
+                  "payloads": [{"name": payload.name,
+                                "address": payload.address,
+                                "size": payload.size,
+                                "md5": payload.md5,
+                                "length": len(payload.compressed),
+                                "sha256": hashlib.sha256(payload.compressed).hexdigest()}
+                               for payload in image_set.payloads]}
+
+        path = self._path(image_set.key)
+        temp = "{}.{}.tmp".format(path, os.getpid())
+        try:
+            with open(temp, "wb") as f:
+                f.write(json.dumps(header).encode() + b"\n")
+                for payload in image_set.payloads:
+                    f.write(payload.compressed)
+            os.replace(temp, path)
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+            return
+
+        self._prune()
+
+    def _prune(self) -> None:
+
+        files = []
+        for filename in self._disk_files():
+            try:
+                files.append((os.path.getmtime(filename), filename))
+            except OSError:
+                pass
+
+        files.sort(reverse=True)
+        for _, filename in files[self._disk_sets:]:
+            try:
+                os.remove(filename)
+            except OSError:
+                pass
+
+#--------------------------------------------------------------------------------------
+# image_cache()
+#
+# The image cache shared by everything in this process
+
+_image_cache = None
+_image_cache_lock = Lock()
+
+def image_cache() -> AUxImageCache:
+
+    global _image_cache
+
+    with _image_cache_lock:
+        if _image_cache is None:
+            _image_cache = AUxImageCache(os.path.join(user_cache_dir(), "images"))
+
+    return _image_cache
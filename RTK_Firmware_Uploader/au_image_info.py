@@ -0,0 +1,289 @@
+#-----------------------------------------------------------------------------
+# au_image_info.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Firmware image inspector.
+#
+# Reads what an ESP32 app image says about itself: the image header (chip,
+# flash mode, size and frequency, entry point, segments) and the app
+# descriptor at the start of the first segment (project name, version, build
+# date, ESP-IDF version, ELF SHA-256). From that, and the content of the image,
+# the firmware variant - RTK Everywhere or RTK Firmware - is worked out, so the
+# bootloader and partition table no longer depend on what the file is called.
+#
+# The variant comes from, in order:
+#
+#   descriptor  - the app descriptor project name
+#   image       - a marker string built into the firmware (each variant looks
+#                 for its own update files by name)
+#   filename    - the file name, as before - only if the image says nothing
+#
+# Results are cached by the SHA-256 of the file - in memory, and on disk - so
+# inspecting a known build costs nothing.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import json
+import struct
+from threading import Lock
+
+from .au_upload import user_cache_dir, FIRMWARE_VARIANTS
+from .au_image_cache import file_digest
+
+# bump when what is read from an image changes - older cached results are dropped
+_INFO_VERSION = 1
+
+_IMAGE_MAGIC = 0xE9
+_APP_DESC_MAGIC = 0xABCD5432
+
+# magic, segment count, flash mode, flash size (high nibble) | frequency (low nibble), entry point
+_IMAGE_HEADER = struct.Struct("<BBBBI")
+
+# WP pin, SPI pin drive settings, chip id, min chip revision (old, full), max chip revision, reserved, hash appended
+_EXTENDED_HEADER = struct.Struct("<B3sHBHH4sB")
+
+# load address, length
+_SEGMENT_HEADER = struct.Struct("<II")
+
+# magic, secure version, reserved, version, project name, time, date, ESP-IDF version, ELF SHA-256
+_APP_DESC = struct.Struct("<II8s32s32s16s16s32s32s")
+
+_CHIPS = {0: "ESP32", 2: "ESP32-S2", 5: "ESP32-C3", 9: "ESP32-S3", 12: "ESP32-C2", 13: "ESP32-C6",
+          16: "ESP32-H2"}
+
+_FLASH_MODES = {0: "qio", 1: "qout", 2: "dio", 3: "dout"}
+
+_FLASH_SIZES = {0: "1MB", 1: "2MB", 2: "4MB", 3: "8MB", 4: "16MB", 5: "32MB", 6: "64MB", 7: "128MB"}
+
+_FLASH_FREQS = {0: "40m", 1: "26m", 2: "20m", 0xF: "80m"}
+
+# app descriptor project names of the firmware variants (see FIRMWARE_VARIANTS)
+_PROJECT_NAMES = {"RTK_Everywhere": "RTK_Everywhere",
+                  "RTK_Surveyor": "RTK_Surveyor",
+                  "RTK_Firmware": "RTK_Surveyor"}
+
+#--------------------------------------------------------------------------------------
+# AUxImageInfo
+#
+# What an image says about itself. variant is None if it could not be worked out.
+
+class AUxImageInfo(object):
+
+    _FIELDS = ["sha256", "size", "chip", "flash_mode", "flash_size", "flash_freq", "entry", "segments",
+               "project_name", "version", "idf_version", "build_date", "elf_sha256", "variant", "variant_source"]
+
+    def __init__(self, **values) -> None:
+
+        object.__init__(self)
+
+        for field in self._FIELDS:
+            setattr(self, field, values.get(field))
+
+    def to_dict(self) -> dict:
+
+        return {field: getattr(self, field) for field in self._FIELDS}
+
+    @property
+    def variant_name(self) -> str:
+
+        return FIRMWARE_VARIANTS[self.variant][0] if self.variant in FIRMWARE_VARIANTS else None
+
+    @property
+    def own_descriptor(self) -> bool:
+        """True if the app descriptor is the firmware's own - an Arduino build carries the generic one of
+        the core's lib-builder, with the IDF version and a fixed build date"""
+        return self.project_name in _PROJECT_NAMES
+
+    @property
+    def certain(self) -> bool:
+        """True if the variant came from the app descriptor - a marker string found in the image, or
+        the file name, is only a guess"""
+        return self.variant_source == "descriptor"
+
+    def __str__(self) -> str:
+
+        text = "{} image, {} {} {}".format(self.chip, self.flash_size, self.flash_mode, self.flash_freq)
+        if self.project_name:
+            text += ", {} {}".format(self.project_name, self.version)
+        if self.build_date:
+            text += ", built {}".format(self.build_date)
+
+        return text
+
+# A string field of the app descriptor
+def _text(raw: bytes) -> str:
+
+    return raw.split(b"\0", 1)[0].decode("utf-8", errors="replace")
+
+#--------------------------------------------------------------------------------------
+# read_image_info()
+#
+# Parse an app image - no caching. Raises ValueError if the file is not an app
+# image (or is cut short).
+
+def read_image_info(filename: str) -> AUxImageInfo:
+
+    with open(filename, "rb") as f:
+        data = f.read()
+
+    if len(data) < _IMAGE_HEADER.size + _EXTENDED_HEADER.size or data[0] != _IMAGE_MAGIC:
+        raise ValueError("{} is not an ESP32 firmware image".format(os.path.basename(filename)))
+
+    magic, segments, flash_mode, size_freq, entry = _IMAGE_HEADER.unpack_from(data, 0)
+    _, _, chip_id, _, _, _, _, _ = _EXTENDED_HEADER.unpack_from(data, _IMAGE_HEADER.size)
+
+    info = AUxImageInfo(sha256=file_digest(filename),
+                        size=len(data),
+                        chip=_CHIPS.get(chip_id, "unknown chip {}".format(chip_id)),
+                        flash_mode=_FLASH_MODES.get(flash_mode, str(flash_mode)),
+                        flash_size=_FLASH_SIZES.get(size_freq >> 4, "unknown"),
+                        flash_freq=_FLASH_FREQS.get(size_freq & 0x0F, "unknown"),
+                        entry=entry,
+                        segments=segments)
+
+    # walk the segments - they must all be in the file
+    offset = _IMAGE_HEADER.size + _EXTENDED_HEADER.size
+    first_segment = offset + _SEGMENT_HEADER.size
+    for _ in range(segments):
+        if offset + _SEGMENT_HEADER.size > len(data):
+            raise ValueError("{} is cut short".format(os.path.basename(filename)))
+        _, length = _SEGMENT_HEADER.unpack_from(data, offset)
+        offset += _SEGMENT_HEADER.size + length
+        if offset > len(data):
+            raise ValueError("{} is cut short".format(os.path.basename(filename)))
+
+    # the app descriptor leads the first segment
+    if segments > 0 and first_segment + _APP_DESC.size <= len(data):
+        desc = _APP_DESC.unpack_from(data, first_segment)
+        if desc[0] == _APP_DESC_MAGIC:
+            info.version = _text(desc[3])
+            info.project_name = _text(desc[4])
+            info.build_date = "{} {}".format(_text(desc[6]), _text(desc[5])).strip()
+            info.idf_version = _text(desc[7])
+            info.elf_sha256 = desc[8].hex()
+
+    if info.project_name in _PROJECT_NAMES:
+        info.variant, info.variant_source = _PROJECT_NAMES[info.project_name], "descriptor"
+    else:
+        for variant, (_, marker) in FIRMWARE_VARIANTS.items():
+            if data.find(marker.encode()) >= 0:
+                info.variant, info.variant_source = variant, "image"
+                break
+
+    return info
+
+#--------------------------------------------------------------------------------------
+# AUxImageInspector
+#
+# read_image_info() with a cache keyed by file content. The file name fallback
+# is applied on the way out, so it is never cached.
+#
+# Example:
+#
+#   info = image_inspector().inspect("RTK_Everywhere_Firmware_v1_6.bin")
+#   print(info.variant_name, info)
+
+class AUxImageInspector(object):
+
+    def __init__(self, filename: str=None) -> None:
+
+        object.__init__(self)
+
+        self._filename = filename
+        self._lock = Lock()
+        self._infos = {}            # sha256 -> info dict
+
+        if self._filename is not None:
+            try:
+                with open(self._filename, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("version") == _INFO_VERSION:
+                    self._infos = saved.get("images", {})
+            except (OSError, ValueError, AttributeError):
+                self._infos = {}
+
+    def inspect(self, firmware: str) -> AUxImageInfo:
+        """What the firmware image says about itself - raises ValueError if it is not an app image"""
+        digest = file_digest(firmware)
+
+        with self._lock:
+            values = self._infos.get(digest)
+
+        if values is not None:
+            info = AUxImageInfo(**values)
+        else:
+            info = read_image_info(firmware)
+            with self._lock:
+                self._infos[digest] = info.to_dict()
+                self._save()
+
+        if info.variant is None:
+            name = os.path.basename(firmware)
+            for variant, (_, marker) in FIRMWARE_VARIANTS.items():
+                if name.find(marker) >= 0:
+                    info.variant, info.variant_source = variant, "filename"
+                    break
+
+        return info
+
+    def _save(self) -> None:
+
+        if self._filename is None:
+            return
+
+        temp = "{}.{}.tmp".format(self._filename, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self._filename), exist_ok=True)
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({"version": _INFO_VERSION, "images": self._infos}, f, indent=1, sort_keys=True)
+            os.replace(temp, self._filename)
+        except OSError:
+            pass
+
+#--------------------------------------------------------------------------------------
+# image_inspector()
+#
+# The image inspector shared by everything in this process
+
+_image_inspector = None
+_image_inspector_lock = Lock()
+
+def image_inspector() -> AUxImageInspector:
+
+    global _image_inspector
+
+    with _image_inspector_lock:
+        if _image_inspector is None:
+            _image_inspector = AUxImageInspector(os.path.join(user_cache_dir(), "image_info.json"))
+
+    return _image_inspector
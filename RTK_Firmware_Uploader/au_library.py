@@ -0,0 +1,342 @@
+#-----------------------------------------------------------------------------
+# au_library.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Firmware library - a folder of firmware builds, indexed.
+#
+# The library scans a folder (and its sub folders) for .bin files and reads
+# what each firmware image says about itself (see au_image_info.py): product,
+# version, build date, flash size and the SHA-256 of its contents. Files that
+# are not app images - bootloaders, partition tables - are remembered as such
+# and left out.
+#
+# The index is kept on disk, so only new and changed files (by size and
+# modification time) are read on the next refresh() - and of those, a file
+# that was renamed or copied is only hashed, as the image information is
+# cached by content. Searching and "latest build of a product" run on the
+# index in memory.
+#
+# The version and build date come from the app descriptor only if it is the
+# firmware's own (an RTK project name). Arduino builds carry the generic
+# descriptor of the core's lib-builder - the IDF version and a fixed date -
+# so for those the version comes from the file name, and there is no date.
+#
+# The newest build is the one with the highest version (v4.1 < v4.10 <
+# v5.0), then the latest build date, then the latest file modification time.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import re
+import json
+import hashlib
+from datetime import datetime
+from threading import Lock
+
+from .au_upload import user_cache_dir
+from .au_image_info import image_inspector
+
+# bump when what is kept for a file changes - older indexes are rebuilt
+_LIBRARY_VERSION = 2
+
+_LIBRARY_ENV = "RTK_UPLOADER_LIBRARY"
+
+# a version in a file name - RTK_Everywhere_Firmware_v1_6.bin
+_FILENAME_VERSION = re.compile(r"[_-]v(\d+(?:[_.]\d+)*)", re.IGNORECASE)
+
+#--------------------------------------------------------------------------------------
+# AUxLibraryEntry
+#
+# One firmware file of the library. error is set (and the image fields are None)
+# if the file is not a firmware image.
+
+class AUxLibraryEntry(object):
+
+    _FIELDS = ["path", "size", "mtime_ns", "sha256", "chip", "project_name", "version", "build_date",
+               "flash_size", "variant", "variant_source", "error"]
+
+    def __init__(self, **values) -> None:
+
+        object.__init__(self)
+
+        for field in self._FIELDS:
+            setattr(self, field, values.get(field))
+
+        self._text = None
+
+    def to_dict(self) -> dict:
+
+        return {field: getattr(self, field) for field in self._FIELDS}
+
+    @property
+    def product(self) -> str:
+        """The firmware variant, or the project name if there is no known variant"""
+        return self.variant or self.project_name
+
+    @property
+    def version_key(self) -> tuple:
+
+        return tuple(int(number) for number in re.findall(r"\d+", self.version or ""))
+
+    @property
+    def built(self) -> float:
+        """The build date as unix time - 0 if not known"""
+        try:
+            return datetime.strptime(" ".join((self.build_date or "").split()), "%b %d %Y %H:%M:%S").timestamp()
+        except ValueError:
+            return 0.0
+
+    @property
+    def sort_key(self) -> tuple:
+
+        return (self.version_key, self.built, self.mtime_ns or 0)
+
+    def matches(self, words: list) -> bool:
+        """True if every word is in the file name, product, version or build date"""
+        if self._text is None:
+            self._text = " ".join(str(value) for value in (os.path.basename(self.path), self.product,
+                                                          self.project_name, self.version, self.build_date,
+                                                          self.flash_size) if value).lower()
+
+        return all(word.lower() in self._text for word in words)
+
+    def __str__(self) -> str:
+
+        return "{:<16} {:<10} {:<21} {:<5} {}".format(self.product or "-", self.version or "-",
+                                                     self.build_date or "-", self.flash_size or "-", self.path)
+
+# The version from a file name, as the app descriptor would have it - "v1.6"
+def _filename_version(filename: str) -> str:
+
+    match = _FILENAME_VERSION.search(os.path.basename(filename))
+    return "v" + re.sub(r"[_.]", ".", match.group(1)) if match else None
+
+# How products are compared - "RTK Everywhere", "rtk_everywhere" and "Everywhere" all match RTK_Everywhere
+def _product_key(product: str) -> str:
+
+    return re.sub(r"[\s_-]+", "_", product.strip()).lower()
+
+#--------------------------------------------------------------------------------------
+# AUxFirmwareLibrary
+#
+# Thread safe - the GUI refreshes on a background thread.
+#
+# Example:
+#
+#   library = firmware_library("/home/fixture/builds")
+#   library.refresh()
+#   entry = library.latest("RTK_Everywhere", flash_size="16MB")
+#   for entry in library.search(["v4"], product="Surveyor"):
+#       print(entry)
+
+class AUxFirmwareLibrary(object):
+
+    def __init__(self, directory: str, index_file: str=None) -> None:
+
+        object.__init__(self)
+
+        self.directory = os.path.realpath(directory)
+        self.index_file = index_file
+
+        self._lock = Lock()
+        self._refresh_lock = Lock()
+        self._entries = {}          # path relative to the directory -> AUxLibraryEntry
+
+        if self.index_file is not None:
+            try:
+                with open(self.index_file, "r", encoding="utf-8") as f:
+                    saved = json.load(f)
+                if saved.get("version") == _LIBRARY_VERSION and saved.get("directory") == self.directory:
+                    self._entries = {name: AUxLibraryEntry(**values) for name, values in saved["files"].items()}
+            except (OSError, ValueError, AttributeError, KeyError, TypeError):
+                self._entries = {}
+
+    def __len__(self) -> int:
+
+        with self._lock:
+            return sum(1 for entry in self._entries.values() if entry.error is None)
+
+    #------------------------------------------------------
+    # refresh()
+    #
+    # Bring the index up to date with the folder - returns the number of files
+    # (added, changed, removed). Only new and changed files are read.
+
+    def refresh(self) -> tuple:
+
+        # one refresh at a time - a second caller waits, and then finds nothing to do
+        with self._refresh_lock:
+
+            with self._lock:
+                entries = dict(self._entries)
+
+            found = {}
+            added = changed = 0
+            for root, dirs, files in os.walk(self.directory):
+                dirs[:] = [name for name in dirs if not name.startswith(".")]
+                for name in files:
+                    if not name.lower().endswith(".bin"):
+                        continue
+
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+
+                    relative = os.path.relpath(path, self.directory)
+                    entry = entries.get(relative)
+                    if entry is not None and entry.size == stat.st_size and entry.mtime_ns == stat.st_mtime_ns:
+                        found[relative] = entry
+                        continue
+
+                    found[relative] = self._read(path, stat)
+                    if entry is None:
+                        added += 1
+                    else:
+                        changed += 1
+
+            removed = len(set(entries) - set(found))
+
+            with self._lock:
+                self._entries = found
+                if added or changed or removed:
+                    self._save()
+
+        return added, changed, removed
+
+    def _read(self, path: str, stat) -> AUxLibraryEntry:
+
+        entry = AUxLibraryEntry(path=path, size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+        try:
+            info = image_inspector().inspect(path)
+        except (OSError, ValueError) as error:
+            entry.error = str(error)
+            return entry
+
+        for field in ("sha256", "chip", "project_name", "flash_size", "variant", "variant_source"):
+            setattr(entry, field, getattr(info, field))
+
+        if info.own_descriptor:
+            entry.version, entry.build_date = info.version, info.build_date
+
+        if not entry.version:
+            entry.version = _filename_version(path)
+
+        return entry
+
+    #------------------------------------------------------
+    # Lookups - on the index as it stands, so refresh() first to see changes
+
+    def entries(self) -> list:
+        """Every firmware image, newest first"""
+        with self._lock:
+            entries = [entry for entry in self._entries.values() if entry.error is None]
+
+        return sorted(entries, key=lambda entry: entry.sort_key, reverse=True)
+
+    def search(self, words: list=None, product: str=None, flash_size: str=None) -> list:
+        """The images matching all the words, product and flash size given - newest first"""
+        if product:
+            product = _product_key(product)
+        if flash_size:
+            flash_size = flash_size.upper() if flash_size.upper().endswith("MB") else flash_size + "MB"
+
+        results = []
+        for entry in self.entries():
+            if product and not any(product in _product_key(name) for name in (entry.product, entry.project_name)
+                                   if name):
+                continue
+            if flash_size and entry.flash_size != flash_size:
+                continue
+            if words and not entry.matches(words):
+                continue
+            results.append(entry)
+
+        return results
+
+    def latest(self, product: str, flash_size: str=None) -> AUxLibraryEntry:
+        """The newest image of a product - None if there is none"""
+        results = self.search(product=product, flash_size=flash_size)
+        return results[0] if results else None
+
+    def find(self, sha256: str) -> list:
+        """The files with this content"""
+        return [entry for entry in self.entries() if entry.sha256 == sha256.lower()]
+
+    def products(self) -> dict:
+        """Product -> number of images"""
+        products = {}
+        for entry in self.entries():
+            name = entry.product or "unknown"
+            products[name] = products.get(name, 0) + 1
+
+        return products
+
+    def _save(self) -> None:
+
+        if self.index_file is None:
+            return
+
+        temp = "{}.{}.tmp".format(self.index_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(self.index_file), exist_ok=True)
+            with open(temp, "w", encoding="utf-8") as f:
+                json.dump({"version": _LIBRARY_VERSION, "directory": self.directory,
+                           "files": {name: entry.to_dict() for name, entry in self._entries.items()}}, f, indent=1)
+            os.replace(temp, self.index_file)
+        except OSError:
+            pass
+
+#--------------------------------------------------------------------------------------
+# firmware_library()
+#
+# The library of a folder, shared by everything in this process. With no folder,
+# the one in the RTK_UPLOADER_LIBRARY environment variable, else the current one.
+
+_libraries = {}
+_libraries_lock = Lock()
+
+def firmware_library(directory: str=None) -> AUxFirmwareLibrary:
+
+    if directory is None:
+        directory = os.environ.get(_LIBRARY_ENV) or os.getcwd()
+    directory = os.path.realpath(directory)
+
+    with _libraries_lock:
+        library = _libraries.get(directory)
+        if library is None:
+            key = hashlib.sha256(directory.encode("utf-8")).hexdigest()[:16]
+            library = AUxFirmwareLibrary(directory, os.path.join(user_cache_dir(), "library", key + ".json"))
+            _libraries[directory] = library
+
+    return library
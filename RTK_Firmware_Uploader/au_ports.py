@@ -0,0 +1,309 @@
+#-----------------------------------------------------------------------------
+# au_ports.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Registry of the serial ports on this machine.
+#
+# Enumerating serial ports is slow on some hosts, and the uploader needs the
+# port list a lot - for the port combobox, and to check the chosen port is
+# still there before every operation. The registry enumerates in a background
+# thread when ports come and go (udev events on Linux when pyudev is
+# installed, polling otherwise), and keeps the result indexed by system
+# location, name, USB VID:PID and USB serial number, so lookups are a dict
+# access.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+from threading import Thread, Lock, Event
+
+from .au_startup import lazy_import
+
+# pyserial is imported on the first enumeration - see au_startup.py
+list_ports = lazy_import("serial.tools.list_ports") # pip install pyserial
+
+try:
+    import pyudev   # optional - Linux hotplug events
+except ImportError:
+    pyudev = None
+
+# Seconds between enumerations when polling. With udev, enumerate on each event,
+# and at _UDEV_INTERVAL as a safety net.
+_POLL_INTERVAL = 1.0
+_UDEV_INTERVAL = 10.0
+
+# Longest wait for a udev event before checking for stop() (seconds)
+_UDEV_SLICE = 0.5
+
+#--------------------------------------------------------------------------------------
+# AUxPortInfo
+#
+# One serial port. device is the system location, which is what esptool and
+# pySerial open.
+
+class AUxPortInfo(object):
+
+    def __init__(self, device: str, name: str, description: str, vid: int=None, pid: int=None,
+                 serial_number: str=None, location: str=None) -> None:
+
+        object.__init__(self)
+
+        self.device = device
+        self.name = name
+        self.description = description
+        self.vid = vid
+        self.pid = pid
+        self.serial_number = serial_number
+        self.location = location
+
+    @property
+    def usb_id(self) -> str:
+        """"VID:PID" of a USB port, else None"""
+        if self.vid is None:
+            return None
+        return "{:04X}:{:04X}".format(self.vid, self.pid)
+
+    @property
+    def longname(self) -> str:
+
+        return self.description + " (" + self.name + ")"
+
+    def __eq__(self, other) -> bool:
+
+        return isinstance(other, AUxPortInfo) and self.__dict__ == other.__dict__
+
+    def __hash__(self) -> int:
+
+        return hash(self.device)
+
+    def __str__(self) -> str:
+
+        return "{}\t{}".format(self.device, self.description)
+
+#--------------------------------------------------------------------------------------
+# AUxPortRegistry
+#
+# Thread safe. Lookups work on the last enumeration - call refresh() to enumerate
+# now, or start() to keep the registry up to date in the background.
+#
+# Listeners added with add_listener() are called (from the background thread)
+# with the lists of added and removed AUxPortInfos when the ports change.
+
+class AUxPortRegistry(object):
+
+    def __init__(self, poll_interval: float=_POLL_INTERVAL) -> None:
+
+        object.__init__(self)
+
+        self._poll_interval = poll_interval
+
+        self._lock = Lock()
+        self._listeners = []
+        self._refreshed = False
+
+        self._ports = []
+        self._by_device = {}
+        self._by_name = {}
+        self._by_usb_id = {}
+        self._by_serial = {}
+
+        self._thread = None
+        self._stop = Event()
+
+    #------------------------------------------------------
+    # Background refresh
+
+    def start(self) -> None:
+
+        if self._thread is not None:
+            return
+
+        self.refresh()
+
+        self._stop.clear()
+        self._thread = Thread(target=self._monitor, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+
+        self._stop.set()
+        if self._thread is not None:
+            # the thread is a daemon - one stuck in refresh() must not hold up closing
+            self._thread.join(timeout=2 * _UDEV_SLICE)
+            self._thread = None
+
+    def add_listener(self, listener) -> None:
+
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener) -> None:
+
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _monitor(self) -> None:
+
+        monitor = None
+        if pyudev is not None:
+            try:
+                monitor = pyudev.Monitor.from_netlink(pyudev.Context())
+                monitor.filter_by("tty")
+                monitor.start()
+            except Exception:
+                monitor = None
+
+        while not self._stop.is_set():
+
+            if monitor is not None:
+                # refresh after a tty event (ignoring the rest of a burst), or now and then anyway -
+                # waiting in slices, so stop() is not kept waiting
+                waited = 0.0
+                while waited < _UDEV_INTERVAL and not self._stop.is_set():
+                    if monitor.poll(timeout=_UDEV_SLICE) is not None:
+                        while monitor.poll(timeout=0.1) is not None:
+                            pass
+                        break
+                    waited += _UDEV_SLICE
+            elif self._stop.wait(self._poll_interval):
+                break
+
+            if not self._stop.is_set():
+                self.refresh()
+
+    #------------------------------------------------------
+    # refresh()
+    #
+    # Enumerate the ports now. Returns (added, removed) lists of AUxPortInfo.
+
+    def refresh(self) -> tuple:
+
+        try:
+            found = [AUxPortInfo(p.device, p.name, p.description, p.vid, p.pid, p.serial_number, p.location)
+                     for p in list_ports.comports()]
+        except Exception:
+            found = []
+
+        found.sort(key=lambda port: port.device)
+
+        by_device = {}
+        by_name = {}
+        by_usb_id = {}
+        by_serial = {}
+        for port in found:
+            by_device[port.device] = port
+            by_name[port.name] = port
+            if port.usb_id is not None:
+                by_usb_id.setdefault(port.usb_id, []).append(port)
+            if port.serial_number:
+                by_serial[port.serial_number] = port
+
+        with self._lock:
+            old = self._by_device
+            self._ports = found
+            self._by_device = by_device
+            self._by_name = by_name
+            self._by_usb_id = by_usb_id
+            self._by_serial = by_serial
+            self._refreshed = True
+            listeners = list(self._listeners)
+
+        added = [port for device, port in by_device.items() if old.get(device) != port]
+        removed = [port for device, port in old.items() if by_device.get(device) != port]
+
+        if added or removed:
+            for listener in listeners:
+                listener(added, removed)
+
+        return added, removed
+
+    def _ensure(self) -> None:
+
+        if not self._refreshed:
+            self.refresh()
+
+    #------------------------------------------------------
+    # Lookups
+
+    def ports(self) -> list:
+
+        self._ensure()
+        with self._lock:
+            return list(self._ports)
+
+    def get(self, port: str) -> AUxPortInfo:
+        """The port with this system location or name, or None"""
+        self._ensure()
+
+        # QSerialPortInfo style Windows locations
+        if port is not None and port.startswith("\\\\.\\"):
+            port = port[4:]
+
+        with self._lock:
+            info = self._by_device.get(port)
+            if info is None:
+                info = self._by_name.get(port)
+
+        return info
+
+    def by_serial(self, serial_number: str) -> AUxPortInfo:
+
+        self._ensure()
+        with self._lock:
+            return self._by_serial.get(serial_number)
+
+    def by_usb_id(self, usb_id: str) -> list:
+        """The ports with this "VID:PID" (case insensitive)"""
+        self._ensure()
+        with self._lock:
+            return list(self._by_usb_id.get(usb_id.upper(), []))
+
+    def __contains__(self, port: str) -> bool:
+
+        return self.get(port) is not None
+
+#--------------------------------------------------------------------------------------
+# port_registry()
+#
+# The port registry shared by everything in this process
+
+_port_registry = None
+_port_registry_lock = Lock()
+
+def port_registry() -> AUxPortRegistry:
+
+    global _port_registry
+
+    with _port_registry_lock:
+        if _port_registry is None:
+            _port_registry = AUxPortRegistry()
+
+    return _port_registry
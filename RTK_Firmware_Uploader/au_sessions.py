@@ -0,0 +1,239 @@
+#-----------------------------------------------------------------------------
+# au_sessions.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Loader session pool - keeps the esptool connection to a device open
+# between jobs.
+#
+# Connecting costs a reset into the bootloader, the sync handshake and (for
+# most jobs) uploading the flasher stub. A job that leaves the ESP32 in the
+# bootloader - read MAC, erase, verify - hands its connection to the pool
+# when another job for the same port is already queued, and that job takes
+# it over and skips all of that. With nothing queued, those jobs reset the
+# ESP32 and end the connection, as an upload always does.
+#
+# Before a pooled connection is reused it is checked with a register read;
+# if that fails it is closed and the job connects from scratch. Connections
+# are closed once idle for IDLE_TIMEOUT seconds - they hold the serial port
+# open - and at once when the port goes away, something else (the serial
+# reset) needs the port, or the program ends. A connection the pool closes
+# resets the ESP32 first, so it does not stay in the bootloader.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import time
+from threading import Thread, Lock
+
+from .au_ports import port_registry
+from .au_startup import lazy_import
+
+esptool = lazy_import("esptool") # pip install esptool
+
+#--------------------------------------------------------------------------------------
+# AUxSessionPool
+#
+# Thread safe. A pooled connection belongs to the pool until a job take()s it,
+# and to that job until it is put() back - so only one job uses it at a time.
+#
+# Example:
+#
+#   esp = session_pool().take(port, "esp32")
+#   if esp is None:
+#       esp = ... connect ...
+#   ...
+#   session_pool().put(port, "esp32", esp)
+
+class AUxSessionPool(object):
+
+    # close a connection not used for this long (seconds)
+    IDLE_TIMEOUT = 30.0
+
+    # longest wait for the health check register read (seconds)
+    HEALTH_TIMEOUT = 0.5
+
+    # how often idle connections are looked for (seconds)
+    _REAP_INTERVAL = 1.0
+
+    def __init__(self, idle_timeout: float=IDLE_TIMEOUT) -> None:
+
+        object.__init__(self)
+
+        self.idle_timeout = idle_timeout
+        self.enabled = True
+
+        self._lock = Lock()
+        self._sessions = {}         # port -> (chip, esp, released at)
+        self._reaper = None
+
+        # reuse counts
+        self.hits = 0
+        self.misses = 0
+
+        port_registry().add_listener(self._on_ports_changed)
+
+    #------------------------------------------------------
+    # take()
+    #
+    # The pooled connection to port, if there is one for chip and it still
+    # answers - else None. Either way the pool no longer holds a connection to port.
+
+    def take(self, port: str, chip: str):
+
+        with self._lock:
+            entry = self._sessions.pop(port, None)
+
+        if entry is None:
+            with self._lock:
+                self.misses += 1
+            return None
+
+        pooled_chip, esp, released = entry
+        if pooled_chip != chip or time.monotonic() - released > self.idle_timeout or not self._healthy(esp):
+            self._close(esp)
+            with self._lock:
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return esp
+
+    def put(self, port: str, chip: str, esp) -> None:
+        """Keep a connection for the next job on port"""
+        if not self.enabled:
+            self._close(esp)
+            return
+
+        with self._lock:
+            previous = self._sessions.pop(port, None)
+            self._sessions[port] = (chip, esp, time.monotonic())
+            if self._reaper is None:
+                self._reaper = Thread(target=self._reap, daemon=True)
+                self._reaper.start()
+
+        if previous is not None:
+            self._close(previous[1])
+
+    def evict(self, port: str) -> bool:
+        """Close the pooled connection to port - returns False if there was none"""
+        with self._lock:
+            entry = self._sessions.pop(port, None)
+
+        if entry is None:
+            return False
+
+        self._close(entry[1])
+        return True
+
+    def close_all(self) -> None:
+
+        with self._lock:
+            entries = list(self._sessions.values())
+            self._sessions = {}
+
+        for _, esp, _ in entries:
+            self._close(esp)
+
+    def ports(self) -> list:
+
+        with self._lock:
+            return list(self._sessions.keys())
+
+    #------------------------------------------------------
+    # A cheap round trip - the loader (ROM or stub) answers a register read
+
+    def _healthy(self, esp) -> bool:
+
+        try:
+            if not esp._port.is_open:
+                return False
+            esp._port.reset_input_buffer()
+            esp.read_reg(esptool.loader.ESPLoader.CHIP_DETECT_MAGIC_REG_ADDR, timeout=self.HEALTH_TIMEOUT)
+        except Exception:
+            return False
+
+        return True
+
+    # the ESP32 leaves the bootloader and runs its firmware, then the port is closed
+    @staticmethod
+    def _close(esp) -> None:
+
+        try:
+            esp.hard_reset()
+        except Exception:
+            pass
+
+        try:
+            esp._port.close()
+        except Exception:
+            pass
+
+    # close connections that sat idle too long - the thread ends once the pool is empty
+    def _reap(self) -> None:
+
+        while True:
+            time.sleep(self._REAP_INTERVAL)
+
+            # taken out of the pool under the lock, so a connection put back meanwhile is not closed
+            now = time.monotonic()
+            with self._lock:
+                if not self._sessions:
+                    self._reaper = None
+                    return
+                idle = [self._sessions.pop(port)[1] for port, (_, _, released) in list(self._sessions.items())
+                        if now - released > self.idle_timeout]
+
+            for esp in idle:
+                self._close(esp)
+
+    # registry listener - a port that went away takes its connection with it
+    def _on_ports_changed(self, added, removed) -> None:
+
+        for info in removed:
+            self.evict(info.device)
+
+#--------------------------------------------------------------------------------------
+# session_pool()
+#
+# The session pool shared by everything in this process
+
+_session_pool = None
+_session_pool_lock = Lock()
+
+def session_pool() -> AUxSessionPool:
+
+    global _session_pool
+
+    with _session_pool_lock:
+        if _session_pool is None:
+            _session_pool = AUxSessionPool()
+
+    return _session_pool
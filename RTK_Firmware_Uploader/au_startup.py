@@ -0,0 +1,180 @@
+#-----------------------------------------------------------------------------
+# au_startup.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Fast startup - lazy imports, background preloading and a startup report.
+#
+# esptool (and what it pulls in) is the slowest thing the uploader imports, and
+# nothing needs it until the first job runs. Modules that use it import it with
+# lazy_import(): the name is bound at once, the module is only imported when
+# one of its attributes is first used. Once the window is up, preload() imports
+# them on a background thread, so the first job does not wait either.
+#
+# With the environment variable RTK_UPLOADER_STARTUP_REPORT set (or the
+# --startup-report argument) the GUI prints how long each startup step took.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import sys
+import time
+import importlib
+from threading import Thread, Lock
+
+#--------------------------------------------------------------------------------------
+# AUxLazyModule
+#
+# Stands in for a module until it is used. The first attribute access imports
+# the module (importlib handles threads racing to do so).
+#
+# Example:
+#
+#   esptool = lazy_import("esptool")
+#   ...
+#   esptool.loader.ESPLoader      # esptool is imported here
+
+class AUxLazyModule(object):
+
+    def __init__(self, name: str) -> None:
+
+        object.__init__(self)
+
+        self._name = name
+        self._module = None
+
+    def _load(self):
+
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+
+        return self._module
+
+    @property
+    def loaded(self) -> bool:
+
+        return self._module is not None or self._name in sys.modules
+
+    def __getattr__(self, item):
+
+        return getattr(self._load(), item)
+
+    def __repr__(self) -> str:
+
+        return "<lazy module '{}'{}>".format(self._name, "" if self.loaded else " (not loaded)")
+
+def lazy_import(name: str):
+    """A module - or, if not imported yet, a stand in that imports it on first use"""
+
+    module = sys.modules.get(name)
+    return module if module is not None else AUxLazyModule(name)
+
+#--------------------------------------------------------------------------------------
+# preload()
+#
+# Import modules on a background thread. Each (name, seconds) is passed to
+# on_loaded, if given - seconds is about 0 for modules that were already
+# imported - and on_done is called at the end. Returns the (daemon) thread.
+
+PRELOAD_MODULES = ["esptool", "serial", "sqlite3"]
+
+def preload(names: list=None, on_loaded=None, on_done=None) -> Thread:
+
+    def load():
+        for name in (names if names is not None else PRELOAD_MODULES):
+            start = time.perf_counter()
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                continue
+            if on_loaded is not None:
+                on_loaded(name, time.perf_counter() - start)
+        if on_done is not None:
+            on_done()
+
+    thread = Thread(target=load, daemon=True)
+    thread.start()
+    return thread
+
+#--------------------------------------------------------------------------------------
+# AUxStartupReport
+#
+# Time marks from the start of the uploader - the first import of this module,
+# which the package entry points do before anything else.
+
+_STARTUP_REPORT_ENV = "RTK_UPLOADER_STARTUP_REPORT"
+
+class AUxStartupReport(object):
+
+    def __init__(self, enabled: bool=False) -> None:
+
+        object.__init__(self)
+
+        self.enabled = enabled
+        self.start = time.perf_counter()
+
+        self._lock = Lock()
+        self._marks = []        # (name, seconds since start)
+
+    def mark(self, name: str) -> float:
+
+        seconds = time.perf_counter() - self.start
+        with self._lock:
+            self._marks.append((name, seconds))
+
+        return seconds
+
+    @property
+    def marks(self) -> list:
+
+        with self._lock:
+            return list(self._marks)
+
+    def report(self, out=None) -> None:
+
+        if not self.enabled:
+            return
+
+        out = out if out is not None else sys.__stderr__
+        if out is None:         # windowed (frozen) apps have no console
+            return
+
+        previous = 0.0
+        out.write("Startup:\n")
+        for name, seconds in self.marks:
+            out.write("  {:>8.1f} ms  {:>+8.1f} ms  {}\n".format(seconds * 1000, (seconds - previous) * 1000, name))
+            previous = seconds
+        out.flush()
+
+_startup_report = AUxStartupReport(bool(os.environ.get(_STARTUP_REPORT_ENV)) or "--startup-report" in sys.argv)
+
+def startup_report() -> AUxStartupReport:
+
+    return _startup_report
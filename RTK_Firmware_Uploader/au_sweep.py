@@ -0,0 +1,258 @@
+#-----------------------------------------------------------------------------
+# au_sweep.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Sweeps - read the MAC of, or erase, every connected device at once.
+#
+# A sweep runs one job (read MAC or erase flash) on each matching port, all
+# at the same time on a worker pool, and collects a result row per port:
+#
+#   port, serial (USB serial number of the adapter), usb_id, description,
+#   mac, status, ok, error, seconds
+#
+# The rows can be printed as a table or written as CSV. By default every USB
+# serial port is swept; a pattern (fnmatch style, matched against the port,
+# USB serial number, VID:PID and description) narrows that down.
+#
+# AUxSweep only tracks the jobs - the GUI feeds it from its own worker pool,
+# run_sweep() runs one from start to end (for the command line).
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import sys
+import time
+from fnmatch import fnmatch
+from threading import Lock, Event
+
+from .au_action import AxJob, AxEvent
+from .au_worker import AUxWorkerPool
+from .au_act_esptool import AUxEsptoolEraseFlash, AUxEsptoolReadMAC
+from .au_ports import port_registry, AUxPortInfo
+from .au_audit import AUxAuditRecorder, audit_log, export_csv
+
+# sweep name -> action id
+SWEEP_ACTIONS = {"read_mac": AUxEsptoolReadMAC.ACTION_ID,
+                 "erase": AUxEsptoolEraseFlash.ACTION_ID}
+
+SWEEP_FIELDS = ["port", "serial", "usb_id", "description", "mac", "status", "ok", "error", "seconds"]
+
+#--------------------------------------------------------------------------------------
+# sweep_ports()
+#
+# The ports to sweep - every USB serial port, or those matching pattern
+
+def sweep_ports(pattern: str=None) -> list:
+
+    ports = []
+    for info in port_registry().ports():
+        if info.vid is None:
+            continue
+        if pattern is not None and not any(fnmatch(str(value).lower(), pattern.lower()) for value in
+                                           (info.device, info.name, info.serial_number, info.usb_id,
+                                            info.description) if value):
+            continue
+        ports.append(info)
+
+    return ports
+
+#--------------------------------------------------------------------------------------
+# AUxSweep
+#
+# One sweep - its jobs and results. Feed it the events and finished
+# notifications of its jobs; it ignores those of other jobs.
+#
+# Example:
+#
+#   sweep = AUxSweep("read_mac", sweep_ports())
+#   for job in sweep.jobs():
+#       pool.add_job(job)
+#   ...
+#   sweep.on_event(event)                       # from the pool callback
+#   if sweep.on_finished(job_id, status):       # True once every port is done
+#       print(sweep.table())
+
+class AUxSweep(object):
+
+    def __init__(self, sweep: str, ports: list, timeout: float=None) -> None:
+
+        object.__init__(self)
+
+        if sweep not in SWEEP_ACTIONS:
+            raise ValueError("unknown sweep '{}' (use {})".format(sweep, ", ".join(SWEEP_ACTIONS)))
+
+        self.sweep = sweep
+        self.action_id = SWEEP_ACTIONS[sweep]
+        self._timeout = timeout
+
+        self._lock = Lock()
+        self._rows = []
+        self._by_job = {}           # job id -> row, until the job finishes
+        self._started = None
+        self.seconds = None
+
+        for info in ports:
+            # pyserial URLs (socket:// ...) are passed as strings
+            if not isinstance(info, AUxPortInfo):
+                info = AUxPortInfo(str(info), str(info), "")
+            self._rows.append({"port": info.device, "serial": info.serial_number, "usb_id": info.usb_id,
+                               "description": info.description, "mac": None, "status": None, "ok": False,
+                               "error": None, "seconds": None})
+
+    def __len__(self) -> int:
+
+        return len(self._rows)
+
+    @property
+    def done(self) -> bool:
+
+        with self._lock:
+            return not self._by_job
+
+    def owns(self, job_id: int) -> bool:
+
+        with self._lock:
+            return job_id in self._by_job
+
+    def jobs(self) -> list:
+        """The jobs to run - one per port"""
+        jobs = []
+        with self._lock:
+            self._started = time.time()
+            for row in self._rows:
+                job = AxJob(self.action_id, {"port": row["port"]})
+                if self._timeout is not None:
+                    job.job_timeout = self._timeout
+                row["_started"] = time.monotonic()
+                self._by_job[job.job_id] = row
+                jobs.append(job)
+
+        return jobs
+
+    def on_event(self, event: AxEvent) -> None:
+
+        if event.event_type != AxEvent.EVENT_MAC:
+            return
+
+        with self._lock:
+            row = self._by_job.get(event.job_id)
+            if row is not None:
+                row["mac"] = event.mac
+
+    def on_finished(self, job_id: int, status: int) -> bool:
+        """Record a finished job - returns True when that was the last one"""
+        with self._lock:
+            row = self._by_job.pop(job_id, None)
+            if row is None:
+                return False
+
+            row["status"] = status
+            row["ok"] = status == 0
+            row["seconds"] = round(time.monotonic() - row.pop("_started"), 2)
+            if status == AUxWorkerPool.STATUS_CANCELLED:
+                row["error"] = "cancelled"
+            elif status == AUxWorkerPool.STATUS_TIMEOUT:
+                row["error"] = "timed out"
+            elif status != 0:
+                row["error"] = "failed with status {}".format(status)
+
+            if self._by_job:
+                return False
+
+            self.seconds = round(time.time() - self._started, 2)
+            return True
+
+    def rows(self) -> list:
+
+        with self._lock:
+            return [{field: row[field] for field in SWEEP_FIELDS} for row in self._rows]
+
+    @property
+    def failed(self) -> int:
+
+        return sum(1 for row in self.rows() if not row["ok"])
+
+    def table(self) -> str:
+        """The results as an aligned text table"""
+        lines = ["{:<24} {:<20} {:<17} {:<8} {:>7}".format("Port", "Serial", "MAC", "Result", "Seconds")]
+        for row in self.rows():
+            lines.append("{:<24} {:<20} {:<17} {:<8} {:>7}".format(
+                row["port"], row["serial"] or "-", row["mac"] or "-", "OK" if row["ok"] else "FAILED",
+                "" if row["seconds"] is None else "{:.1f}".format(row["seconds"])))
+
+        return "\n".join(lines)
+
+    def write_csv(self, out) -> None:
+
+        export_csv(self.rows(), out)
+
+#--------------------------------------------------------------------------------------
+# run_sweep()
+#
+# Run a sweep to the end on a worker pool of its own. out gets a line as each
+# port finishes. Ctrl-C cancels what is left.
+
+def run_sweep(sweep: AUxSweep, out=None, audit: bool=True) -> AUxSweep:
+
+    out = out if out is not None else sys.__stdout__
+    done = Event()
+
+    def on_worker_callback(*args):
+
+        if len(args) >= 2 and args[0] == AUxWorkerPool.TYPE_EVENT:
+            sweep.on_event(args[1])
+
+        elif len(args) >= 5 and args[0] == AUxWorkerPool.TYPE_FINISHED:
+            out.write("{}: {}\n".format(args[4], "OK" if args[1] == 0 else "failed, status {}".format(args[1])))
+            out.flush()
+            if sweep.on_finished(args[3], args[1]):
+                done.set()
+
+    if len(sweep) == 0:
+        return sweep
+
+    pool = AUxWorkerPool(on_worker_callback, AUxAuditRecorder(audit_log()) if audit else None)
+    pool.add_action(AUxEsptoolEraseFlash(), AUxEsptoolReadMAC())
+
+    try:
+        for job in sweep.jobs():
+            pool.add_job(job)
+        try:
+            # wait in steps, so Ctrl-C is seen on Windows too
+            while not done.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            out.write("Cancelling...\n")
+            pool.cancel()
+            done.wait()
+    finally:
+        pool.shutdown()
+
+    return sweep
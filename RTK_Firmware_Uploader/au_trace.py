@@ -0,0 +1,307 @@
+#-----------------------------------------------------------------------------
+# au_trace.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# Job tracing - where the seconds of a job go.
+#
+# With tracing on, every job the workers run is recorded as nested spans:
+# the wait in the queue, then the job itself, and within that opening the
+# port, the sync handshake, the stub upload, each region written (and its
+# compression), verify, reset and so on. Actions mark their steps with
+# span(), which costs next to nothing when tracing is off.
+#
+# Spans are written to a file in the Chrome trace event format (JSON array
+# form, appended to as jobs finish), one track per serial port. Open it in
+# chrome://tracing or https://ui.perfetto.dev.
+#
+# Each job can also be run under cProfile - with profiling on, or for a job
+# with a true "profile" value. The profile is saved next to the trace as
+# job-<date>-<time>-<id>.prof (view with python -m pstats, or snakeviz), and
+# named in the job's span.
+#
+# Tracing is turned on by the command line (--trace FILE, --profile), by
+# set_job_tracer(), or for the GUI by the environment variables
+# RTK_UPLOADER_TRACE (the trace file) and RTK_UPLOADER_PROFILE.
+#
+# Nothing in this file depends on Qt.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import sys
+import json
+import time
+import cProfile
+from threading import Lock, local
+
+_TRACE_ENV = "RTK_UPLOADER_TRACE"
+_PROFILE_ENV = "RTK_UPLOADER_PROFILE"
+
+# trace timestamps are wall clock microseconds, so traces from several runs line up;
+# spans are timed with perf_counter(), from this common start
+_EPOCH_WALL = time.time()
+_EPOCH_PERF = time.perf_counter()
+
+def _timestamp(perf: float) -> float:
+
+    return round((_EPOCH_WALL + perf - _EPOCH_PERF) * 1e6, 1)
+
+#--------------------------------------------------------------------------------------
+# AUxJobTrace
+#
+# The spans of one job. Only the thread running the job adds to it.
+
+class AUxJobTrace(object):
+
+    def __init__(self, job_id: int, name: str, track: str) -> None:
+
+        object.__init__(self)
+
+        self.job_id = job_id
+        self.name = name
+        self.track = track          # the port - one track per port in the viewer
+        self.events = []            # complete ("X") trace events
+        self.profile_file = None
+
+        self._profiler = None
+
+    def add(self, name: str, start: float, end: float, **args) -> None:
+        """A span from start to end (perf_counter() times)"""
+        event = {"name": name, "ph": "X", "ts": _timestamp(start), "dur": round((end - start) * 1e6, 1),
+                 "cat": "job"}
+        args["job_id"] = self.job_id
+        event["args"] = {key: value if isinstance(value, (int, float, bool, type(None))) else str(value)
+                         for key, value in args.items()}
+        self.events.append(event)
+
+    # cProfile the job - False if that could not be done (Python 3.12 and later
+    # allow only one profiler at a time, so only one of several jobs running at
+    # once gets profiled)
+    def start_profile(self) -> bool:
+
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            return False
+
+        self._profiler = profiler
+        return True
+
+    def stop_profile(self):
+
+        profiler, self._profiler = self._profiler, None
+        if profiler is not None:
+            profiler.disable()
+
+        return profiler
+
+#--------------------------------------------------------------------------------------
+# span()
+#
+# Mark a step of the running job. A no-op outside a traced job.
+#
+# Example:
+#
+#   with span("sync", attempts=7):
+#       esp.connect()
+
+_trace_state = local()
+
+class _Span(object):
+
+    __slots__ = ("_trace", "_name", "_args", "_start")
+
+    def __init__(self, trace: AUxJobTrace, name: str, args: dict) -> None:
+
+        self._trace = trace
+        self._name = name
+        self._args = args
+        self._start = None
+
+    def __enter__(self):
+
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+
+        if exc_type is not None:
+            self._args["error"] = exc_type.__name__
+        self._trace.add(self._name, self._start, time.perf_counter(), **self._args)
+        return False
+
+    def set(self, **args) -> None:
+        """Add to the span's arguments - results only known at the end"""
+        self._args.update(args)
+
+class _NoSpan(object):
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> bool:
+        return False
+
+    def set(self, **args) -> None:
+        pass
+
+_NO_SPAN = _NoSpan()
+
+def span(name: str, **args):
+
+    trace = getattr(_trace_state, "trace", None)
+    if trace is None:
+        return _NO_SPAN
+
+    return _Span(trace, name, args)
+
+def set_job_trace(trace: AUxJobTrace) -> AUxJobTrace:
+    """Set the trace of the job the calling thread runs - returns the previous one"""
+    previous = getattr(_trace_state, "trace", None)
+    _trace_state.trace = trace
+    return previous
+
+#--------------------------------------------------------------------------------------
+# AUxTracer
+#
+# Writes the traces of finished jobs to one file, and the profiles of profiled
+# jobs next to it. Thread safe - each port worker reports to it.
+#
+# The file is a JSON array of trace events, left open at the end - the format
+# allows that, so jobs can be appended to the file as they finish.
+#
+# Example:
+#
+#   set_job_tracer(AUxTracer("trace.json", profile=True))
+
+class AUxTracer(object):
+
+    def __init__(self, filename: str, profile: bool=False) -> None:
+
+        object.__init__(self)
+
+        self.filename = os.path.abspath(filename)
+        self.profile = profile
+
+        self._lock = Lock()
+        self._tracks = {}           # track (port) -> tid
+        self.jobs = 0
+
+    def job_started(self, job, queued_at: float, track: str) -> AUxJobTrace:
+        """A job leaves the queue - queued_at is its time.monotonic() stamp"""
+        trace = AUxJobTrace(job.job_id, job.action_id, track or "-")
+
+        # the queue wait, back dated - monotonic() and perf_counter() differ by an offset
+        now = time.perf_counter()
+        trace.add("queue", now - (time.monotonic() - queued_at), now)
+
+        return trace
+
+    # whether to profile this job
+    def profiling(self, job) -> bool:
+
+        return self.profile or bool(job.get("profile", False))
+
+    def job_finished(self, trace: AUxJobTrace, status: int) -> None:
+
+        profiler = trace.stop_profile()
+        if profiler is not None:
+            # job ids start again with each run - the time keeps the name unique
+            trace.profile_file = os.path.join(os.path.dirname(self.filename), "job-{}-{}.prof".format(
+                time.strftime("%Y%m%d-%H%M%S"), trace.job_id))
+            try:
+                profiler.dump_stats(trace.profile_file)
+            except OSError as error:
+                print("Could not write the profile {}: {}".format(trace.profile_file, error), file=sys.__stderr__)
+                trace.profile_file = None
+
+        # the job span is the last to end - it gets the outcome
+        if trace.events:
+            trace.events[-1]["args"].update(status=status, profile=trace.profile_file)
+
+        with self._lock:
+            events = []
+            tid = self._tracks.get(trace.track)
+            if tid is None:
+                tid = self._tracks[trace.track] = len(self._tracks) + 1
+                events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                               "args": {"name": trace.track}})
+
+            for event in trace.events:
+                event["pid"] = os.getpid()
+                event["tid"] = tid
+                events.append(event)
+
+            try:
+                with open(self.filename, "a", encoding="utf-8") as f:
+                    if f.tell() == 0:
+                        f.write("[\n")
+                    for event in events:
+                        f.write(json.dumps(event) + ",\n")
+            except OSError as error:
+                print("Could not write the trace {}: {}".format(self.filename, error), file=sys.__stderr__)
+                return
+
+            self.jobs += 1
+
+#--------------------------------------------------------------------------------------
+# job_tracer()
+#
+# The tracer the workers of this process use - None when tracing is off. Set up
+# from the environment on first use, unless set_job_tracer() got there first.
+
+_job_tracer = None
+_job_tracer_set = False
+_job_tracer_lock = Lock()
+
+def job_tracer() -> AUxTracer:
+
+    global _job_tracer, _job_tracer_set
+
+    with _job_tracer_lock:
+        if not _job_tracer_set:
+            _job_tracer_set = True
+            if os.environ.get(_TRACE_ENV):
+                _job_tracer = AUxTracer(os.environ[_TRACE_ENV], bool(os.environ.get(_PROFILE_ENV)))
+
+    return _job_tracer
+
+def set_job_tracer(tracer: AUxTracer) -> AUxTracer:
+    """Turn tracing on (or off, with None) - returns the previous tracer"""
+    global _job_tracer, _job_tracer_set
+
+    with _job_tracer_lock:
+        previous = _job_tracer
+        _job_tracer = tracer
+        _job_tracer_set = True
+
+    return previous
@@ -0,0 +1,181 @@
+#-----------------------------------------------------------------------------
+# au_upload.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# This file holds the upload logic that is shared by the GUI and the
+# headless command line uploader: resource file lookup, the per user cache
+# directory, selection of the bootloader/partition images for a detected
+# flash size, baud rate limits and the images of an upload.
+#
+# Nothing in this file depends on Qt, so it can be used without a display.
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import sys
+import os
+import os.path
+import platform
+from functools import lru_cache
+
+# sub folder for our resource files
+_RESOURCE_DIRECTORY = "resource"
+
+#https://stackoverflow.com/a/50914550
+def resource_path(relative_path):
+    """ Get absolute path to resource, works for dev and for PyInstaller """
+    base_path = getattr(sys, '_MEIPASS', os.path.dirname(os.path.abspath(__file__)))
+    return os.path.join(base_path, _RESOURCE_DIRECTORY, relative_path)
+
+# read once - the window title, the about box and the command line all ask for it
+@lru_cache(maxsize=None)
+def get_version(rel_path: str) -> str:
+    try: 
+        with open(resource_path(rel_path), encoding='utf-8') as fp:
+            for line in fp.read().splitlines():
+                if line.startswith("__version__"):
+                    delim = '"' if '"' in line else "'"
+                    return line.split(delim)[1]
+            raise RuntimeError("Unable to find version string.")
+    except:
+        raise RuntimeError("Unable to find _version.py.")
+
+# Where the uploader keeps what it learns and prepares - prepared images, baud rate profiles
+def user_cache_dir() -> str:
+
+    if platform.system() == "Windows":
+        base = os.environ.get("LOCALAPPDATA", os.path.expanduser("~"))
+    elif platform.system() == "Darwin":
+        base = os.path.expanduser("~/Library/Caches")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache"))
+
+    return os.path.join(base, "RTK_Firmware_Uploader")
+
+# Where the uploader keeps records that must not be thrown away - the audit log
+def user_data_dir() -> str:
+
+    if platform.system() == "Windows":
+        base = os.environ.get("APPDATA", os.path.expanduser("~"))
+    elif platform.system() == "Darwin":
+        base = os.path.expanduser("~/Library/Application Support")
+    else:
+        base = os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share"))
+
+    return os.path.join(base, "RTK_Firmware_Uploader")
+
+#--------------------------------------------------------------------------------------
+# select_images()
+#
+# Pick the bootloader and partition table for the firmware and flash size.
+#
+# The firmware variant comes from info - what the image says about itself (see
+# au_image_info.py) - or, without it, from the firmware file name.
+#
+# Returns (bootloader, partition, sizeCorrect, sizeMessages, messages). sizeCorrect
+# is False when the firmware does not match the flash size - the caller decides
+# whether to continue. sizeMessages explain the mismatch, messages report the
+# bootloader choice.
+
+# partition table for each flash size
+_PARTITIONS = {16: "RTK_Surveyor_Partitions_16MB.bin",      # RTK Firmware or RTK Everywhere
+               8: "RTK_Everywhere_Partitions_8MB.bin",      # RTK Postcard (ESP32 Pico Mini)
+               4: "RTK_Surveyor_Partitions_4MB.bin"}        # Original RTK Surveyor
+
+# bootloader and the flash sizes of each variant - and for firmware that is not recognised
+_VARIANT_IMAGES = {"RTK_Everywhere": ("RTK_Everywhere.ino.bootloader.bin", (16, 8)),
+                   "RTK_Surveyor": ("RTK_Surveyor.ino.bootloader.bin", (16, 4)),
+                   None: ("RTK_Surveyor.ino.bootloader.bin", (16,))}
+
+# The firmware variants - (name, what their file names and images contain), in the
+# order they are checked
+FIRMWARE_VARIANTS = {"RTK_Everywhere": ("RTK Everywhere Firmware", "RTK_Everywhere_Firmware"),
+                     "RTK_Surveyor": ("RTK Surveyor Firmware", "RTK_Surveyor_Firmware")}
+
+def select_images(firmware: str, flashSize: int, info=None):
+
+    sizeMessages = []
+    messages = []
+
+    if info is not None:
+        variant = info.variant
+        source = "from the file name" if info.variant_source == "filename" else "from the image"
+    else:
+        variant = None
+        source = "from the file name"
+        for candidate, (_, marker) in FIRMWARE_VARIANTS.items():
+            if firmware.find(marker) >= 0:
+                variant = candidate
+                break
+
+    bootloader, flashSizes = _VARIANT_IMAGES[variant]
+
+    thePartitionFileName = resource_path(_PARTITIONS.get(flashSize, _PARTITIONS[16]))
+    firmwareSizeCorrect = flashSize in flashSizes
+    if not firmwareSizeCorrect and flashSize in _PARTITIONS:
+        sizeMessages.append("Flash size is {}MB. {} expects {}MB\n".format(
+            flashSize, FIRMWARE_VARIANTS[variant][0] if variant else "Unknown firmware",
+            " or ".join(str(size) for size in flashSizes)))
+
+    theBootloaderFileName = resource_path(bootloader)
+    if variant is not None:
+        messages.append("{} detected ({}). Using {}\n".format(FIRMWARE_VARIANTS[variant][0], source, bootloader))
+    else:
+        messages.append("Using {}\n".format(bootloader))
+
+    return theBootloaderFileName, thePartitionFileName, firmwareSizeCorrect, sizeMessages, messages
+
+#--------------------------------------------------------------------------------------
+# limit_baud()
+#
+# Some host/adapter combinations fail at 921600. Returns (baud, messages)
+
+def limit_baud(baud: str, portDescription: str, flashSize: int):
+
+    messages = []
+
+    if baud == "921600":
+        if (platform.system() == "Darwin"): # 921600 fails on MacOS
+            messages.append("MacOS detected. Limiting baud to 460800\n")
+            baud = "460800"
+        if ((portDescription.find("CH342") >= 0) and (flashSize == 16)): # 921600 fails on CH342 + 16MB ESP32 (ie, RTK Torch)
+            messages.append("RTK Torch detected. Limiting baud to 460800\n")
+            baud = "460800"
+
+    return baud, messages
+
+#--------------------------------------------------------------------------------------
+# Upload images
+
+# The (address, file) images of an upload, in the order they are written
+def flash_images(bootloader: str, partition: str, firmware: str) -> list:
+
+    return [(0x1000, bootloader),
+            (0x8000, partition),
+            (0xe000, resource_path("boot_app0.bin")),
+            (0x10000, firmware)]
@@ -14,7 +14,8 @@
 # This file implements the main logic of the background worker system.
 #
 # In general, the worker implements a background thread which waits for
-# "jobs" to be passed in for execution via a queue object. Once a job is
+# "jobs" to be passed in for execution via a queue object. The thread blocks
+# on the queue, so a job starts as soon as it is queued. Once a job is
 # detected, it is sent to the target "action" object for execution.
 #
 # During job execution, messages are relayed to the main application
@@ -25,6 +26,25 @@
 # captured for output. Also, "exit()" calls are trapped, so  the thread
 # will continue to execute.
 #
+# To flash several devices at once, a worker pool runs one worker (and
+# thread) per serial port. Since stdout/stderr are process wide, output
+# is routed to the wedge registered by the thread that is writing.
+#
+# Output is passed on a line at a time, not a write() at a time, and every job
+# keeps a log of its stdout and stderr - bounded, the oldest output is dropped
+# first - so the full output of a job that failed can be fetched afterwards
+# with job_log().
+#
+# With tracing on (see au_trace.py), each job is recorded as nested spans -
+# the queue wait, the job, and the steps the action marks - and can be run
+# under cProfile.
+#
+# Jobs can be cancelled, and run against a deadline (the action's TIMEOUT or
+# the job's "job_timeout" value). A watchdog cancels a job that runs past its
+# deadline - which closes its serial port, so esptool stops waiting on a silent
+# device. If the job still does not stop, the watchdog gives up on its thread,
+# reports the job finished and starts a new thread for the jobs that follow.
+#
 # More information on qwiic is at https://www.sparkfun.com/artemis
 #
 # Do you like this library? Help support SparkFun. Buy a board!
@@ -54,24 +74,104 @@
 # pylint: disable=old-style-class, missing-docstring, wrong-import-position
 #
 #-----------------------------------------------------------------------------
+import sys
 import time
 import queue
-from threading import Thread
-from .au_action import AxAction, AxJob
-from contextlib import redirect_stdout, redirect_stderr
+from collections import deque, OrderedDict
+from threading import Thread, Lock, local, current_thread
+from .au_action import AxAction, AxJob, AxCancelToken, set_event_sink, set_cancel_token, set_queued_jobs
+from .au_trace import AUxJobTrace, job_tracer, set_job_trace
+from contextlib import contextmanager
+
+#--------------------------------------------------------------------------------------
+# AUxJobLog
+#
+# The output of one job - stdout and stderr, in the order written - in a ring
+# buffer of at most max_bytes characters. Once full, the oldest output is
+# dropped (and counted). Thread safe - the watchdog writes to it too.
+
+class AUxJobLog(object):
+
+    STDOUT = "stdout"
+    STDERR = "stderr"
+
+    MAX_BYTES = 256 * 1024
+
+    def __init__(self, job_id:int=None, max_bytes:int=MAX_BYTES):
+
+        object.__init__(self)
+
+        self.job_id = job_id
+        self.status = None          # set once the job finishes
+
+        self._max_bytes = max_bytes
+        self._lock = Lock()
+        self._chunks = deque()      # (stream, text)
+        self._size = 0
+        self._dropped = 0
+
+    def write(self, stream:str, text:str) -> None:
+
+        if not text:
+            return
+
+        with self._lock:
+            self._chunks.append((stream, text))
+            self._size += len(text)
+
+            while self._size > self._max_bytes and len(self._chunks) > 1:
+                _, oldest = self._chunks.popleft()
+                self._size -= len(oldest)
+                self._dropped += len(oldest)
+
+    @property
+    def dropped(self) -> int:
+
+        with self._lock:
+            return self._dropped
+
+    def text(self, streams=(STDOUT, STDERR)) -> str:
+        """The log as text - stderr lines are marked with "[stderr] " """
+        with self._lock:
+            chunks = list(self._chunks)
+            dropped = self._dropped
+
+        parts = ["[... {} characters dropped ...]\n".format(dropped)] if dropped else []
+        for stream, text in chunks:
+            if stream not in streams:
+                continue
+            if stream == self.STDERR:
+                text = "".join("[stderr] " + line for line in text.splitlines(True))
+            parts.append(text)
+
+        return "".join(parts)
+
+    def __str__(self) -> str:
+
+        return self.text()
 
 #--------------------------------------------------------------------------------------
 # AUxIOWedge
 #
 # Used to redirect/capture output chars from the print() function and redirect to our
 # console. Allows the use of command line routines in this GUI app
+#
+# Writes are collected until a line ends (\n or \r), or flush() is called, so the
+# console gets whole lines rather than a call for every fragment print() writes.
+# Everything written also goes to the job log, if there is one - including the
+# output of a suppressed (stderr) wedge, which is not sent to the console.
 
 
 from io import TextIOWrapper, BytesIO
 
 
 class AUxIOWedge(TextIOWrapper):
-    def __init__(self, output_funct, suppress=False, newline="\n"):
+
+    # longest text held back waiting for a line end
+    MAX_PENDING = 4096
+
+    def __init__(self, output_funct, suppress=False, newline="\n", log:AUxJobLog=None,
+                 stream:str=AUxJobLog.STDOUT):
         super(AUxIOWedge, self).__init__(BytesIO(),
                                         encoding="utf-8",
                                         errors="surrogatepass",
@@ -79,14 +179,145 @@ class AUxIOWedge(TextIOWrapper):
 
         self._output_func = output_funct
         self._suppress = suppress
+        self._log = log
+        self._stream = stream
+        self._pending = []
+        self._pending_size = 0
 
     def write(self, buffer):
 
-        # Just send buffer to our output console
-        if not self._suppress:
-            self._output_func(buffer)
+        self._pending.append(buffer)
+        self._pending_size += len(buffer)
+
+        end = max(buffer.rfind("\n"), buffer.rfind("\r"))
+        if end >= 0:
+            # pass on the complete lines, hold the rest
+            rest = buffer[end + 1:]
+            self._pending[-1] = buffer[:end + 1]
+            self._emit()
+            if rest:
+                self._pending.append(rest)
+                self._pending_size = len(rest)
+        elif self._pending_size >= self.MAX_PENDING:
+            self._emit()
 
         return len(buffer)
+
+    def flush(self):
+
+        if self._pending:
+            self._emit()
+
+    def _emit(self):
+
+        text = "".join(self._pending)
+        self._pending = []
+        self._pending_size = 0
+
+        if self._log is not None:
+            self._log.write(self._stream, text)
+
+        # send the text to our output console
+        if not self._suppress and text:
+            self._output_func(text)
+
+#--------------------------------------------------------------------------------------
+# AUxIORouter
+#
+# redirect_stdout() swaps sys.stdout for the whole process, so two workers running at
+# the same time would capture each other's output. Instead, the router is installed
+# once as sys.stdout/sys.stderr and forwards each write to the wedge the *calling*
+# thread registered. Threads without a wedge write to the original stream.
+
+_io_targets = local()
+
+class AUxIORouter(object):
+
+    def __init__(self, stream_name, original):
+
+        object.__init__(self)
+
+        self._stream_name = stream_name
+        self._original = original
+
+    def _target(self):
+
+        target = getattr(_io_targets, self._stream_name, None)
+        return target if target is not None else self._original
+
+    def write(self, buffer):
+
+        target = self._target()
+        if target is None:      # windowed (frozen) apps have no console
+            return len(buffer)
+
+        return target.write(buffer)
+
+    def flush(self):
+
+        target = self._target()
+        if target is not None:
+            target.flush()
+
+    def __getattr__(self, item):
+
+        # everything else (encoding, isatty, fileno ...) comes from the real stream
+        return getattr(self._original, item)
+
+_router_lock = Lock()
+
+def _install_io_router():
+
+    with _router_lock:
+        if not isinstance(sys.stdout, AUxIORouter):
+            sys.stdout = AUxIORouter("stdout", sys.stdout)
+        if not isinstance(sys.stderr, AUxIORouter):
+            sys.stderr = AUxIORouter("stderr", sys.stderr)
+
+@contextmanager
+def redirect_thread_output(stdout, stderr):
+    """Send stdout/stderr writes made by the current thread to the given streams"""
+    _install_io_router()
+
+    prev_stdout = getattr(_io_targets, "stdout", None)
+    prev_stderr = getattr(_io_targets, "stderr", None)
+
+    _io_targets.stdout = stdout
+    _io_targets.stderr = stderr
+    try:
+        yield
+    finally:
+        _io_targets.stdout = prev_stdout
+        _io_targets.stderr = prev_stderr
+
+#--------------------------------------------------------------------------------------
+# The job a worker is running - its cancel token and deadline
+
+class AUxRunningJob(object):
+
+    def __init__(self, job:AxJob, timeout:float=None):
+
+        object.__init__(self)
+
+        self.job = job
+        self.token = AxCancelToken()
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout if timeout else None
+        self.timeout = timeout
+        self.status = None          # the status to report, once cancelled
+        self.cancelled_at = None
+        self.log = AUxJobLog(job.job_id)
+
+    def cancel(self, status:int, reason:str) -> bool:
+
+        if self.token.cancelled:
+            return False
+
+        # set before the token runs its hooks - the job can finish as soon as they do
+        self.status = status
+        self.cancelled_at = time.monotonic()
+        return self.token.cancel(reason)
+
 #--------------------------------------------------------------------------------------
 # Worker thread to manage background jobs passed in via a queue
 
@@ -96,8 +327,26 @@ class AUxWorker(object):
 
     TYPE_MESSAGE    = 1
     TYPE_FINISHED   = 2
+    TYPE_STARTED    = 3
+    TYPE_EVENT      = 4
+
+    # finished status of a job that was cancelled, or ran past its deadline
+    STATUS_CANCELLED    = 10
+    STATUS_TIMEOUT      = 11
+
+    # how long a cancelled job has to stop before the watchdog gives up on it (seconds)
+    CANCEL_GRACE = 10.0
 
-    def __init__(self, cb_function):
+    # how often the watchdog checks the running job (seconds)
+    _WATCHDOG_INTERVAL = 0.25
+
+    # queued by shutdown() to wake the thread so it can exit
+    _SHUTDOWN = None
+
+    # how many finished job logs are kept for job_log()
+    JOB_LOGS_KEPT = 16
+
+    def __init__(self, cb_function, recorder=None):
 
         object.__init__(self)
 
@@ -108,23 +357,119 @@ class AUxWorker(object):
 
         self._cb_function = cb_function
 
+        # optional job recorder (see au_audit.py) - told when each job starts and
+        # finishes, and of its events
+        self._recorder = recorder
+
         self._shutdown = False;
 
         # stash of registered actions
         self._actions = {}
 
-        # throw the work/job into a thread
-        self._thread = Thread(target = self.process_loop, args=(self._queue,))
-        self._thread.start()
+        self._lock = Lock()
+        self._running = None            # AUxRunningJob of the job in progress
+        self._pending_ids = set()       # jobs added and not yet taken from the queue
+        self._cancelled_ids = set()     # queued jobs to skip
+        self._abandoned = set()         # threads the watchdog gave up on
+        self._job_logs = OrderedDict()  # job id -> AUxJobLog, of the last JOB_LOGS_KEPT jobs
+
+        # queue to start latency - the time from add_job() until the job runs
+        self.last_latency = 0.0
+        self.max_latency = 0.0
+        self._total_latency = 0.0
+        self._latency_count = 0
+
+        # throw the work/job into a thread - a daemon, so a thread stuck in a
+        # job the watchdog gave up on cannot keep the app from exiting
+        self._thread = self._start_thread()
+
+        self._watchdog = Thread(target=self.watchdog_loop, daemon=True)
+        self._watchdog.start()
 
     # Make sure the thread stops running in Destructor. And add shutdown user method
     def __del__(self):
 
-        self._shutdown = True
+        self.shutdown()
 
     def shutdown(self):
 
-        self._shutdown = True
+        if not self._shutdown:
+            self._shutdown = True
+            # stop the running job, and wake the thread if it is blocked waiting on the queue
+            self.cancel()
+            self._queue.put(self._SHUTDOWN)
+
+    def _start_thread(self) -> Thread:
+
+        thread = Thread(target = self.process_loop, args=(self._queue,), daemon=True)
+        thread.start()
+        return thread
+
+    #------------------------------------------------------
+    # Cancel a job - the running one, or one still in the queue. With no job id,
+    # the running job and everything queued are cancelled. Cancelled jobs finish
+    # with STATUS_CANCELLED. Returns False if there was nothing to cancel.
+
+    def cancel(self, job_id:int=None) -> bool:
+
+        with self._lock:
+            running = self._running
+
+            if job_id is None:
+                # the queued jobs stay in the queue, marked to be skipped
+                self._cancelled_ids.update(self._pending_ids)
+
+            elif running is None or running.job.job_id != job_id:
+                if job_id not in self._pending_ids or job_id in self._cancelled_ids:
+                    return False
+                self._cancelled_ids.add(job_id)
+                return True
+
+        if running is None:
+            return job_id is None
+
+        return running.cancel(self.STATUS_CANCELLED, "cancelled")
+
+    # whether a job for port (not cancelled) is waiting in the queue - see job_queued()
+    def is_queued(self, port:str) -> bool:
+
+        with self._lock:
+            with self._queue.mutex:
+                return any(entry is not self._SHUTDOWN and entry[1].get("port") == port and
+                           entry[1].job_id not in self._cancelled_ids for entry in self._queue.queue)
+
+    @property
+    def running_job(self) -> AxJob:
+
+        with self._lock:
+            return self._running.job if self._running is not None else None
+
+    #------------------------------------------------------
+    # The log (AUxJobLog) of a job - running, or one of the last JOB_LOGS_KEPT to
+    # finish. With no job id, the log of the last job to fail. None if there is no
+    # such log.
+
+    def job_log(self, job_id:int=None) -> AUxJobLog:
+
+        with self._lock:
+            if job_id is None:
+                for log in reversed(self._job_logs.values()):
+                    if log.status not in (None, 0):
+                        return log
+                return None
+
+            if self._running is not None and self._running.job.job_id == job_id:
+                return self._running.log
+
+            return self._job_logs.get(job_id)
+
+    def _keep_log(self, log:AUxJobLog, status:int) -> None:
+
+        log.status = status
+        with self._lock:
+            self._job_logs[log.job_id] = log
+            while len(self._job_logs) > self.JOB_LOGS_KEPT:
+                self._job_logs.popitem(last=False)
 
     #------------------------------------------------------
     # Add a execution type/object (an AxAction) to our available
@@ -148,7 +493,11 @@ class AUxWorker(object):
         # get job ID
         job_id = theJob.job_id
 
-        self._queue.put(theJob)
+        with self._lock:
+            self._pending_ids.add(job_id)
+
+        # stamp the job with the time it was queued, to measure the start latency
+        self._queue.put((time.monotonic(), theJob))
 
         return job_id
 
@@ -157,15 +506,35 @@ class AUxWorker(object):
     #
     def message(self, message):
 
+        # a thread the watchdog gave up on no longer speaks for the worker
+        if current_thread() in self._abandoned:
+            return
+
         # relay/post message to the GUI's console
 
         self._cb_function(self.TYPE_MESSAGE, message)
+
+    #------------------------------------------------------
+    # event sink for the running job - relay structured events (AxEvent) from the
+    # action to our client, tagged with the job id
+    #
+    def _job_event_sink(self, job):
+
+        def sink(event):
+            if current_thread() in self._abandoned:
+                return
+            event.job_id = job.job_id
+            if self._recorder is not None:
+                self._recorder.job_event(job, event)
+            self._cb_function(self.TYPE_EVENT, event)
+
+        return sink
     #------------------------------------------------------
     # Job dispatcher. Job should be an AxJob object instance.
     # 
     # retval  0 = OKAY
 
-    def dispatch_job(self, job):
+    def dispatch_job(self, job, token:AxCancelToken=None, log:AUxJobLog=None, trace:AUxJobTrace=None):
 
         # make sure we have a job
         if not isinstance(job, AxJob):
@@ -177,30 +546,67 @@ class AUxWorker(object):
             self.message("Unknown job type. Aborting\n")
             return 1
 
+        # capture stdio and stderr outputs - for this thread only. Both go to the job
+        # log, only stdout goes to the console
+        stdout = AUxIOWedge(self.message, log=log)
+        stderr = AUxIOWedge(self.message, suppress=True, log=log, stream=AUxJobLog.STDERR)
+
         # write out the job
         # send a line break across the console - start of a new activity
-        self.message('\n' + ('_'*70) + "\n")
+        stdout.write('\n' + ('_'*70) + "\n")
 
         # Job details
-        self.message(self._actions[job.action_id].name + "\n\n")
+        stdout.write(self._actions[job.action_id].name + "\n\n")
         for key in sorted(job.keys()):
-            self.message(key.capitalize() + ":\t" + str(job[key]) + '\n')
+            stdout.write(key.capitalize() + ":\t" + str(job[key]) + '\n')
+
+        stdout.write('\n')
+
+        with redirect_thread_output(stdout, stderr):
+
+            previous_sink = set_event_sink(self._job_event_sink(job))
+            previous_token = set_cancel_token(token)
+            previous_queued = set_queued_jobs(self.is_queued)
+            previous_trace = set_job_trace(trace)
+            start = time.perf_counter()
+
+            # catch any exit() calls the underlying system might make
+            try:
+                # run the action
+                return self._actions[job.action_id].run_job(job)
+            except SystemExit as  error:
+                # some scripts call exit(), even if not an error
+                stdout.write("Complete.")
+            finally:
+                if trace is not None:
+                    trace.add(self._actions[job.action_id].name, start, time.perf_counter(),
+                              **{key: job[key] for key in ("port", "firmware", "baud") if key in job})
+                set_job_trace(previous_trace)
+                set_queued_jobs(previous_queued)
+                set_event_sink(previous_sink)
+                set_cancel_token(previous_token)
+                stdout.flush()
+                stderr.flush()
+
+        return 1
 
-        self.message('\n')
+    #------------------------------------------------------
+    # Queue to start latency stats
 
-        # capture stdio and stderr outputs
-        with redirect_stdout(AUxIOWedge(self.message)):
-            with redirect_stderr(AUxIOWedge(self.message, suppress=True)):
+    def _record_latency(self, latency:float) -> None:
 
-                # catch any exit() calls the underlying system might make
-                try:
-                    # run the action
-                    return self._actions[job.action_id].run_job(job)
-                except SystemExit as  error:
-                    # some scripts call exit(), even if not an error
-                    self.message("Complete.")
+        self.last_latency = latency
+        self.max_latency = max(self.max_latency, latency)
+        self._total_latency += latency
+        self._latency_count += 1
 
-        return 1
+    @property
+    def average_latency(self) -> float:
+
+        if self._latency_count == 0:
+            return 0.0
+
+        return self._total_latency / self._latency_count
 
     #------------------------------------------------------
     # The thread processing loop
@@ -209,17 +615,377 @@ class AUxWorker(object):
 
         # Wait on jobs .. forever... Exit when shutdown is true
 
-        self._shutdown = False
-
         # run
         while not self._shutdown:
 
-            if inputQueue.empty():
-                time.sleep(1)  # no job, sleep a bit
+            # block until a job - or the shutdown marker - is queued
+            entry = inputQueue.get()
+            if entry is self._SHUTDOWN:
+                break
+
+            queued_at, job = entry
+
+            with self._lock:
+                self._pending_ids.discard(job.job_id)
+                skip = job.job_id in self._cancelled_ids
+                self._cancelled_ids.discard(job.job_id)
+                if not skip:
+                    running = AUxRunningJob(job, self._job_timeout(job))
+                    self._running = running
+
+            if skip:
+                if not self._shutdown:
+                    # recorded and logged like any other job - it just never ran
+                    if self._recorder is not None:
+                        self._recorder.job_started(job, time.monotonic() - queued_at)
+                    log = AUxJobLog(job.job_id)
+                    log.write(AUxJobLog.STDOUT, "Cancelled before it started\n")
+                    self._keep_log(log, self.STATUS_CANCELLED)
+                    self._job_finished(job, self.STATUS_CANCELLED)
+                continue
+
+            latency = time.monotonic() - queued_at
+            self._record_latency(latency)
+
+            if self._recorder is not None:
+                self._recorder.job_started(job, latency)
+
+            # job is starting - let UX know - pass action type, job id and queue latency
+            self._cb_function(self.TYPE_STARTED, job.action_id, job.job_id, latency)
+
+            tracer = job_tracer()
+            trace = None
+            if tracer is not None:
+                trace = tracer.job_started(job, queued_at, job.get("port"))
+                if tracer.profiling(job) and not trace.start_profile():
+                    self.message("Another job is being profiled - not profiling this one\n")
+
+            status = self.dispatch_job(job, running.token, running.log, trace)
+
+            if trace is not None:
+                tracer.job_finished(trace, running.status if running.token.cancelled and status != 0 else status)
+
+            with self._lock:
+                if self._running is not running:
+                    # the watchdog gave up on this job and reported it - this thread is done
+                    self._abandoned.discard(current_thread())
+                    return
+                self._running = None
+
+            # a job that failed because it was cancelled reports why
+            if running.token.cancelled and status != 0:
+                status = running.status
+
+            self._keep_log(running.log, status)
+            self._job_finished(job, status)
+
+    def _job_finished(self, job, status:int) -> None:
+
+        if self._recorder is not None:
+            self._recorder.job_finished(job, status)
+
+        # job is finished - let UX know -pass status, action type and job id
+        self._cb_function(self.TYPE_FINISHED, status, job.action_id, job.job_id)
+
+    # The deadline of a job - its own job_timeout value, or the action's TIMEOUT
+    def _job_timeout(self, job:AxJob) -> float:
+
+        if "job_timeout" in job:
+            return float(job.job_timeout) if job.job_timeout else None
+
+        action = self._actions.get(job.action_id)
+        return action.TIMEOUT if action is not None else None
+
+    #------------------------------------------------------
+    # The watchdog - cancels the running job when it passes its deadline, and gives
+    # up on a job that does not stop once cancelled: its thread is left to finish
+    # (or not) on its own, the job is reported finished, and a new thread carries on
+    # with the queue.
+
+    def watchdog_loop(self):
+
+        while True:
+            time.sleep(self._WATCHDOG_INTERVAL)
+
+            with self._lock:
+                running = self._running
+            if running is None:
+                if self._shutdown:
+                    break
+                continue
+
+            now = time.monotonic()
+            if running.deadline is not None and now > running.deadline and not running.token.cancelled:
+                message = "\nJob timed out after {:.0f} seconds - cancelling\n".format(running.timeout)
+                running.log.write(AUxJobLog.STDOUT, message)
+                self.message(message)
+                running.cancel(self.STATUS_TIMEOUT, "timed out after {:.0f} seconds".format(running.timeout))
+
+            if running.cancelled_at is not None and now > running.cancelled_at + self.CANCEL_GRACE:
+                self._abandon(running)
+
+    def _abandon(self, running:AUxRunningJob) -> None:
+
+        with self._lock:
+            if self._running is not running:
+                return
+            self._running = None
+            self._abandoned.add(self._thread)
+            if not self._shutdown:
+                self._thread = self._start_thread()
+
+        message = "\nJob did not stop ({}) - abandoned\n".format(running.token.reason)
+        running.log.write(AUxJobLog.STDOUT, message)
+        self._cb_function(self.TYPE_MESSAGE, message)
+        self._keep_log(running.log, running.status)
+        self._job_finished(running.job, running.status)
+
+#--------------------------------------------------------------------------------------
+# Per-port status, as tracked by the worker pool
+
+class AUxPortStatus(object):
+
+    STATE_IDLE  = "idle"
+    STATE_BUSY  = "busy"
+
+    def __init__(self, port):
+
+        object.__init__(self)
+
+        self.port = port
+        self.state = self.STATE_IDLE
+        self.action_id = None       # action of the job currently running
+        self.job_id = None          # job currently running
+        self.queued = 0             # jobs submitted but not finished (includes the running one)
+        self.completed = 0
+        self.failed = 0
+        self.last_status = None
+        self.last_latency = 0.0     # queue to start latency of the last job, seconds
+
+    def __str__(self):
+        return "{}: {} (queued {}, completed {}, failed {})".format(self.port, self.state,
+                                                                   self.queued, self.completed, self.failed)
+
+#--------------------------------------------------------------------------------------
+# Worker pool - one AUxWorker (thread + queue) per serial port, so several devices
+# can be flashed at the same time. Jobs for the same port still run in order.
+#
+# The pool is a drop in for AUxWorker - same add_action()/add_job()/shutdown() methods
+# and the same callback arguments. In addition the callback is called with
+#
+#    (TYPE_STATUS, port, AUxPortStatus)
+#
+# whenever a job for a port starts or finishes. Events (TYPE_EVENT) are tagged
+# with the port they came from, and messages (TYPE_MESSAGE) and finished
+# notifications (TYPE_FINISHED) have the port appended as a last argument.
+
+class AUxWorkerPool(object):
+
+    TYPE_MESSAGE    = AUxWorker.TYPE_MESSAGE
+    TYPE_FINISHED   = AUxWorker.TYPE_FINISHED
+    TYPE_EVENT      = AUxWorker.TYPE_EVENT
+    TYPE_STATUS     = 5
+
+    STATUS_CANCELLED    = AUxWorker.STATUS_CANCELLED
+    STATUS_TIMEOUT      = AUxWorker.STATUS_TIMEOUT
+
+    def __init__(self, cb_function, recorder=None):
+
+        object.__init__(self)
+
+        self._cb_function = cb_function
+        self._recorder = recorder
+
+        self._lock = Lock()
+
+        # actions are stateless, so one instance is shared by all the port workers
+        self._actions = []
+
+        self._workers = {}          # port -> AUxWorker
+        self._status = {}           # port -> AUxPortStatus
+        self._job_ports = {}        # job id -> port, until the job finishes
+
+    def __del__(self):
+
+        self.shutdown()
+
+    def shutdown(self):
+
+        with self._lock:
+            workers = list(self._workers.values())
+
+        for worker in workers:
+            worker.shutdown()
+
+    #------------------------------------------------------
+    # Add a execution type/object (an AxAction) to all port workers.
+
+    def add_action(self, *argv) -> None:
+
+        with self._lock:
+            for action in argv:
+                if not isinstance(action, AxAction):
+                    print("Parameter is not of type AxAction" + str(type(action)))
+                    continue
+                self._actions.append(action)
+
+            for worker in self._workers.values():
+                worker.add_action(*argv)
+
+    #------------------------------------------------------
+    # The port a job targets - a "port" value, or the --port of the command list
+
+    @staticmethod
+    def job_port(theJob:AxJob) -> str:
+
+        if "port" in theJob:
+            return theJob.port
+
+        command = theJob.get("command", [])
+        if "--port" in command:
+            index = command.index("--port")
+            if index + 1 < len(command):
+                return command[index + 1]
+
+        return None
+
+    #------------------------------------------------------
+    # Add a job for execution by the worker for its port.
+
+    def add_job(self, theJob:AxJob, port:str=None) -> int:
+
+        if port is None:
+            port = self.job_port(theJob)
+
+        with self._lock:
+            worker = self._workers.get(port)
+            if worker is None:
+                worker = AUxWorker(lambda *args, p=port: self._on_worker_callback(p, *args), self._recorder)
+                worker.add_action(*self._actions)
+                self._workers[port] = worker
+                self._status[port] = AUxPortStatus(port)
+
+            self._status[port].queued += 1
+            self._job_ports[theJob.job_id] = port
+
+        return worker.add_job(theJob)
+
+    #------------------------------------------------------
+    # Cancel a job (by id), everything on a port, or everything. Returns False if
+    # there was nothing to cancel.
+
+    def cancel(self, port:str=None, job_id:int=None) -> bool:
+
+        with self._lock:
+            if job_id is not None:
+                port = self._job_ports.get(job_id)
+                if port is None:
+                    return False
+            if port is not None:
+                workers = [self._workers[port]] if port in self._workers else []
             else:
-                job = inputQueue.get()
+                workers = list(self._workers.values())
+
+        cancelled = False
+        for worker in workers:
+            cancelled = worker.cancel(job_id) or cancelled
+
+        return cancelled
+
+    #------------------------------------------------------
+    # The log of a job (see AUxWorker.job_log) - with no job id, the log of the last
+    # job to fail on the port, or on any port
+
+    def job_log(self, job_id:int=None, port:str=None) -> AUxJobLog:
+
+        with self._lock:
+            workers = [self._workers[port]] if port in self._workers else \
+                      ([] if port is not None else list(self._workers.values()))
 
-                status = self.dispatch_job(job)
+        found = None
+        for worker in workers:
+            log = worker.job_log(job_id)
+            if log is not None and (found is None or log.job_id > found.job_id):
+                found = log
 
-                # job is finished - let UX know -pass status, action type and job id
-                self._cb_function(self.TYPE_FINISHED, status, job.action_id, job.job_id)
+        return found
+
+    #------------------------------------------------------
+    # Status - per port, and combined over all ports
+
+    def ports(self) -> list:
+
+        with self._lock:
+            return list(self._status.keys())
+
+    def status(self, port:str) -> AUxPortStatus:
+
+        with self._lock:
+            return self._status.get(port)
+
+    def is_busy(self, port:str=None) -> bool:
+
+        with self._lock:
+            if port is not None:
+                return port in self._status and self._status[port].queued > 0
+
+            return any(status.queued > 0 for status in self._status.values())
+
+    def progress(self) -> dict:
+        """Combined job counts over all ports"""
+        with self._lock:
+            result = {"ports": len(self._status), "busy": 0, "queued": 0, "completed": 0, "failed": 0,
+                      "max_latency": 0.0}
+            for status in self._status.values():
+                if status.state == AUxPortStatus.STATE_BUSY:
+                    result["busy"] += 1
+                result["queued"] += status.queued
+                result["completed"] += status.completed
+                result["failed"] += status.failed
+                result["max_latency"] = max(result["max_latency"], status.last_latency)
+
+        return result
+
+    #------------------------------------------------------
+    # Callback from a port worker - update the port status and relay to our client
+
+    def _on_worker_callback(self, port, *args):
+
+        if len(args) >= 3 and args[0] == AUxWorker.TYPE_STARTED:
+            with self._lock:
+                status = self._status[port]
+                status.state = AUxPortStatus.STATE_BUSY
+                status.action_id = args[1]
+                status.job_id = args[2]
+                if len(args) >= 4:
+                    status.last_latency = args[3]
+
+            self._cb_function(self.TYPE_STATUS, port, status)
+            return
+
+        if len(args) >= 4 and args[0] == AUxWorker.TYPE_FINISHED:
+            with self._lock:
+                status = self._status[port]
+                status.queued = max(0, status.queued - 1)
+                status.last_status = args[1]
+                if args[1] == 0:
+                    status.completed += 1
+                else:
+                    status.failed += 1
+                if status.queued == 0:
+                    status.state = AUxPortStatus.STATE_IDLE
+                status.action_id = None
+                status.job_id = None
+                self._job_ports.pop(args[3], None)
+
+            self._cb_function(*args, port)
+            self._cb_function(self.TYPE_STATUS, port, status)
+            return
+
+        if len(args) >= 2 and args[0] == AUxWorker.TYPE_EVENT:
+            args[1].port = port
+
+        elif len(args) >= 2 and args[0] == AUxWorker.TYPE_MESSAGE:
+            args = args + (port,)
+
+        self._cb_function(*args)
@@ -0,0 +1,366 @@
+#-----------------------------------------------------------------------------
+# bench_flash.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# End to end upload benchmark. Runs the real uploader pipeline - AUxWorker
+# and AUxEsptoolFlashDevice - against the simulated ESP32 in esp32_sim.py
+# and reports, for each baud rate:
+#
+#   - where the time goes: queue wait, connect/sync, stub and flash size
+#     detection, preparing the images, writing, verifying and resetting
+#   - the effective write rate (bytes/s, uncompressed)
+#   - the queue latency of the job
+#   - the console message rate the GUI would see, and how many batches the
+#     console timer would draw them in
+#
+# Each run is appended as one JSON line to the results file, so results from
+# different versions can be compared with --compare.
+#
+# Examples:
+#
+#   python benchmarks/bench_flash.py
+#   python benchmarks/bench_flash.py --baud 460800 921600 --repeat 3 --output results.jsonl
+#   python benchmarks/bench_flash.py --compare baseline.jsonl
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import os
+import os.path
+import sys
+import json
+import struct
+import time
+import platform
+import argparse
+import tempfile
+from threading import Event, Thread
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(_HERE))
+sys.path.insert(0, _HERE)
+
+from esp32_sim import ESP32Sim
+
+# the caches go somewhere fresh, so runs do not depend on what is on this machine
+os.environ["XDG_CACHE_HOME"] = tempfile.mkdtemp(prefix="rtk_bench_")
+
+import esptool
+
+from RTK_Firmware_Uploader.au_worker import AUxWorker
+from RTK_Firmware_Uploader.au_action import AxJob, AxEvent
+from RTK_Firmware_Uploader.au_act_esptool import AUxEsptoolFlashDevice
+from RTK_Firmware_Uploader.au_console import AUxConsoleBuffer
+
+# how often the GUI draws the console (ms) - see RTK_Firmware_Uploader.py
+_CONSOLE_INTERVAL = 50
+
+# The phases of an upload, in order, and the event that ends each one
+_PHASES = [("queue", "started"),
+           ("connect", AxEvent.EVENT_CHIP),
+           ("detect", AxEvent.EVENT_FLASH_SIZE),
+           ("prepare", "first-progress"),
+           ("write", "last-progress"),
+           ("verify", AxEvent.EVENT_BAUD),
+           ("reset", "finished")]
+
+#--------------------------------------------------------------------------------------
+# BenchRun
+#
+# Collects the timestamps and counts of one upload job from the worker callback
+
+class BenchRun(object):
+
+    def __init__(self) -> None:
+
+        object.__init__(self)
+
+        self.marks = {}
+        self.status = None
+        self.latency = None
+        self.bytes_per_sec = 0.0
+        self.messages = 0
+        self.message_bytes = 0
+        self.events = 0
+        self.batches = 0
+
+        self.console = AUxConsoleBuffer()
+        self.done = Event()
+        self._drawing = Event()
+
+    def mark(self, name: str) -> None:
+
+        self.marks.setdefault(name, time.perf_counter())
+
+    def callback(self, *args) -> None:
+
+        if args[0] == AUxWorker.TYPE_MESSAGE:
+            self.messages += 1
+            self.message_bytes += len(args[1])
+            self.console.write(args[1])
+
+        elif args[0] == AUxWorker.TYPE_STARTED:
+            self.latency = args[3]
+            self.mark("started")
+
+        elif args[0] == AUxWorker.TYPE_EVENT:
+            event = args[1]
+            self.events += 1
+            if event.event_type == AxEvent.EVENT_PROGRESS:
+                self.mark("first-progress")
+                self.marks["last-progress"] = time.perf_counter()
+            elif event.event_type == AxEvent.EVENT_BAUD:
+                self.bytes_per_sec = event.bytes_per_sec
+                self.mark(event.event_type)
+            else:
+                self.mark(event.event_type)
+
+        elif args[0] == AUxWorker.TYPE_FINISHED:
+            self.status = args[1]
+            self.mark("finished")
+            self.done.set()
+
+    # stands in for the GUI console timer
+    def draw_console(self) -> None:
+
+        while not self._drawing.wait(_CONSOLE_INTERVAL / 1000):
+            rewrite, text = self.console.take()
+            if rewrite or text:
+                self.batches += 1
+
+    def phases(self) -> dict:
+
+        result = {}
+        previous = self.marks.get("queued")
+        for phase, mark in _PHASES:
+            if mark not in self.marks or previous is None:
+                continue
+            result[phase] = round(self.marks[mark] - previous, 4)
+            previous = self.marks[mark]
+
+        return result
+
+    def run(self, worker: AUxWorker, values: dict) -> None:
+
+        drawer = Thread(target=self.draw_console, daemon=True)
+        drawer.start()
+
+        self.mark("queued")
+        worker.add_job(AxJob(AUxEsptoolFlashDevice.ACTION_ID, values))
+        self.done.wait()
+
+        self._drawing.set()
+        drawer.join()
+
+#--------------------------------------------------------------------------------------
+# Benchmark one baud rate
+
+def bench(baud: int, firmware: str, flash_size_mb: int, realtime: bool, differential: bool) -> dict:
+
+    sim = ESP32Sim(flash_size_mb=flash_size_mb, realtime=realtime)
+    url = sim.start()
+
+    run = BenchRun()
+    worker = AUxWorker(run.callback)
+    worker.add_action(AUxEsptoolFlashDevice())
+
+    try:
+        run.run(worker, {"port": url, "baud": str(baud), "firmware": firmware, "force": True,
+                         "differential": differential})
+    finally:
+        worker.shutdown()
+        sim.stop()
+
+    total = run.marks["finished"] - run.marks["queued"]
+
+    return {"baud": baud,
+            "status": run.status,
+            "total": round(total, 4),
+            "phases": run.phases(),
+            "bytes_per_sec": round(run.bytes_per_sec),
+            "queue_latency": round(run.latency, 6) if run.latency is not None else None,
+            "messages": run.messages,
+            "messages_per_sec": round(run.messages / total, 1) if total > 0 else 0,
+            "message_bytes": run.message_bytes,
+            "events": run.events,
+            "console_batches": run.batches,
+            "sim": dict(sim.stats)}
+
+#--------------------------------------------------------------------------------------
+# Comparing results
+#
+# Compares the mean total time and write rate of each baud rate against a
+# previous results file. Only baseline runs with the same settings (firmware
+# size, flash size, pacing, differential) count. Returns False if anything got
+# slower by more than threshold percent.
+
+_SETTINGS = ("firmware_size", "flash_size_mb", "realtime", "differential")
+
+def _means(records: list) -> dict:
+
+    grouped = {}
+    for record in records:
+        for result in record["results"]:
+            grouped.setdefault(result["baud"], []).append(result)
+
+    return {baud: {"total": sum(r["total"] for r in results) / len(results),
+                   "bytes_per_sec": sum(r["bytes_per_sec"] for r in results) / len(results)}
+            for baud, results in grouped.items()}
+
+def compare(records: list, baseline_file: str, threshold: float) -> bool:
+
+    with open(baseline_file, "r", encoding="utf-8") as f:
+        baseline = [json.loads(line) for line in f if line.strip()]
+
+    settings = [records[0].get(name) for name in _SETTINGS]
+    baseline = [record for record in baseline if [record.get(name) for name in _SETTINGS] == settings]
+    if not baseline:
+        print("\nNo results in {} with the same settings to compare with".format(baseline_file))
+        return True
+
+    before = _means(baseline)
+    after = _means(records)
+
+    ok = True
+    print("\n{:>8}  {:>10}  {:>10}  {:>8}  {:>12}  {:>12}  {:>8}".format(
+        "baud", "total was", "total now", "change", "B/s was", "B/s now", "change"))
+
+    for baud in sorted(after):
+        if baud not in before:
+            continue
+
+        was, now = before[baud], after[baud]
+        time_change = 100 * (now["total"] - was["total"]) / was["total"] if was["total"] else 0
+        rate_change = 100 * (now["bytes_per_sec"] - was["bytes_per_sec"]) / was["bytes_per_sec"] \
+            if was["bytes_per_sec"] else 0
+
+        print("{:>8}  {:>10.3f}  {:>10.3f}  {:>+7.1f}%  {:>12.0f}  {:>12.0f}  {:>+7.1f}%".format(
+            baud, was["total"], now["total"], time_change, was["bytes_per_sec"], now["bytes_per_sec"], rate_change))
+
+        if time_change > threshold or rate_change < -threshold:
+            ok = False
+
+    return ok
+
+#--------------------------------------------------------------------------------------
+# Entry point
+
+def _git_revision() -> str:
+
+    try:
+        import subprocess
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=_HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        return None
+
+def _firmware(size: int, compressible: float) -> str:
+    """Write a test firmware image - compressible is the fraction of it that is repetitive"""
+    random_bytes = int(size * (1 - compressible))
+    data = os.urandom(random_bytes) + bytes(i & 0xFF for i in range(size - random_bytes))
+
+    # an ESP32 app image with one segment, led by an app descriptor naming the RTK
+    # Surveyor firmware - so it is accepted, and the 4MB images are picked without a prompt
+    descriptor = struct.pack("<II8s32s32s16s16s32s32s", 0xABCD5432, 0, b"", b"bench", b"RTK_Surveyor",
+                             b"00:00:00", b"Jan  1 2026", b"v4.4", bytes(32))
+    segment = descriptor + data
+    segment += bytes(-len(segment) % 4)
+    image = struct.pack("<BBBBI", 0xE9, 1, 2, 0x2F, 0x40080000)                  # dio, 4MB, 80m
+    image += struct.pack("<B3sHBHH4sB", 0xEE, bytes(3), 0, 0, 0, 0xFFFF, bytes(4), 0)
+    image += struct.pack("<II", 0x3F400020, len(segment)) + segment
+
+    f = tempfile.NamedTemporaryFile(prefix="RTK_Surveyor_Firmware_bench_", suffix=".bin", delete=False)
+    f.write(image)
+    f.close()
+
+    return f.name
+
+def main(argv=None) -> int:
+
+    parser = argparse.ArgumentParser(description="Benchmark the uploader against a simulated ESP32")
+    parser.add_argument("--baud", type=int, nargs="+", default=[115200, 460800, 921600],
+                        help="baud rates to benchmark (default: 115200 460800 921600)")
+    parser.add_argument("--firmware", help="firmware file to upload (default: a generated image)")
+    parser.add_argument("--size", type=int, default=1500000, help="size of the generated image (bytes)")
+    parser.add_argument("--compressible", type=float, default=0.3,
+                        help="fraction of the generated image that compresses well (default: 0.3)")
+    parser.add_argument("--flash-size", type=int, default=4, choices=[4, 8, 16], help="simulated flash size (MB)")
+    parser.add_argument("--repeat", type=int, default=1, help="runs per baud rate")
+    parser.add_argument("--differential", action="store_true", help="use differential uploads")
+    parser.add_argument("--no-realtime", action="store_true",
+                        help="do not pace the link to the baud rate - measures host side overhead only")
+    parser.add_argument("--output", default=os.path.join(_HERE, "results.jsonl"),
+                        help="append results to this file (default: benchmarks/results.jsonl)")
+    parser.add_argument("--compare", metavar="FILE", help="compare with the results in FILE")
+    parser.add_argument("--threshold", type=float, default=10.0,
+                        help="percent slowdown that counts as a regression with --compare (default: 10)")
+    args = parser.parse_args(argv)
+
+    firmware = args.firmware if args.firmware else _firmware(args.size, args.compressible)
+
+    records = []
+    try:
+        for repeat in range(args.repeat):
+            results = []
+            for baud in args.baud:
+                result = bench(baud, firmware, args.flash_size, not args.no_realtime, args.differential)
+                results.append(result)
+
+                print("{:>8} baud: {:7.3f}s  {:>8} B/s  latency {:.2f}ms  {} messages ({:.0f}/s) in {} batches  {}".format(
+                    baud, result["total"], result["bytes_per_sec"], (result["queue_latency"] or 0) * 1000,
+                    result["messages"], result["messages_per_sec"], result["console_batches"],
+                    " ".join("{}={:.3f}".format(phase, seconds) for phase, seconds in result["phases"].items())))
+
+            records.append({"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                            "revision": _git_revision(),
+                            "python": platform.python_version(),
+                            "platform": platform.platform(),
+                            "esptool": esptool.__version__,
+                            "firmware_size": os.path.getsize(firmware),
+                            "flash_size_mb": args.flash_size,
+                            "realtime": not args.no_realtime,
+                            "differential": args.differential,
+                            "results": results})
+    finally:
+        if not args.firmware:
+            os.remove(firmware)
+
+    if args.output:
+        with open(args.output, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+
+    if args.compare:
+        if not compare(records, args.compare, args.threshold):
+            print("\nSlower than {} by more than {}%".format(args.compare, args.threshold))
+            return 1
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,444 @@
+#-----------------------------------------------------------------------------
+# esp32_sim.py
+#
+#------------------------------------------------------------------------
+#
+# Written/Update by  SparkFun Electronics, Fall 2026
+#
+# A simulated ESP32 serial bootloader, used to benchmark the uploader
+# without hardware.
+#
+# The simulator speaks the ESP32 ROM bootloader protocol (SLIP framed
+# commands) and switches to the flasher stub protocol once a stub has
+# been loaded to RAM and started - the same as a real ESP32. Flash
+# contents are kept in memory, so compressed/uncompressed writes, MD5
+# checks and flash reads all behave like the real thing.
+#
+# The simulator listens on a local TCP port and esptool connects to it
+# with a "socket://" URL. (pyserial's socket transport ignores DTR/RTS, so
+# resets are simulated on connect instead.) To make timings meaningful,
+# traffic is paced to the baud rate the host has selected.
+#
+# Example:
+#
+#   sim = ESP32Sim(flash_size_mb=4)
+#   url = sim.start()       # socket://127.0.0.1:port
+#   ... esptool --port url ...
+#   sim.stop()
+#
+#==================================================================================
+# Copyright (c) 2026 SparkFun Electronics
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE.
+#==================================================================================
+#
+# pylint: disable=old-style-class, missing-docstring, wrong-import-position
+#
+#-----------------------------------------------------------------------------
+import socket
+import struct
+import hashlib
+import zlib
+import time
+from threading import Thread, Event
+
+# Commands
+ESP_FLASH_BEGIN         = 0x02
+ESP_FLASH_DATA          = 0x03
+ESP_FLASH_END           = 0x04
+ESP_MEM_BEGIN           = 0x05
+ESP_MEM_END             = 0x06
+ESP_MEM_DATA            = 0x07
+ESP_SYNC                = 0x08
+ESP_WRITE_REG           = 0x09
+ESP_READ_REG            = 0x0A
+ESP_SPI_SET_PARAMS      = 0x0B
+ESP_SPI_ATTACH          = 0x0D
+ESP_CHANGE_BAUDRATE     = 0x0F
+ESP_FLASH_DEFL_BEGIN    = 0x10
+ESP_FLASH_DEFL_DATA     = 0x11
+ESP_FLASH_DEFL_END      = 0x12
+ESP_SPI_FLASH_MD5       = 0x13
+ESP_ERASE_FLASH         = 0xD0
+ESP_ERASE_REGION        = 0xD1
+ESP_READ_FLASH          = 0xD2
+
+ROM_INVALID_RECV_MSG    = 0x05
+
+# ESP32 registers the host looks at
+CHIP_DETECT_MAGIC_REG   = 0x40001000
+CHIP_DETECT_MAGIC_VALUE = 0x00F01D83
+EFUSE_RD_REG_BASE       = 0x3FF5A000
+UART_CLKDIV_REG         = 0x3FF40014
+SPI_REG_BASE            = 0x3FF42000
+SPI_CMD_REG             = SPI_REG_BASE + 0x00
+SPI_USR2_REG            = SPI_REG_BASE + 0x24
+SPI_W0_REG              = SPI_REG_BASE + 0x80
+SPI_CMD_USR             = 1 << 18
+
+SPIFLASH_RDID           = 0x9F
+
+FLASH_SECTOR_SIZE       = 0x1000
+ROM_BAUD                = 115200
+
+# JEDEC size ids
+_FLASH_SIZE_IDS = {1: 0x14, 2: 0x15, 4: 0x16, 8: 0x17, 16: 0x18}
+
+class ESP32Sim(object):
+
+    def __init__(self, flash_size_mb=16, mac=(0x24, 0x0a, 0xc4, 0x12, 0x34, 0x56),
+                 realtime=True, flash_write_rate=0, max_baud=0, host="127.0.0.1"):
+
+        object.__init__(self)
+
+        self.flash_size_mb = flash_size_mb
+        self.mac = tuple(mac)
+        self.realtime = realtime                    # pace traffic to the baud rate
+        self.flash_write_rate = flash_write_rate    # bytes/s, 0 = instant
+        self.max_baud = max_baud                    # above this the link is garbage, 0 = no limit
+        self.host = host
+
+        self.flash = bytearray(b"\xff" * (flash_size_mb * 1024 * 1024))
+
+        # traffic statistics, totals over all connections
+        self.stats = {"connections": 0, "commands": 0, "bytes_in": 0, "bytes_out": 0,
+                      "stub_loads": 0, "syncs": 0, "flash_bytes_written": 0, "md5_checks": 0,
+                      "dropped_packets": 0}
+
+        self._server = None
+        self._thread = None
+        self._stop = Event()
+
+    #------------------------------------------------------
+    # Start/stop the server. start() returns the URL to pass to esptool.
+
+    def start(self) -> str:
+
+        self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind((self.host, 0))
+        self._server.listen(1)
+        self._server.settimeout(0.2)
+
+        self._stop.clear()
+        self._thread = Thread(target=self._serve, daemon=True)
+        self._thread.start()
+
+        return self.url
+
+    @property
+    def url(self) -> str:
+
+        return "socket://{}:{}".format(*self._server.getsockname())
+
+    def stop(self) -> None:
+
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.close()
+            self._server = None
+
+    def _serve(self):
+
+        while not self._stop.is_set():
+            try:
+                conn, _ = self._server.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+
+            self.stats["connections"] += 1
+            conn.settimeout(0.2)
+            try:
+                _Connection(self, conn).run()
+            except (ConnectionError, OSError):
+                pass
+            finally:
+                conn.close()
+
+    #------------------------------------------------------
+    # Device details
+
+    @property
+    def flash_id(self) -> int:
+
+        # Winbond manufacturer (0xEF), device 0x40xx
+        return (_FLASH_SIZE_IDS.get(self.flash_size_mb, 0x18) << 16) | (0x40 << 8) | 0xEF
+
+    def efuse(self, n) -> int:
+
+        if n == 1:
+            return struct.unpack(">I", bytes(self.mac[2:6]))[0]
+        if n == 2:
+            return (self.mac[0] << 8) | self.mac[1]
+        return 0
+
+#--------------------------------------------------------------------------------------
+# One host connection. A new connection starts in the ROM bootloader at the ROM baud
+# rate - the same state a reset into download mode leaves a real ESP32 in.
+
+class _Connection(object):
+
+    def __init__(self, sim, conn):
+
+        object.__init__(self)
+
+        self.sim = sim
+        self.conn = conn
+
+        self.baud = ROM_BAUD
+        self.stub = False
+        self.regs = {}
+
+        self._rx = bytearray()
+        self._write = None          # (offset, decompressobj or None, block size)
+
+    #------------------------------------------------------
+    # SLIP framing and link pacing
+
+    def _pace(self, nbytes):
+
+        if self.sim.realtime:
+            time.sleep(nbytes * 10.0 / self.baud)
+
+    def read_packet(self):
+
+        while True:
+            start = self._rx.find(b"\xc0")
+            if start >= 0:
+                end = self._rx.find(b"\xc0", start + 1)
+                if end > start:
+                    frame = bytes(self._rx[start + 1:end])
+                    del self._rx[:end + 1]
+                    if not frame:       # back to back delimiters
+                        self._rx[0:0] = b"\xc0"
+                        continue
+                    return frame.replace(b"\xdb\xdc", b"\xc0").replace(b"\xdb\xdd", b"\xdb")
+
+            if self.sim._stop.is_set():
+                raise ConnectionError("simulator stopped")
+            try:
+                data = self.conn.recv(65536)
+            except socket.timeout:
+                continue
+            if not data:
+                raise ConnectionError("host closed the connection")
+
+            self.sim.stats["bytes_in"] += len(data)
+            self._pace(len(data))
+            self._rx += data
+
+    def write_packet(self, packet):
+
+        buf = b"\xc0" + packet.replace(b"\xdb", b"\xdb\xdd").replace(b"\xc0", b"\xdb\xdc") + b"\xc0"
+        self._pace(len(buf))
+        self.conn.sendall(buf)
+        self.sim.stats["bytes_out"] += len(buf)
+
+    def respond(self, op, val=0, data=b"", error=0):
+
+        if error:
+            status = bytes([1, error])
+        else:
+            status = b"\x00\x00"
+        if not self.stub:
+            status += b"\x00\x00"   # the ESP32 ROM sends 4 status bytes, the stub 2
+
+        payload = data + status
+        self.write_packet(struct.pack("<BBHI", 1, op, len(payload), val) + payload)
+
+    #------------------------------------------------------
+    # Command loop
+
+    def run(self):
+
+        while True:
+            packet = self.read_packet()
+            if len(packet) < 8 or packet[0] != 0:
+                continue
+
+            # past the adapter's limit nothing gets through intact
+            if self.sim.max_baud and self.baud > self.sim.max_baud:
+                self.sim.stats["dropped_packets"] += 1
+                continue
+
+            _, op, size, chk = struct.unpack("<BBHI", packet[:8])
+            data = packet[8:8 + size]
+            self.sim.stats["commands"] += 1
+
+            handler = self._handlers.get(op)
+            if handler is None:
+                self.respond(op, error=ROM_INVALID_RECV_MSG)
+            else:
+                handler(self, op, data)
+
+    def _sync(self, op, data):
+
+        self.sim.stats["syncs"] += 1
+        # The ROM answers a sync 8 times with a non-zero value, the stub with 0
+        for _ in range(8):
+            self.respond(op, val=0 if self.stub else 0x20120707)
+
+    def _read_reg(self, op, data):
+
+        addr, = struct.unpack("<I", data[:4])
+
+        if addr == CHIP_DETECT_MAGIC_REG:
+            val = CHIP_DETECT_MAGIC_VALUE
+        elif EFUSE_RD_REG_BASE <= addr < EFUSE_RD_REG_BASE + 0x100:
+            val = self.sim.efuse((addr - EFUSE_RD_REG_BASE) // 4)
+        elif addr == UART_CLKDIV_REG:
+            val = int(40e6 / self.baud)     # 40MHz crystal
+        elif addr == SPI_CMD_REG:
+            val = 0                         # SPI user commands complete immediately
+        else:
+            val = self.regs.get(addr, 0)
+
+        self.respond(op, val=val)
+
+    def _write_reg(self, op, data):
+
+        for i in range(0, len(data) - 15, 16):
+            addr, value, mask, delay = struct.unpack("<IIII", data[i:i + 16])
+            self.regs[addr] = (self.regs.get(addr, 0) & ~mask) | (value & mask)
+
+            if addr == SPI_CMD_REG and value & SPI_CMD_USR:
+                command = self.regs.get(SPI_USR2_REG, 0) & 0xFF
+                self.regs[SPI_W0_REG] = self.sim.flash_id if command == SPIFLASH_RDID else 0
+
+        self.respond(op)
+
+    def _ok(self, op, data):
+
+        self.respond(op)
+
+    def _mem_end(self, op, data):
+
+        flag, entry = struct.unpack("<II", data[:8])
+        self.respond(op)
+        if entry != 0:
+            # the stub starts, and says hello
+            self.stub = True
+            self.sim.stats["stub_loads"] += 1
+            self.write_packet(b"OHAI")
+
+    def _change_baud(self, op, data):
+
+        new_baud, _ = struct.unpack("<II", data[:8])
+        self.respond(op)
+        self.baud = new_baud
+
+    def _flash_begin(self, op, data):
+
+        size, blocks, blocksize, offset = struct.unpack("<IIII", data[:16])
+        compressed = op == ESP_FLASH_DEFL_BEGIN
+
+        # compressed data is written where the last block ended, plain data by sequence number
+        self._write = {"base": offset, "next": offset, "block_size": blocksize,
+                       "decompress": zlib.decompressobj() if compressed else None}
+        self.respond(op)
+
+    def _flash_data(self, op, data):
+
+        if self._write is None:
+            self.respond(op, error=ROM_INVALID_RECV_MSG)
+            return
+
+        length, seq = struct.unpack("<II", data[:8])
+        block = data[16:16 + length]
+
+        if self._write["decompress"] is not None:
+            block = self._write["decompress"].decompress(block)
+            offset = self._write["next"]
+        else:
+            offset = self._write["base"] + seq * self._write["block_size"]
+
+        self.sim.flash[offset:offset + len(block)] = block
+        self._write["next"] = offset + len(block)
+        self.sim.stats["flash_bytes_written"] += len(block)
+
+        if self.sim.flash_write_rate:
+            time.sleep(len(block) / float(self.sim.flash_write_rate))
+
+        self.respond(op)
+
+    def _flash_end(self, op, data):
+
+        self._write = None
+        self.respond(op)
+
+    def _md5(self, op, data):
+
+        addr, size = struct.unpack("<II", data[:8])
+        digest = hashlib.md5(self.sim.flash[addr:addr + size]).digest()
+        self.sim.stats["md5_checks"] += 1
+
+        # the stub returns the raw digest, the ROM a hex string
+        self.respond(op, data=digest if self.stub else digest.hex().encode())
+
+    def _erase_flash(self, op, data):
+
+        self.sim.flash[:] = b"\xff" * len(self.sim.flash)
+        self.respond(op)
+
+    def _erase_region(self, op, data):
+
+        offset, size = struct.unpack("<II", data[:8])
+        self.sim.flash[offset:offset + size] = b"\xff" * size
+        self.respond(op)
+
+    def _read_flash(self, op, data):
+
+        offset, length, block_size, _ = struct.unpack("<IIII", data[:16])
+        self.respond(op)
+
+        contents = bytes(self.sim.flash[offset:offset + length])
+        sent = 0
+        while sent < length:
+            self.write_packet(contents[sent:sent + block_size])
+            sent += min(block_size, length - sent)
+            self.read_packet()      # host acknowledges each block
+
+        self.write_packet(hashlib.md5(contents).digest())
+
+    _handlers = {
+        ESP_SYNC:               _sync,
+        ESP_READ_REG:           _read_reg,
+        ESP_WRITE_REG:          _write_reg,
+        ESP_MEM_BEGIN:          _ok,
+        ESP_MEM_DATA:           _ok,
+        ESP_MEM_END:            _mem_end,
+        ESP_SPI_SET_PARAMS:     _ok,
+        ESP_SPI_ATTACH:         _ok,
+        ESP_CHANGE_BAUDRATE:    _change_baud,
+        ESP_FLASH_BEGIN:        _flash_begin,
+        ESP_FLASH_DATA:         _flash_data,
+        ESP_FLASH_END:          _flash_end,
+        ESP_FLASH_DEFL_BEGIN:   _flash_begin,
+        ESP_FLASH_DEFL_DATA:    _flash_data,
+        ESP_FLASH_DEFL_END:     _flash_end,
+        ESP_SPI_FLASH_MD5:      _md5,
+        ESP_ERASE_FLASH:        _erase_flash,
+        ESP_ERASE_REGION:       _erase_region,
+        ESP_READ_FLASH:         _read_flash,
+    }
@@ -33,7 +33,7 @@ here = path.abspath(path.dirname(__file__))
 with open(path.join(here, 'DESCRIPTION.md'), encoding='utf-8') as f:
     long_description = f.read()
     
-install_deps = ['darkdetect', 'argparse', 'intelhex', 'esptool']
+install_deps = ['darkdetect', 'argparse', 'intelhex', 'esptool>=4,<5']
 
 # Raspberry Pi needs python3-pyqt5 and python3-pyqt5.qtserialport
 # which can only be installed with apt-get
@@ -107,6 +107,11 @@ setuptools.setup(
     # https://packaging.python.org/en/latest/technical.html#install-requires-vs-requirements-files
     install_requires=install_deps,
 
+    # Optional: pyudev lets the port list follow hotplug events on Linux, rather than polling
+    extras_require={
+        'udev': ['pyudev'],
+    },
+
     # If there are data files included in your packages that need to be
     # installed, specify them here.  If using Python 2.6 or less, then these
     # have to be included in MANIFEST.in as well.
@@ -121,6 +126,7 @@ setuptools.setup(
     # pip to create the appropriate form of executable for the target platform.
     entry_points={
         'console_scripts': ['RTK_Firmware_Upload=RTK_Firmware_Uploader:startUploaderGUI',
+                            'RTK_Firmware_Upload_CLI=RTK_Firmware_Uploader:startUploaderCLI',
         ],
     },
 )